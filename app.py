@@ -1,33 +1,44 @@
-from flask import Flask, request, jsonify, Response, render_template
-from google.ads.googleads.client import GoogleAdsClient
+# Primero: inicia el reloj de arranque (ver startup_profile.py)
+from startup_profile import LazyModule, lazy_attr, mark_app_ready, get_startup_report
+from flask import Flask, request, jsonify, Response, render_template, stream_with_context
 from datetime import date, timedelta, datetime
 from google.ads.googleads.errors import GoogleAdsException
 from google.protobuf.field_mask_pb2 import FieldMask
-from circuit_breaker import circuit_breaker_bp, start_circuit_breaker_scheduler
-from profit_guardian import profit_guardian_bp, start_profit_guardian
+from circuit_breaker import circuit_breaker_bp, start_circuit_breaker_scheduler, init_database as init_circuit_breaker_db
+from profit_guardian import profit_guardian_bp, start_profit_guardian, init_profit_guardian_db
+from scheduler_leader import get_scheduler_leader
+from google_ads_client_pool import get_pooled_client, get_client_pool, register_mutate_listener
+from landing_manifest import get_landing_manifest, extract_landing_metadata
+from gaql_projection import RowProjector, raw_row, iter_raw_rows, get_projector, QUERY_RESULT_PROJECTOR
+from query_fanout import run_queries
+from gaql_cache import get_gaql_cache, credential_scope
+from heavy_task_runner import run_heavy_task, get_heavy_task_runner, HEAVY_TASK_BROWSER_RSS_LIMIT_MB
+from asset_index import get_asset_index
+from github_setup_state import get_github_setup_state
 from dotenv import load_dotenv
 from typing import Tuple, Optional
 import os
-from PIL import Image
 import base64
 from io import BytesIO
 import json
 import requests
 import unicodedata
-from pytrends.request import TrendReq
 import uuid
+import itertools
 import sys
-from bs4 import BeautifulSoup
 import re
 
+# Dependencias pesadas: se importan al primer uso (ver startup_profile.py)
+# pytrends se importa dentro de /api/trends
+Image = LazyModule('PIL.Image')
+BeautifulSoup = lazy_attr('bs4', 'BeautifulSoup')
+
 # Import Landing Page Generator
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from landing_generator import LandingPageGenerator
-from video_processor import VideoProcessor
-from web_cloner import WebCloner, WebClonerConfig
-from github_cloner_uploader import GitHubClonerUploader
+LandingPageGenerator = lazy_attr('landing_generator', 'LandingPageGenerator')
+GitHubClonerUploader = lazy_attr('github_cloner_uploader', 'GitHubClonerUploader')
 from custom_template_manager import CustomTemplateManager
-from repository_importer import RepositoryImporter
+RepositoryImporter = lazy_attr('repository_importer', 'RepositoryImporter')
 
 import logging
 logger = logging.getLogger(__name__)
@@ -175,6 +186,12 @@ def commit_template_to_github(template_id: str, content: str, is_preview: bool =
         github_url = result.get("content", {}).get("html_url", "")
         public_url = f"https://{github_owner}.github.io/{github_repo}/{template_id}/"
         logger.info(f"✅ Landing {template_id} guardada en GitHub: {public_url}")
+        try:
+            get_landing_manifest(github_owner, github_repo, github_token).upsert(
+                template_id, **extract_landing_metadata(content)
+            )
+        except Exception as e:
+            logger.error(f"❌ Error actualizando landings.json para {template_id}: {e}")
         return {
             "success": True,
             "message": f"Template guardado en GitHub",
@@ -193,10 +210,12 @@ def commit_template_to_github(template_id: str, content: str, is_preview: bool =
 # Inicializar base de datos para automation jobs
 init_db()
 
-# Inicializar worker para procesamiento en background
-automation_worker = get_worker(max_workers=3)
+# Worker para procesamiento en background: se crea al primer job de cada proceso
+# (sus hilos no sobreviven al fork de gunicorn, no crearlo al importar)
+def get_automation_worker():
+    return get_worker(max_workers=3)
 
-def get_landing_history():
+def get_landing_history(force_refresh: bool = False):
     github_owner = os.getenv("GITHUB_REPO_OWNER")
     github_repo = os.getenv("GITHUB_REPO_NAME", "monorepo-landings")
     github_token = os.getenv("GITHUB_TOKEN")
@@ -205,72 +224,26 @@ def get_landing_history():
         # Return empty list instead of error to avoid 500 on frontend
         return {"landings": []}
     
-    headers = {"Authorization": f"token {github_token}"}
-    
-    # Get contents of root
-    url = f"https://api.github.com/repos/{github_owner}/{github_repo}/contents"
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code != 200:
+    # Single conditional GET of landings.json (rebuilt from a full repo scan only if missing)
+    try:
+        manifest = get_landing_manifest(github_owner, github_repo, github_token)
+        entries = manifest.get_landings(force_rebuild=force_refresh)
+    except Exception as e:
+        logger.error(f"Error loading landing manifest: {e}")
         # Return empty list instead of error to avoid 500 on frontend
         return {"landings": []}
     
-    contents = response.json()
     landings = []
-    
-    for item in contents:
-        if item['type'] == 'dir':
-            folder_name = item['name']
-            
-            # Get index.html
-            html_url = f"https://api.github.com/repos/{github_owner}/{github_repo}/contents/{folder_name}/index.html"
-            html_resp = requests.get(html_url, headers=headers)
-            
-            if html_resp.status_code == 200:
-                html_data = html_resp.json()
-                html_content = base64.b64decode(html_data['content']).decode('utf-8')
-                
-                # Parse metadata
-                soup = BeautifulSoup(html_content, 'html.parser')
-                
-                # WhatsApp
-                whatsapp_link = soup.find('a', href=lambda x: x and 'wa.me' in x)
-                whatsapp_number = None
-                if whatsapp_link:
-                    href = whatsapp_link['href']
-                    if 'wa.me/' in href:
-                        whatsapp_number = href.split('wa.me/')[-1].split('?')[0]
-                
-                # Phone
-                phone_link = soup.find('a', href=lambda x: x and x.startswith('tel:'))
-                phone_number = None
-                if phone_link:
-                    phone_number = phone_link['href'].replace('tel:', '')
-                
-                # GTM
-                gtm_script = soup.find('script', string=lambda x: x and 'GTM-' in x)
-                gtm_id = None
-                if gtm_script:
-                    match = re.search(r'GTM-[A-Z0-9]+', gtm_script.string)
-                    gtm_id = match.group() if match else None
-                
-                # Get creation date from commits
-                commits_url = f"https://api.github.com/repos/{github_owner}/{github_repo}/commits?path={folder_name}/index.html"
-                commits_resp = requests.get(commits_url, headers=headers)
-                created_at = datetime.now().isoformat()
-                if commits_resp.status_code == 200:
-                    commits = commits_resp.json()
-                    if commits:
-                        created_at = commits[0]['commit']['committer']['date']
-                
-                landings.append({
-                    "folder": folder_name,
-                    "whatsapp_number": whatsapp_number,
-                    "phone_number": phone_number,
-                    "gtm_id": gtm_id,
-                    "created_at": created_at,
-                    "url": build_public_landing_url(folder_name)
-                })
+    for entry in entries:
+        folder_name = entry["folder"]
+        landings.append({
+            "folder": folder_name,
+            "whatsapp_number": entry.get("whatsapp_number"),
+            "phone_number": entry.get("phone_number"),
+            "gtm_id": entry.get("gtm_id"),
+            "created_at": entry.get("created_at") or datetime.now().isoformat(),
+            "url": build_public_landing_url(folder_name)
+        })
     
     return {"landings": landings}
 
@@ -345,6 +318,10 @@ def delete_landing_from_github(folder_name):
              logger.error(f"Failed to get SHA for {full_path}: {resp.status_code}")
     
     # After deleting files, the folder should be empty, but GitHub doesn't have empty folders
+    try:
+        get_landing_manifest(github_owner, github_repo, github_token).remove(folder_name)
+    except Exception as e:
+        logger.error(f"Failed to remove {folder_name} from landing manifest: {e}")
     return True
 
 def update_landing_metadata(folder_name, whatsapp_number=None, phone_number=None, gtm_id=None):
@@ -450,6 +427,13 @@ def update_landing_metadata(folder_name, whatsapp_number=None, phone_number=None
     if update_resp.status_code not in [200, 201]:
         raise ValueError(f"Failed to update: {update_resp.text}")
     
+    try:
+        get_landing_manifest(github_owner, github_repo, github_token).upsert(
+            folder_name, **extract_landing_metadata(html_content)
+        )
+    except Exception as e:
+        logger.error(f"Failed to update landing manifest for {folder_name}: {e}")
+    
     return {
         "success": True, 
         "commit": update_resp.json()['commit']['sha'],
@@ -466,13 +450,16 @@ def handle_unexpected_error(e):
     return res
 
 def get_google_ads_client(refresh_token=None, login_customer_id=None):
-    """Crea cliente de Google Ads. Prioriza credenciales pasadas, sino usa variables de entorno"""
+    """
+    Obtiene cliente de Google Ads. Prioriza credenciales pasadas, sino usa variables de entorno.
+    Los clientes se reutilizan por credencial (ver google_ads_client_pool.py).
+    """
     
     # Si viene refresh_token en los parámetros, es un usuario custom (iOS)
     # Usar Client ID de iOS (sin client_secret)
     if refresh_token and refresh_token != os.environ.get("GOOGLE_ADS_REFRESH_TOKEN"):
         # Cliente iOS - NO requiere client_secret
-        return GoogleAdsClient.load_from_dict({
+        return get_pooled_client({
             "developer_token": os.environ.get("GOOGLE_ADS_DEVELOPER_TOKEN"),
             "client_id": "82393641971-2qpch75fpo28p7dmpqcibbp0vk6aj0g9.apps.googleusercontent.com",  # iOS Client ID
             "client_secret": "",  # iOS Client no tiene secret, pero la librería lo requiere
@@ -482,7 +469,7 @@ def get_google_ads_client(refresh_token=None, login_customer_id=None):
         })
     
     # Usuario default - usar credenciales del .env (Web Client con secret)
-    return GoogleAdsClient.load_from_dict({
+    return get_pooled_client({
         "developer_token": os.environ.get("GOOGLE_ADS_DEVELOPER_TOKEN"),
         "client_id": os.environ.get("GOOGLE_ADS_CLIENT_ID"),
         "client_secret": os.environ.get("GOOGLE_ADS_CLIENT_SECRET"),
@@ -497,6 +484,30 @@ def get_client_from_request():
     login_customer_id = request.headers.get('X-Google-Ads-Login-Customer-Id')
     return get_google_ads_client(refresh_token, login_customer_id)
 
+
+# Los mutate de este proceso invalidan las lecturas cacheadas del customer
+register_mutate_listener(get_gaql_cache().invalidate_customer)
+
+
+def cached_google_ads_read(customer_id, key_parts, fetch, ttl=None):
+    """
+    Lectura de Google Ads a través del cache compartido (ver gaql_cache.py).
+    El scope sale de las credenciales del request; {"noCache": true} en el
+    body fuerza una consulta directa (y actualiza el cache).
+
+    Returns:
+        (valor, estado del cache: HIT/STALE/MISS/BYPASS)
+    """
+    scope = credential_scope(
+        request.headers.get('X-Google-Ads-Refresh-Token'),
+        request.headers.get('X-Google-Ads-Login-Customer-Id')
+    )
+    body = request.get_json(silent=True) or {}
+    return get_gaql_cache().get_or_fetch(
+        customer_id, scope, tuple(key_parts), fetch,
+        ttl=ttl, bypass=bool(body.get('noCache'))
+    )
+
 @app.route('/', methods=['GET'])
 def index():
     """Dashboard principal con herramientas"""
@@ -805,7 +816,8 @@ def preview_landing():
 @app.route('/api/landing/history', methods=['GET'])
 def landing_history():
     try:
-        history = get_landing_history()
+        force_refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        history = get_landing_history(force_refresh=force_refresh)
         response = jsonify(history)
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response
@@ -931,10 +943,12 @@ def process_video():
         github_repo = os.getenv("GITHUB_REPO_NAME", "monorepo-landings")
         github_token = os.getenv("GITHUB_TOKEN")
         
-        processor = VideoProcessor(github_owner, github_repo, github_token)
-        
-        # Process video
-        result = processor.process_video(video_source, folder_name, position, is_url)
+        # Process video in a child process (moviepy/cv2 stay out of the web worker)
+        result = run_heavy_task(
+            'video_process',
+            'video_processor:process_video_task',
+            args=(github_owner, github_repo, github_token, video_source, folder_name, position, is_url)
+        )
         
         # Flatten common keys for iOS client compatibility
         if isinstance(result, dict):
@@ -1086,6 +1100,13 @@ def system_status():
                     "circuit_breaker": circuit_breaker_stats.get("google_ads", {})
                 }
             },
+            "scheduler": get_scheduler_leader().get_status(),
+            "google_ads_client_pool": get_client_pool().get_stats(),
+            "gaql_cache": get_gaql_cache().get_stats(),
+            "asset_index": get_asset_index().get_stats(),
+            "github_setup_state": get_github_setup_state().get_stats(),
+            "startup": get_startup_report(),
+            "heavy_tasks": get_heavy_task_runner().get_stats(),
             "quality_assurance": {
                 "enabled": True,
                 "min_score": int(os.getenv("MIN_LANDING_QUALITY_SCORE", "30")),
@@ -1122,6 +1143,26 @@ def system_status():
             "status": "error",
             "error": str(e)
         })
+
+@app.route('/api/system/memory', methods=['GET'])
+def system_memory():
+    """RSS actual y pico de cada worker de gunicorn y estado de las tareas pesadas"""
+    runner = get_heavy_task_runner()
+    runner.record_worker_memory(force=True)
+    response = jsonify({
+        "worker": runner.worker_memory(),
+        "workers": runner.get_workers_memory(),
+        "heavy_tasks": runner.get_stats()
+    })
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+@app.after_request
+def record_worker_memory(response):
+    # Throttled: a lo sumo una escritura cada WORKER_MEMORY_RECORD_SECONDS por worker
+    get_heavy_task_runner().record_worker_memory()
+    return response
+
 @app.route('/api/templates', methods=['GET'])
 def get_templates():
     """Obtiene la lista de templates disponibles para landing pages"""
@@ -3303,6 +3344,193 @@ def apply_campaign_targeting():
         result.headers.add('Access-Control-Allow-Origin', '*')
         return result, 500
 
+# Vistas demográficas: (dimensión en la respuesta, recurso GAQL)
+DEMOGRAPHIC_VIEWS = (
+    ('gender', 'gender_view'),
+    ('age', 'age_range_view'),
+    ('income', 'income_range_view'),
+)
+
+# Mapeo: API devuelve 510xxx pero el modelo Swift espera 31xxx
+INCOME_API_ID_MAP = {
+    "510000": "31006",  # UNDETERMINED -> UNDETERMINED
+    "510001": "31005",  # 0-50K
+    "510002": "31004",  # 50-60K
+    "510003": "31003",  # 60-70K
+    "510004": "31002",  # 70-80K
+    "510005": "31001",  # 80-UP
+    "510006": "31000",  # TOP_10_PERCENT
+}
+
+
+def _demographic_criteria_query(customer_id, ad_group_id):
+    return f"""
+            SELECT
+                ad_group_criterion.criterion_id,
+                ad_group_criterion.type,
+                ad_group_criterion.gender.type,
+                ad_group_criterion.age_range.type,
+                ad_group_criterion.income_range.type,
+                ad_group_criterion.negative
+            FROM ad_group_criterion
+            WHERE ad_group_criterion.ad_group = 'customers/{customer_id}/adGroups/{ad_group_id}'
+                AND ad_group_criterion.type IN ('GENDER', 'AGE_RANGE', 'INCOME_RANGE')
+                AND ad_group_criterion.status = 'ENABLED'
+        """
+
+
+def _demographic_stats_query(view, ad_group_id, date_start, date_end):
+    return f"""
+                SELECT
+                    {view}.resource_name,
+                    metrics.conversions,
+                    metrics.conversions_value,
+                    metrics.clicks,
+                    metrics.impressions,
+                    metrics.cost_micros
+                FROM {view}
+                WHERE ad_group.id = {ad_group_id}
+                    AND segments.date BETWEEN '{date_start}' AND '{date_end}'
+            """
+
+
+def _collect_demographic_config(response):
+    """Criterios demográficos (incluidos/excluidos) de un ad group en una sola pasada"""
+    buckets = {
+        'GENDER': ([], [], lambda c: c.gender.type.value),
+        'AGE_RANGE': ([], [], lambda c: c.age_range.type.value),
+        'INCOME_RANGE': ([], [], lambda c: c.income_range.type.value),
+    }
+    
+    for row in response:
+        criterion = row.ad_group_criterion
+        bucket = buckets.get(criterion.type_.name)
+        if not bucket:
+            continue
+        included, excluded, get_id = bucket
+        # Separar criterios positivos y negativos
+        target = excluded if criterion.negative else included
+        criterion_id = str(get_id(criterion))
+        if criterion_id not in target:
+            target.append(criterion_id)
+    
+    genders, genders_excluded, _ = buckets['GENDER']
+    age_ranges, age_ranges_excluded, _ = buckets['AGE_RANGE']
+    household_incomes, household_incomes_excluded, _ = buckets['INCOME_RANGE']
+    
+    # Si no hay criterios configurados, significa que TODOS están activos por defecto
+    # (Google Ads sin restricciones = targeting a todos)
+    if len(genders) == 0 and len(age_ranges) == 0 and len(household_incomes) == 0:
+        print("⚠️ No hay criterios demográficos configurados - usando defaults (todos activos)")
+        
+        # Todos los géneros por defecto
+        genders = ["10", "11", "20"]  # Mujer, Hombre, Desconocido
+        
+        # Todas las edades por defecto
+        age_ranges = ["503001", "503002", "503003", "503004", "503005", "503006", "503999"]
+        
+        # Todos los ingresos por defecto
+        household_incomes = ["31000", "31001", "31002", "31003", "31004", "31005", "31006"]
+    
+    print(f"✅ Demographics cargadas:")
+    print(f"   Genders: {len(genders)} included, {len(genders_excluded)} excluded")
+    print(f"   Ages: {len(age_ranges)} included, {len(age_ranges_excluded)} excluded")
+    print(f"   Incomes: {len(household_incomes)} included, {len(household_incomes_excluded)} excluded")
+    
+    return {
+        "genders": genders,
+        "gendersExcluded": genders_excluded,
+        "ageRanges": age_ranges,
+        "ageRangesExcluded": age_ranges_excluded,
+        "householdIncomes": household_incomes,
+        "householdIncomesExcluded": household_incomes_excluded
+    }
+
+
+def _aggregate_demographic_stats(dimension, view, rows):
+    """Suma métricas por criterio (resource_name: customers/X/<view>s/AD_GROUP_ID~CRITERION_ID)"""
+    segments = {}
+    for r in rows:
+        criterion_id = r[f'{view}.resource_name'].split('~')[-1]
+        if dimension == 'income':
+            criterion_id = INCOME_API_ID_MAP.get(criterion_id, criterion_id)
+        
+        segment = segments.get(criterion_id)
+        if segment is None:
+            segment = segments[criterion_id] = {
+                "conversions": 0,
+                "conversionsValue": 0,
+                "clicks": 0,
+                "impressions": 0,
+                "cost": 0,
+                "isNegative": False
+            }
+        
+        segment["conversions"] += r['metrics.conversions']
+        segment["conversionsValue"] += r['metrics.conversions_value']
+        segment["clicks"] += r['metrics.clicks']
+        segment["impressions"] += r['metrics.impressions']
+        segment["cost"] += r['metrics.cost_micros'] / 1_000_000
+    return segments
+
+
+def fetch_demographics_bundle(client, customer_id, ad_group_id, date_start=None, date_end=None, include_stats=True, include_config=False):
+    """
+    Carga en paralelo las estadísticas por género/edad/ingreso y, opcionalmente,
+    la configuración de criterios del ad group (todo lo que necesita la pantalla
+    de demografía) sobre el mismo cliente.
+
+    Returns:
+        (stats, config, errors)
+    """
+    google_ads_service = client.get_service("GoogleAdsService")
+    tasks = {}
+    
+    def stats_task(dimension, view):
+        query = _demographic_stats_query(view, ad_group_id, date_start, date_end)
+        def task(timeout):
+            response = google_ads_service.search(customer_id=customer_id, query=query, timeout=timeout)
+            rows = get_projector(query, int64_as_string=False).project(iter_raw_rows(response))
+            return _aggregate_demographic_stats(dimension, view, rows)
+        return task
+    
+    if include_stats:
+        for dimension, view in DEMOGRAPHIC_VIEWS:
+            tasks[dimension] = stats_task(dimension, view)
+    
+    if include_config:
+        config_query = _demographic_criteria_query(customer_id, ad_group_id)
+        tasks['config'] = lambda timeout: _collect_demographic_config(
+            google_ads_service.search(customer_id=customer_id, query=config_query, timeout=timeout)
+        )
+    
+    outcome = run_queries(tasks)
+    
+    stats = None
+    if include_stats:
+        stats = {dimension: outcome.results.get(dimension, {}) for dimension, _ in DEMOGRAPHIC_VIEWS}
+        if 'gender' in outcome.errors:
+            # Llenar con 0s en caso de error
+            for gender_id in ["10", "11", "20"]:
+                stats["gender"][gender_id] = {
+                    "conversions": 0.0,
+                    "conversionsValue": 0.0,
+                    "clicks": 0.0,
+                    "impressions": 0.0,
+                    "cost": 0.0,
+                    "isNegative": False
+                }
+    
+    for name, error in outcome.errors.items():
+        print(f"⚠️ Error loading {name} demographics: {error}")
+    
+    if include_config and 'config' in outcome.exceptions:
+        # Sin configuración no hay pantalla que mostrar: propagar como antes
+        raise outcome.exceptions['config']
+    
+    return stats, outcome.results.get('config'), outcome.errors
+
+
 @app.route('/api/demographics/get', methods=['POST', 'OPTIONS'])
 def get_demographics():
     """Obtiene la configuración demográfica actual de un grupo de anuncios"""
@@ -3330,92 +3558,16 @@ def get_demographics():
         google_ads_service = client.get_service("GoogleAdsService")
         
         # Query para obtener criterios demográficos actuales
-        query = f"""
-            SELECT
-                ad_group_criterion.criterion_id,
-                ad_group_criterion.type,
-                ad_group_criterion.gender.type,
-                ad_group_criterion.age_range.type,
-                ad_group_criterion.income_range.type,
-                ad_group_criterion.negative
-            FROM ad_group_criterion
-            WHERE ad_group_criterion.ad_group = 'customers/{customer_id}/adGroups/{ad_group_id}'
-                AND ad_group_criterion.type IN ('GENDER', 'AGE_RANGE', 'INCOME_RANGE')
-                AND ad_group_criterion.status = 'ENABLED'
-        """
-        
-        response = google_ads_service.search(customer_id=customer_id, query=query)
-        
-        genders = []
-        genders_excluded = []
-        age_ranges = []
-        age_ranges_excluded = []
-        household_incomes = []
-        household_incomes_excluded = []
-        
-        for row in response:
-            criterion = row.ad_group_criterion
-            
-            # Separar criterios positivos y negativos
-            is_excluded = criterion.negative
-            
-            if criterion.type_.name == 'GENDER':
-                gender_id = str(criterion.gender.type.value)
-                if is_excluded:
-                    if gender_id not in genders_excluded:
-                        genders_excluded.append(gender_id)
-                else:
-                    if gender_id not in genders:
-                        genders.append(gender_id)
-            
-            elif criterion.type_.name == 'AGE_RANGE':
-                age_id = str(criterion.age_range.type.value)
-                if is_excluded:
-                    if age_id not in age_ranges_excluded:
-                        age_ranges_excluded.append(age_id)
-                else:
-                    if age_id not in age_ranges:
-                        age_ranges.append(age_id)
-            
-            elif criterion.type_.name == 'INCOME_RANGE':
-                income_id = str(criterion.income_range.type.value)
-                if is_excluded:
-                    if income_id not in household_incomes_excluded:
-                        household_incomes_excluded.append(income_id)
-                else:
-                    if income_id not in household_incomes:
-                        household_incomes.append(income_id)
-        
-        # Si no hay criterios configurados, significa que TODOS están activos por defecto
-        # (Google Ads sin restricciones = targeting a todos)
-        if len(genders) == 0 and len(age_ranges) == 0 and len(household_incomes) == 0:
-            print("⚠️ No hay criterios demográficos configurados - usando defaults (todos activos)")
-            
-            # Todos los géneros por defecto
-            genders = ["10", "11", "20"]  # Mujer, Hombre, Desconocido
-            
-            # Todas las edades por defecto
-            age_ranges = ["503001", "503002", "503003", "503004", "503005", "503006", "503999"]
-            
-            # Todos los ingresos por defecto
-            household_incomes = ["31000", "31001", "31002", "31003", "31004", "31005", "31006"]
-        
-        print(f"✅ Demographics cargadas:")
-        print(f"   Genders: {len(genders)} included, {len(genders_excluded)} excluded")
-        print(f"   Ages: {len(age_ranges)} included, {len(age_ranges_excluded)} excluded")
-        print(f"   Incomes: {len(household_incomes)} included, {len(household_incomes_excluded)} excluded")
+        response = google_ads_service.search(
+            customer_id=customer_id,
+            query=_demographic_criteria_query(customer_id, ad_group_id)
+        )
+        demographics = _collect_demographic_config(response)
         
         result = jsonify({
             "success": True,
             "message": "Configuración demográfica obtenida",
-            "demographics": {
-                "genders": genders,
-                "gendersExcluded": genders_excluded,
-                "ageRanges": age_ranges,
-                "ageRangesExcluded": age_ranges_excluded,
-                "householdIncomes": household_incomes,
-                "householdIncomesExcluded": household_incomes_excluded
-            }
+            "demographics": demographics
         })
         
         result.headers.add('Access-Control-Allow-Origin', '*')
@@ -3934,6 +4086,8 @@ def get_demographic_stats():
         customer_id = data.get('customerId')
         ad_group_id = data.get('adGroupId')
         days = data.get('days', 7)
+        # Opcional: devolver también la configuración de /api/demographics/get
+        include_config = bool(data.get('includeConfig', False))
         
         if not all([customer_id, ad_group_id]):
             result = jsonify({
@@ -3945,7 +4099,6 @@ def get_demographic_stats():
         
         # Crear cliente
         client = get_client_from_request()
-        google_ads_service = client.get_service("GoogleAdsService")
         
         # Calcular rango de fechas
         from datetime import datetime, timedelta
@@ -3956,172 +4109,15 @@ def get_demographic_stats():
         
         print(f"📊 [CORRECTED] Loading demographic stats for AdGroup {ad_group_id}, period: {date_start} to {date_end}")
         
-        stats = {
-            "gender": {},
-            "age": {},
-            "income": {}
-        }
-        
-        # ===== GÉNERO - Query usando gender_view =====
-        try:
-            gender_query = f"""
-                SELECT
-                    gender_view.resource_name,
-                    metrics.conversions,
-                    metrics.conversions_value,
-                    metrics.clicks,
-                    metrics.impressions,
-                    metrics.cost_micros
-                FROM gender_view
-                WHERE ad_group.id = {ad_group_id}
-                    AND segments.date BETWEEN '{date_start}' AND '{date_end}'
-            """
-            
-            gender_response = google_ads_service.search(customer_id=customer_id, query=gender_query)
-            
-            for row in gender_response:
-                # resource_name format: customers/X/genderViews/AD_GROUP_ID~CRITERION_ID
-                resource_name = row.gender_view.resource_name
-                criterion_id = resource_name.split('~')[-1]  # Extraer ID del final
-                
-                print(f"   🔹 Gender ID {criterion_id}: Conv={row.metrics.conversions}, Clicks={row.metrics.clicks}")
-                
-                if criterion_id not in stats["gender"]:
-                    stats["gender"][criterion_id] = {
-                        "conversions": 0,
-                        "conversionsValue": 0,
-                        "clicks": 0,
-                        "impressions": 0,
-                        "cost": 0,
-                        "isNegative": False
-                    }
-                
-                stats["gender"][criterion_id]["conversions"] += row.metrics.conversions
-                stats["gender"][criterion_id]["conversionsValue"] += row.metrics.conversions_value
-                stats["gender"][criterion_id]["clicks"] += row.metrics.clicks
-                stats["gender"][criterion_id]["impressions"] += row.metrics.impressions
-                stats["gender"][criterion_id]["cost"] += row.metrics.cost_micros / 1_000_000
-            
-            print(f"✅ Gender stats obtenidas: {len(stats['gender'])} segmentos")
-        
-        except Exception as e:
-            print(f"⚠️ Error loading gender stats: {str(e)}")
-            # Llenar con 0s en caso de error
-            for gender_id in ["10", "11", "20"]:
-                stats["gender"][gender_id] = {
-                    "conversions": 0.0,
-                    "conversionsValue": 0.0,
-                    "clicks": 0.0,
-                    "impressions": 0.0,
-                    "cost": 0.0,
-                    "isNegative": False
-                }
-        
-        # ===== EDAD - Query usando age_range_view =====
-        try:
-            age_query = f"""
-                SELECT
-                    age_range_view.resource_name,
-                    metrics.conversions,
-                    metrics.conversions_value,
-                    metrics.clicks,
-                    metrics.impressions,
-                    metrics.cost_micros
-                FROM age_range_view
-                WHERE ad_group.id = {ad_group_id}
-                    AND segments.date BETWEEN '{date_start}' AND '{date_end}'
-            """
-            
-            age_response = google_ads_service.search(customer_id=customer_id, query=age_query)
-            
-            for row in age_response:
-                # resource_name format: customers/X/ageRangeViews/AD_GROUP_ID~CRITERION_ID
-                resource_name = row.age_range_view.resource_name
-                criterion_id = resource_name.split('~')[-1]  # Extraer ID del final
-                
-                print(f"   🔹 Age ID {criterion_id}: Conv={row.metrics.conversions}, Clicks={row.metrics.clicks}")
-                
-                if criterion_id not in stats["age"]:
-                    stats["age"][criterion_id] = {
-                        "conversions": 0,
-                        "conversionsValue": 0,
-                        "clicks": 0,
-                        "impressions": 0,
-                        "cost": 0,
-                        "isNegative": False
-                    }
-                
-                stats["age"][criterion_id]["conversions"] += row.metrics.conversions
-                stats["age"][criterion_id]["conversionsValue"] += row.metrics.conversions_value
-                stats["age"][criterion_id]["clicks"] += row.metrics.clicks
-                stats["age"][criterion_id]["impressions"] += row.metrics.impressions
-                stats["age"][criterion_id]["cost"] += row.metrics.cost_micros / 1_000_000
-            
-            print(f"✅ Age stats obtenidas: {len(stats['age'])} segmentos")
-        
-        except Exception as e:
-            print(f"⚠️ Error loading age stats: {str(e)}")
-        
-        # ===== INGRESO - Query usando income_range_view =====
-        try:
-            # Mapeo: API devuelve 510xxx pero el modelo Swift espera 31xxx
-            income_id_map = {
-                "510000": "31006",  # UNDETERMINED -> UNDETERMINED
-                "510001": "31005",  # 0-50K
-                "510002": "31004",  # 50-60K
-                "510003": "31003",  # 60-70K
-                "510004": "31002",  # 70-80K
-                "510005": "31001",  # 80-UP
-                "510006": "31000",  # TOP_10_PERCENT
-            }
-            
-            income_query = f"""
-                SELECT
-                    income_range_view.resource_name,
-                    metrics.conversions,
-                    metrics.conversions_value,
-                    metrics.clicks,
-                    metrics.impressions,
-                    metrics.cost_micros
-                FROM income_range_view
-                WHERE ad_group.id = {ad_group_id}
-                    AND segments.date BETWEEN '{date_start}' AND '{date_end}'
-            """
-            
-            income_response = google_ads_service.search(customer_id=customer_id, query=income_query)
-            
-            for row in income_response:
-                # resource_name format: customers/X/incomeRangeViews/AD_GROUP_ID~CRITERION_ID
-                resource_name = row.income_range_view.resource_name
-                api_id = resource_name.split('~')[-1]  # Extraer ID de la API (510xxx)
-                criterion_id = income_id_map.get(api_id, api_id)  # Mapear a 31xxx
-                
-                print(f"   🔹 Income API_ID {api_id} -> {criterion_id}: Conv={row.metrics.conversions}, Clicks={row.metrics.clicks}")
-                
-                if criterion_id not in stats["income"]:
-                    stats["income"][criterion_id] = {
-                        "conversions": 0,
-                        "conversionsValue": 0,
-                        "clicks": 0,
-                        "impressions": 0,
-                        "cost": 0,
-                        "isNegative": False
-                    }
-                
-                stats["income"][criterion_id]["conversions"] += row.metrics.conversions
-                stats["income"][criterion_id]["conversionsValue"] += row.metrics.conversions_value
-                stats["income"][criterion_id]["clicks"] += row.metrics.clicks
-                stats["income"][criterion_id]["impressions"] += row.metrics.impressions
-                stats["income"][criterion_id]["cost"] += row.metrics.cost_micros / 1_000_000
-            
-            print(f"✅ Income stats obtenidas: {len(stats['income'])} segmentos")
-        
-        except Exception as e:
-            print(f"⚠️ Error loading income stats: {str(e)}")
+        # Género, edad e ingreso (y la configuración si se pide) en un solo set paralelo
+        stats, demographics, errors = fetch_demographics_bundle(
+            client, customer_id, ad_group_id, date_start, date_end,
+            include_config=include_config
+        )
         
         print(f"✅ [CORRECTED] Stats loaded: {len(stats['gender'])} gender, {len(stats['age'])} age, {len(stats['income'])} income")
         
-        result = jsonify({
+        payload = {
             "success": True,
             "stats": stats,
             "dateRange": {
@@ -4129,7 +4125,13 @@ def get_demographic_stats():
                 "end": date_end,
                 "days": days
             }
-        })
+        }
+        if include_config:
+            payload["demographics"] = demographics
+        if errors:
+            payload["errors"] = errors
+        
+        result = jsonify(payload)
         
         result.headers.add('Access-Control-Allow-Origin', '*')
         return result
@@ -4176,14 +4178,35 @@ def get_demographic_stats():
 # CIRCUIT BREAKER - Budget Protection System
 # ==========================================
 app.register_blueprint(circuit_breaker_bp)
-start_circuit_breaker_scheduler()
+init_circuit_breaker_db()
 
 # ==========================================
 # PROFIT GUARDIAN - Autonomous Profitability System
 # ==========================================
 app.register_blueprint(profit_guardian_bp)
-start_profit_guardian()
-print("🛡️ Profit Guardian registered and monitoring started")
+init_profit_guardian_db()
+
+
+def _start_schedulers_as_leader():
+    """Arranca los schedulers en background (solo corre en el proceso líder)"""
+    start_circuit_breaker_scheduler()
+    start_profit_guardian()
+    print("🛡️ Profit Guardian registered and monitoring started")
+
+
+def start_background_schedulers():
+    """
+    Registra los schedulers de Circuit Breaker y Profit Guardian con elección de líder.
+    Todos los workers sirven HTTP, pero solo uno ejecuta los jobs programados.
+    Bajo gunicorn se llama desde el hook post_fork (ver gunicorn_config.py).
+    """
+    get_scheduler_leader().run_when_leader(_start_schedulers_as_leader)
+
+
+# Con gunicorn la elección se hace en cada worker tras el fork (post_fork);
+# en servidores de un solo proceso (python app.py, run_server.py) se hace aquí.
+if os.getenv('SCHEDULER_START_MODE', 'import') == 'import':
+    start_background_schedulers()
 
 
 # ==========================================
@@ -4369,32 +4392,6 @@ def get_campaign_analytics():
             LIMIT 100
         """
         
-        keywords_response = ga_service.search(
-            customer_id=customer_id,
-            query=keywords_query
-        )
-        
-        keywords = []
-        for row in keywords_response:
-            criterion = row.ad_group_criterion
-            metrics = row.metrics
-            
-            keywords.append({
-                'id': str(criterion.criterion_id),
-                'ad_group_id': str(row.ad_group.id),
-                'keyword': criterion.keyword.text,
-                'match_type': criterion.keyword.match_type.name,
-                'quality_score': criterion.quality_info.quality_score if criterion.quality_info else None,
-                'impressions': int(metrics.impressions),
-                'clicks': int(metrics.clicks),
-                'conversions': float(metrics.conversions),
-                'cost': float(metrics.cost_micros) / 1_000_000,
-                'ctr': float(metrics.ctr) * 100,
-                'conversion_rate': float(metrics.conversions_from_interactions_rate) * 100
-            })
-        
-        print(f"✅ Found {len(keywords)} keywords")
-        
         # 2. Obtener ads
         ads_query = f"""
             SELECT
@@ -4417,38 +4414,6 @@ def get_campaign_analytics():
             LIMIT 50
         """
         
-        ads_response = ga_service.search(
-            customer_id=customer_id,
-            query=ads_query
-        )
-        
-        ads = []
-        for row in ads_response:
-            ad = row.ad_group_ad.ad
-            ad_group = row.ad_group
-            metrics = row.metrics
-            
-            # Extraer headlines
-            headlines = []
-            if ad.responsive_search_ad and ad.responsive_search_ad.headlines:
-                headlines = [h.text for h in ad.responsive_search_ad.headlines]
-            
-            ads.append({
-                'id': str(ad.id),
-                'ad_group_id': str(ad_group.id),
-                'ad_group_name': ad_group.name,
-                'headlines': headlines,
-                'status': row.ad_group_ad.status.name,
-                'impressions': int(metrics.impressions),
-                'clicks': int(metrics.clicks),
-                'conversions': float(metrics.conversions),
-                'cost': float(metrics.cost_micros) / 1_000_000,
-                'ctr': float(metrics.ctr) * 100,
-                'conversion_rate': float(metrics.conversions_from_interactions_rate) * 100
-            })
-        
-        print(f"✅ Found {len(ads)} ads")
-        
         # 3. Obtener hourly performance
         hourly_query = f"""
             SELECT
@@ -4463,17 +4428,84 @@ def get_campaign_analytics():
               AND segments.date BETWEEN '{start_date}' AND '{end_date}'
         """
         
-        hourly_response = ga_service.search(
-            customer_id=customer_id,
-            query=hourly_query
-        )
+        # 4. Obtener nombre de campaña
+        campaign_query = f"""
+            SELECT campaign.id, campaign.name
+            FROM campaign
+            WHERE campaign.id = '{campaign_id}'
+        """
+        
+        # Las 4 queries son independientes: ejecutarlas en paralelo sobre el mismo cliente
+        def fetch(query):
+            def task(timeout):
+                response = ga_service.search(customer_id=customer_id, query=query, timeout=timeout)
+                return get_projector(query, int64_as_string=False).project(iter_raw_rows(response))
+            return task
+        
+        def fetch_columns(query):
+            def task(timeout):
+                response = ga_service.search(customer_id=customer_id, query=query, timeout=timeout)
+                return get_projector(query, int64_as_string=False).to_columns(iter_raw_rows(response))
+            return task
+        
+        outcome = run_queries({
+            'keywords': fetch(keywords_query),
+            'ads': fetch(ads_query),
+            'hourly': fetch_columns(hourly_query),
+            'campaign': fetch(campaign_query),
+        })
+        print(f"⚡ Analytics queries completed in {outcome.elapsed_seconds:.2f}s")
+        
+        if len(outcome.errors) == 4:
+            # Nada que mostrar: mismo manejo de error que antes (GoogleAdsException -> 500)
+            raise next(iter(outcome.exceptions.values()))
         
-        # Agregar por hora
+        keywords = []
+        for r in outcome.results.get('keywords', []):
+            keywords.append({
+                'id': str(r['ad_group_criterion.criterion_id']),
+                'ad_group_id': str(r['ad_group.id']),
+                'keyword': r['ad_group_criterion.keyword.text'],
+                'match_type': r['ad_group_criterion.keyword.match_type'],
+                'quality_score': r['ad_group_criterion.quality_info.quality_score'] or None,
+                'impressions': int(r['metrics.impressions']),
+                'clicks': int(r['metrics.clicks']),
+                'conversions': float(r['metrics.conversions']),
+                'cost': float(r['metrics.cost_micros']) / 1_000_000,
+                'ctr': float(r['metrics.ctr']) * 100,
+                'conversion_rate': float(r['metrics.conversions_from_interactions_rate']) * 100
+            })
+        
+        print(f"✅ Found {len(keywords)} keywords")
+        
+        ads = []
+        for r in outcome.results.get('ads', []):
+            ads.append({
+                'id': str(r['ad_group_ad.ad.id']),
+                'ad_group_id': str(r['ad_group.id']),
+                'ad_group_name': r['ad_group.name'],
+                'headlines': [h.get('text', '') for h in r['ad_group_ad.ad.responsive_search_ad.headlines']],
+                'status': r['ad_group_ad.status'],
+                'impressions': int(r['metrics.impressions']),
+                'clicks': int(r['metrics.clicks']),
+                'conversions': float(r['metrics.conversions']),
+                'cost': float(r['metrics.cost_micros']) / 1_000_000,
+                'ctr': float(r['metrics.ctr']) * 100,
+                'conversion_rate': float(r['metrics.conversions_from_interactions_rate']) * 100
+            })
+        
+        print(f"✅ Found {len(ads)} ads")
+        
+        # Agregar por hora (columnas: un arreglo por campo)
+        columns = outcome.results.get('hourly') or {
+            'segments.hour': [], 'metrics.impressions': [], 'metrics.clicks': [],
+            'metrics.conversions': [], 'metrics.cost_micros': []
+        }
         hourly_data = {}
-        for row in hourly_response:
-            hour = row.segments.hour
-            metrics = row.metrics
-            
+        for hour, impressions, clicks, conversions, cost_micros in zip(
+            columns['segments.hour'], columns['metrics.impressions'], columns['metrics.clicks'],
+            columns['metrics.conversions'], columns['metrics.cost_micros']
+        ):
             if hour not in hourly_data:
                 hourly_data[hour] = {
                     'impressions': 0,
@@ -4482,10 +4514,10 @@ def get_campaign_analytics():
                     'cost': 0
                 }
             
-            hourly_data[hour]['impressions'] += int(metrics.impressions)
-            hourly_data[hour]['clicks'] += int(metrics.clicks)
-            hourly_data[hour]['conversions'] += float(metrics.conversions)
-            hourly_data[hour]['cost'] += float(metrics.cost_micros) / 1_000_000
+            hourly_data[hour]['impressions'] += int(impressions)
+            hourly_data[hour]['clicks'] += int(clicks)
+            hourly_data[hour]['conversions'] += float(conversions)
+            hourly_data[hour]['cost'] += float(cost_micros) / 1_000_000
         
         # Convertir a lista
         hourly_performance = []
@@ -4504,31 +4536,20 @@ def get_campaign_analytics():
         
         print(f"✅ Generated hourly performance data")
         
-        # Obtener nombre de campaña
-        campaign_query = f"""
-            SELECT campaign.id, campaign.name
-            FROM campaign
-            WHERE campaign.id = '{campaign_id}'
-        """
-        
-        campaign_response = ga_service.search(
-            customer_id=customer_id,
-            query=campaign_query
-        )
-        
         campaign_name = "Unknown Campaign"
-        for row in campaign_response:
-            campaign_name = row.campaign.name
-            break
+        for r in outcome.results.get('campaign', [])[:1]:
+            campaign_name = r['campaign.name']
         
-        # Respuesta completa
+        # Respuesta completa (partial=True si alguna query falló o excedió el deadline)
         result = jsonify({
             'success': True,
             'campaign_name': campaign_name,
             'date_range': f"{start_date} to {end_date}",
             'keywords': keywords,
             'ads': ads,
-            'hourly_performance': hourly_performance
+            'hourly_performance': hourly_performance,
+            'partial': outcome.partial,
+            'errors': outcome.errors
         })
         result.headers.add('Access-Control-Allow-Origin', '*')
         return result, 200
@@ -4795,27 +4816,31 @@ def top_campaign_final_urls():
             "SELECT campaign.id, campaign.name, campaign.status, campaign_budget.amount_micros "
             "FROM campaign WHERE campaign.status = 'ENABLED' ORDER BY campaign_budget.amount_micros DESC LIMIT 1"
         )
-        rows = service.search(customer_id=customer_id, query=query)
-        top_campaign_id = None
-        for row in rows:
-            top_campaign_id = row.campaign.id
-            break
-        if not top_campaign_id:
-            result = jsonify({"success": True, "finalUrls": []})
-            result.headers.add('Access-Control-Allow-Origin', '*')
-            return result
-        query_urls = (
-            "SELECT ad_group_ad.ad.final_urls FROM ad_group_ad "
-            f"WHERE campaign.id = '{top_campaign_id}' AND ad_group_ad.status = 'ENABLED'"
-        )
-        url_rows = service.search(customer_id=customer_id, query=query_urls)
-        urls = []
-        for row in url_rows:
-            if row.ad_group_ad.ad.final_urls:
-                urls.extend(list(row.ad_group_ad.ad.final_urls))
-        urls = list(dict.fromkeys(urls))
-        result = jsonify({"success": True, "campaignId": str(top_campaign_id), "finalUrls": urls})
+
+        def fetch_top_final_urls():
+            rows = service.search(customer_id=customer_id, query=query)
+            top_campaign_id = None
+            for row in rows:
+                top_campaign_id = row.campaign.id
+                break
+            if not top_campaign_id:
+                return {"success": True, "finalUrls": []}
+            query_urls = (
+                "SELECT ad_group_ad.ad.final_urls FROM ad_group_ad "
+                f"WHERE campaign.id = '{top_campaign_id}' AND ad_group_ad.status = 'ENABLED'"
+            )
+            url_rows = service.search(customer_id=customer_id, query=query_urls)
+            urls = []
+            for row in url_rows:
+                if row.ad_group_ad.ad.final_urls:
+                    urls.extend(list(row.ad_group_ad.ad.final_urls))
+            urls = list(dict.fromkeys(urls))
+            return {"success": True, "campaignId": str(top_campaign_id), "finalUrls": urls}
+
+        payload, cache_status = cached_google_ads_read(customer_id, ('top-final-urls', query), fetch_top_final_urls)
+        result = jsonify(payload)
         result.headers.add('Access-Control-Allow-Origin', '*')
+        result.headers['X-Cache'] = cache_status
         return result
     except GoogleAdsException as ex:
         errors = [error.message for error in ex.failure.errors]
@@ -5008,81 +5033,14 @@ def assets_summary():
         ga = get_client_from_request()
         service = ga.get_service('GoogleAdsService')
 
-        def list_linked_assets(query, is_campaign=True):
-            rows = service.search(customer_id=customer_id, query=query)
-            out = []
-            for r in rows:
-                if is_campaign:
-                    out.append((str(r.campaign_asset.asset), r.campaign_asset.field_type.name))
-                else:
-                    out.append((str(r.ad_group_asset.asset), r.ad_group_asset.field_type.name))
-            return out
-
-        camp_query = (
-            f"SELECT campaign.id, campaign_asset.asset, campaign_asset.field_type FROM campaign_asset "
-            f"WHERE campaign.id = '{campaign_id}' AND campaign_asset.status = 'ENABLED'"
+        payload, cache_status = cached_google_ads_read(
+            customer_id,
+            ('assets-summary', campaign_id, ad_group_id),
+            lambda: _fetch_assets_summary(service, customer_id, campaign_id, ad_group_id)
         )
-        camp_assets = list_linked_assets(camp_query, is_campaign=True)
-        adg_assets = []
-        if ad_group_id:
-            adg_query = (
-                f"SELECT ad_group.id, ad_group_asset.asset, ad_group_asset.field_type FROM ad_group_asset "
-                f"WHERE ad_group.id = '{ad_group_id}' AND ad_group_asset.status = 'ENABLED'"
-            )
-            adg_assets = list_linked_assets(adg_query, is_campaign=False)
-        linked = []
-        seen = set()
-        for rn, ft in camp_assets + adg_assets:
-            if rn not in seen:
-                seen.add(rn)
-                linked.append((rn, ft))
-
-        def get_asset_fields(res_name):
-            q = f"SELECT asset.resource_name, asset.sitelink_asset.link_text, asset.callout_asset.callout_text, asset.call_asset.country_code, asset.call_asset.phone_number, asset.promotion_asset.promotion_target, asset.promotion_asset.percent_off, asset.promotion_asset.money_amount_off.amount_micros FROM asset WHERE asset.resource_name = '{res_name}'"
-            rows = service.search(customer_id=customer_id, query=q)
-            out = {}
-            for r in rows:
-                out['resource_name'] = r.asset.resource_name
-                if r.asset.sitelink_asset and r.asset.sitelink_asset.link_text:
-                    out['type'] = 'SITELINK'
-                    out['text'] = r.asset.sitelink_asset.link_text
-                if r.asset.callout_asset and r.asset.callout_asset.callout_text:
-                    out['type'] = 'CALLOUT'
-                    out['text'] = r.asset.callout_asset.callout_text
-                if r.asset.call_asset and r.asset.call_asset.phone_number:
-                    out['type'] = 'CALL'
-                    out['phone'] = r.asset.call_asset.phone_number
-                if r.asset.promotion_asset and (r.asset.promotion_asset.promotion_target or r.asset.promotion_asset.percent_off):
-                    out['type'] = 'PROMOTION'
-                    out['event'] = r.asset.promotion_asset.promotion_target
-                    out['percent'] = r.asset.promotion_asset.percent_off
-                    out['amount_micros'] = r.asset.promotion_asset.money_amount_off.amount_micros if r.asset.promotion_asset.money_amount_off else None
-            return out
-
-        sitelinks = []
-        callouts = []
-        calls = []
-        promotions = []
-        for rn, ft in linked:
-            fields = get_asset_fields(rn)
-            t = fields.get('type')
-            if t == 'SITELINK' and fields.get('text'):
-                sitelinks.append({'text': fields.get('text'), 'resourceName': fields.get('resource_name')})
-            elif t == 'CALLOUT' and fields.get('text'):
-                callouts.append({'text': fields.get('text'), 'resourceName': fields.get('resource_name')})
-            elif t == 'CALL' and fields.get('phone'):
-                calls.append({'phone': fields.get('phone'), 'resourceName': fields.get('resource_name')})
-            elif t == 'PROMOTION':
-                promotions.append({'event': fields.get('event'), 'percent': fields.get('percent'), 'resourceName': fields.get('resource_name')})
-
-        result = jsonify({
-            "success": True,
-            "sitelinks": sitelinks,
-            "callouts": callouts,
-            "calls": calls,
-            "promotions": promotions
-        })
+        result = jsonify(payload)
         result.headers.add('Access-Control-Allow-Origin', '*')
+        result.headers['X-Cache'] = cache_status
         return result
     except GoogleAdsException as ex:
         errors = [error.message for error in ex.failure.errors]
@@ -5095,11 +5053,85 @@ def assets_summary():
         res.status_code = 500
         res.headers.add('Access-Control-Allow-Origin', '*')
         return res
-    except Exception as ex:
-        res = jsonify({"success": False, "message": str(ex)})
-        res.status_code = 500
-        res.headers.add('Access-Control-Allow-Origin', '*')
-        return res
+
+
+def _fetch_assets_summary(service, customer_id, campaign_id, ad_group_id):
+    """Sitelinks, callouts, llamadas y promociones vinculados a la campaña / ad group"""
+    def list_linked_assets(query, is_campaign=True):
+        rows = service.search(customer_id=customer_id, query=query)
+        out = []
+        for r in rows:
+            if is_campaign:
+                out.append((str(r.campaign_asset.asset), r.campaign_asset.field_type.name))
+            else:
+                out.append((str(r.ad_group_asset.asset), r.ad_group_asset.field_type.name))
+        return out
+
+    camp_query = (
+        f"SELECT campaign.id, campaign_asset.asset, campaign_asset.field_type FROM campaign_asset "
+        f"WHERE campaign.id = '{campaign_id}' AND campaign_asset.status = 'ENABLED'"
+    )
+    camp_assets = list_linked_assets(camp_query, is_campaign=True)
+    adg_assets = []
+    if ad_group_id:
+        adg_query = (
+            f"SELECT ad_group.id, ad_group_asset.asset, ad_group_asset.field_type FROM ad_group_asset "
+            f"WHERE ad_group.id = '{ad_group_id}' AND ad_group_asset.status = 'ENABLED'"
+        )
+        adg_assets = list_linked_assets(adg_query, is_campaign=False)
+    linked = []
+    seen = set()
+    for rn, ft in camp_assets + adg_assets:
+        if rn not in seen:
+            seen.add(rn)
+            linked.append((rn, ft))
+
+    def get_asset_fields(res_name):
+        q = f"SELECT asset.resource_name, asset.sitelink_asset.link_text, asset.callout_asset.callout_text, asset.call_asset.country_code, asset.call_asset.phone_number, asset.promotion_asset.promotion_target, asset.promotion_asset.percent_off, asset.promotion_asset.money_amount_off.amount_micros FROM asset WHERE asset.resource_name = '{res_name}'"
+        rows = service.search(customer_id=customer_id, query=q)
+        out = {}
+        for r in rows:
+            out['resource_name'] = r.asset.resource_name
+            if r.asset.sitelink_asset and r.asset.sitelink_asset.link_text:
+                out['type'] = 'SITELINK'
+                out['text'] = r.asset.sitelink_asset.link_text
+            if r.asset.callout_asset and r.asset.callout_asset.callout_text:
+                out['type'] = 'CALLOUT'
+                out['text'] = r.asset.callout_asset.callout_text
+            if r.asset.call_asset and r.asset.call_asset.phone_number:
+                out['type'] = 'CALL'
+                out['phone'] = r.asset.call_asset.phone_number
+            if r.asset.promotion_asset and (r.asset.promotion_asset.promotion_target or r.asset.promotion_asset.percent_off):
+                out['type'] = 'PROMOTION'
+                out['event'] = r.asset.promotion_asset.promotion_target
+                out['percent'] = r.asset.promotion_asset.percent_off
+                out['amount_micros'] = r.asset.promotion_asset.money_amount_off.amount_micros if r.asset.promotion_asset.money_amount_off else None
+        return out
+
+    sitelinks = []
+    callouts = []
+    calls = []
+    promotions = []
+    for rn, ft in linked:
+        fields = get_asset_fields(rn)
+        t = fields.get('type')
+        if t == 'SITELINK' and fields.get('text'):
+            sitelinks.append({'text': fields.get('text'), 'resourceName': fields.get('resource_name')})
+        elif t == 'CALLOUT' and fields.get('text'):
+            callouts.append({'text': fields.get('text'), 'resourceName': fields.get('resource_name')})
+        elif t == 'CALL' and fields.get('phone'):
+            calls.append({'phone': fields.get('phone'), 'resourceName': fields.get('resource_name')})
+        elif t == 'PROMOTION':
+            promotions.append({'event': fields.get('event'), 'percent': fields.get('percent'), 'resourceName': fields.get('resource_name')})
+
+    return {
+        "success": True,
+        "sitelinks": sitelinks,
+        "callouts": callouts,
+        "calls": calls,
+        "promotions": promotions
+    }
+
 @app.route('/api/assets/create-sitelink', methods=['POST', 'OPTIONS'])
 def create_sitelink_asset():
     if request.method == 'OPTIONS':
@@ -6449,20 +6481,19 @@ def list_campaigns():
             ORDER BY campaign.name
         """
         
-        response = ga_service.search(
-            customer_id=customer_id,
-            query=query
-        )
+        def fetch_campaigns():
+            campaigns = []
+            for row in ga_service.search(customer_id=customer_id, query=query):
+                campaigns.append({
+                    'id': str(row.campaign.id),
+                    'name': row.campaign.name,
+                    'status': row.campaign.status.name
+                })
+            return campaigns
         
-        campaigns = []
-        for row in response:
-            campaigns.append({
-                'id': str(row.campaign.id),
-                'name': row.campaign.name,
-                'status': row.campaign.status.name
-            })
+        campaigns, cache_status = cached_google_ads_read(customer_id, ('campaigns', query), fetch_campaigns)
         
-        print(f"✅ Encontradas {len(campaigns)} campañas")
+        print(f"✅ Encontradas {len(campaigns)} campañas (cache: {cache_status})")
         
         response = jsonify({
             'success': True,
@@ -6470,6 +6501,7 @@ def list_campaigns():
             'count': len(campaigns)
         })
         response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers['X-Cache'] = cache_status
         return response, 200
         
     except GoogleAdsException as ex:
@@ -6545,20 +6577,19 @@ def list_adgroups():
             ORDER BY ad_group.name
         """
         
-        response = ga_service.search(
-            customer_id=customer_id,
-            query=query
-        )
+        def fetch_ad_groups():
+            ad_groups = []
+            for row in ga_service.search(customer_id=customer_id, query=query):
+                ad_groups.append({
+                    'id': str(row.ad_group.id),
+                    'name': row.ad_group.name,
+                    'status': row.ad_group.status.name
+                })
+            return ad_groups
         
-        ad_groups = []
-        for row in response:
-            ad_groups.append({
-                'id': str(row.ad_group.id),
-                'name': row.ad_group.name,
-                'status': row.ad_group.status.name
-            })
+        ad_groups, cache_status = cached_google_ads_read(customer_id, ('adgroups', query), fetch_ad_groups)
         
-        print(f"✅ Encontrados {len(ad_groups)} grupos de anuncios")
+        print(f"✅ Encontrados {len(ad_groups)} grupos de anuncios (cache: {cache_status})")
         
         response = jsonify({
             'success': True,
@@ -6566,6 +6597,7 @@ def list_adgroups():
             'count': len(ad_groups)
         })
         response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers['X-Cache'] = cache_status
         return response, 200
         
     except GoogleAdsException as ex:
@@ -7099,6 +7131,66 @@ def create_keyword():
 
 # Agregar este endpoint al final de app.py antes de la última línea
 
+
+def _stream_query_response(ga_service, search_request, projector: RowProjector, stream_format: str):
+    """
+    Respuesta en streaming para /api/query: cada batch de search_stream se
+    serializa y se envía apenas llega, sin acumular resultados en memoria.
+
+    - ndjson: una fila JSON por línea y una línea final {"_meta": {...}}
+    - json-stream: el mismo objeto que el modo normal ({"success", "results", "count"})
+      enviado por chunks
+    """
+    batches = iter(ga_service.search_stream(search_request))
+    # Pedir el primer batch antes de responder: errores de query/permisos siguen dando 500
+    first_batch = next(batches, None)
+    ndjson = stream_format == 'ndjson'
+
+    def generate():
+        count = 0
+        error = None
+        if not ndjson:
+            yield '{"success": true, "results": ['
+
+        try:
+            pending = [first_batch] if first_batch is not None else []
+            for batch in itertools.chain(pending, batches):
+                rows = [json.dumps(projector.to_dict(row), separators=(',', ':')) for row in raw_row(batch).results]
+                if not rows:
+                    continue
+                if ndjson:
+                    yield '\n'.join(rows) + '\n'
+                else:
+                    yield (',' if count else '') + ','.join(rows)
+                count += len(rows)
+        except GoogleAdsException as ex:
+            error = '; '.join(e.message for e in ex.failure.errors) if ex.failure else str(ex)
+        except Exception as ex:
+            error = str(ex)
+
+        if error:
+            print(f"❌ Query en streaming interrumpida tras {count} filas: {error}")
+        else:
+            print(f"✅ Query en streaming completada. Resultados: {count}")
+
+        if ndjson:
+            yield json.dumps({'_meta': {'done': error is None, 'count': count, 'error': error}}) + '\n'
+        else:
+            tail = {'count': count}
+            if error:
+                tail['error'] = error
+            yield '], ' + json.dumps(tail)[1:]
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson' if ndjson else 'application/json'
+    )
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/api/query', methods=['POST', 'OPTIONS'])
 def execute_query():
     """Ejecuta una query GAQL personalizada"""
@@ -7135,102 +7227,26 @@ def execute_query():
         search_request.customer_id = customer_id
         search_request.query = query
         
+        # Streaming opt-in: {"stream": true}, {"format": "ndjson" | "json-stream"} o Accept: application/x-ndjson
+        stream_format = (data.get('format') or request.args.get('format') or '').lower()
+        if not stream_format and (data.get('stream') or 'application/x-ndjson' in request.headers.get('Accept', '')):
+            stream_format = 'ndjson'
+        if stream_format in ('ndjson', 'json-stream'):
+            try:
+                projector = get_projector(query)
+                projector.ensure_compiled(raw_row(client.get_type("GoogleAdsRow")))
+            except ValueError as e:
+                response = jsonify({'success': False, 'error': str(e)})
+                response.headers.add('Access-Control-Allow-Origin', '*')
+                return response, 400
+            return _stream_query_response(ga_service, search_request, projector, stream_format)
+        
         results_list = []
         stream = ga_service.search_stream(search_request)
         
         for batch in stream:
-            for row in batch.results:
-                # Convertir el resultado a diccionario
-                row_dict = {}
-                
-                # customer_client (para queries de cuentas MCC)
-                if hasattr(row, 'customer_client'):
-                    client = row.customer_client
-                    row_dict['customerClient'] = {
-                        'id': str(client.id),
-                        'descriptiveName': client.descriptive_name,
-                        'currencyCode': client.currency_code,
-                        'timeZone': client.time_zone,
-                        'status': client.status.name if hasattr(client, 'status') else 'UNKNOWN'
-                    }
-                
-                # customer (para queries de información de cuenta)
-                if hasattr(row, 'customer'):
-                    customer = row.customer
-                    row_dict['customer'] = {
-                        'id': str(customer.id),
-                        'descriptiveName': customer.descriptive_name,
-                        'currencyCode': customer.currency_code,
-                        'timeZone': customer.time_zone,
-                        'status': customer.status.name if hasattr(customer, 'status') else 'UNKNOWN'
-                    }
-                
-                # Extraer campos según lo que tenga el row
-                if hasattr(row, 'ad_group_criterion'):
-                    criterion = row.ad_group_criterion
-                    row_dict['adGroupCriterion'] = {
-                        'criterionId': str(criterion.criterion_id),
-                        'status': criterion.status.name if hasattr(criterion, 'status') else None,
-                    }
-                    
-                    if hasattr(criterion, 'keyword'):
-                        row_dict['adGroupCriterion']['keyword'] = {
-                            'text': criterion.keyword.text,
-                            'matchType': criterion.keyword.match_type.name
-                        }
-                    
-                    if hasattr(criterion, 'quality_info'):
-                        qi = criterion.quality_info
-                        row_dict['adGroupCriterion']['qualityInfo'] = {
-                            'qualityScore': qi.quality_score if hasattr(qi, 'quality_score') else None
-                        }
-                
-                if hasattr(row, 'ad_group'):
-                    row_dict['adGroup'] = {
-                        'id': str(row.ad_group.id),
-                        'name': row.ad_group.name
-                    }
-                
-                if hasattr(row, 'ad_group_ad'):
-                    ad_group_ad = row.ad_group_ad
-                    row_dict['adGroupAd'] = {
-                        'status': ad_group_ad.status.name if hasattr(ad_group_ad, 'status') else None
-                    }
-                    
-                    if hasattr(ad_group_ad, 'ad'):
-                        ad = ad_group_ad.ad
-                        ad_dict = {
-                            'id': str(ad.id),
-                            'type': ad.type_.name if hasattr(ad, 'type_') else None
-                        }
-                        
-                        if hasattr(ad, 'responsive_search_ad'):
-                            rsa = ad.responsive_search_ad
-                            ad_dict['responsiveSearchAd'] = {
-                                'headlines': [{'text': h.text} for h in rsa.headlines] if hasattr(rsa, 'headlines') else [],
-                                'descriptions': [{'text': d.text} for d in rsa.descriptions] if hasattr(rsa, 'descriptions') else []
-                            }
-                        
-                        row_dict['adGroupAd']['ad'] = ad_dict
-                
-                if hasattr(row, 'campaign'):
-                    row_dict['campaign'] = {
-                        'id': str(row.campaign.id),
-                        'name': row.campaign.name
-                    }
-                
-                if hasattr(row, 'metrics'):
-                    metrics = row.metrics
-                    row_dict['metrics'] = {
-                        'impressions': str(metrics.impressions) if hasattr(metrics, 'impressions') else '0',
-                        'clicks': str(metrics.clicks) if hasattr(metrics, 'clicks') else '0',
-                        'costMicros': str(metrics.cost_micros) if hasattr(metrics, 'cost_micros') else '0',
-                        'conversions': metrics.conversions if hasattr(metrics, 'conversions') else 0.0,
-                        'ctr': metrics.ctr if hasattr(metrics, 'ctr') else 0.0,
-                        'conversionsFromInteractionsRate': metrics.conversions_from_interactions_rate if hasattr(metrics, 'conversions_from_interactions_rate') else 0.0
-                    }
-                
-                results_list.append(row_dict)
+            for row in raw_row(batch).results:
+                results_list.append(QUERY_RESULT_PROJECTOR.to_dict(row))
         
         print(f"✅ Query ejecutada exitosamente. Resultados: {len(results_list)}")
         
@@ -7299,37 +7315,42 @@ def get_ad_final_urls():
             LIMIT 100
         """
         
-        response = ga_service.search(customer_id=customer_id, query=query)
-        
-        urls = []
-        for row in response:
-            ad = row.ad_group_ad.ad
-            if ad.final_urls:
-                urls.extend(list(ad.final_urls))
-                
-        # 2. Fallback: Buscar en toda la cuenta si no hay URLs en el grupo
-        if not urls:
-            print(f"⚠️ No URLs found in AdGroup {ad_group_id}, trying fallback...")
-            fallback_query = """
-                SELECT ad_group_ad.ad.final_urls
-                FROM ad_group_ad
-                WHERE ad_group_ad.status = 'ENABLED'
-                LIMIT 50
-            """
-            fallback_response = ga_service.search(customer_id=customer_id, query=fallback_query)
-            for row in fallback_response:
+        def fetch_final_urls():
+            response = ga_service.search(customer_id=customer_id, query=query)
+            
+            urls = []
+            for row in response:
                 ad = row.ad_group_ad.ad
                 if ad.final_urls:
                     urls.extend(list(ad.final_urls))
+                    
+            # 2. Fallback: Buscar en toda la cuenta si no hay URLs en el grupo
+            if not urls:
+                print(f"⚠️ No URLs found in AdGroup {ad_group_id}, trying fallback...")
+                fallback_query = """
+                    SELECT ad_group_ad.ad.final_urls
+                    FROM ad_group_ad
+                    WHERE ad_group_ad.status = 'ENABLED'
+                    LIMIT 50
+                """
+                fallback_response = ga_service.search(customer_id=customer_id, query=fallback_query)
+                for row in fallback_response:
+                    ad = row.ad_group_ad.ad
+                    if ad.final_urls:
+                        urls.extend(list(ad.final_urls))
+            
+            # Filtrar duplicados y vacíos
+            return list(set([u for u in urls if u and (u.startswith('http') or u.startswith('https'))]))
+        
+        unique_urls, cache_status = cached_google_ads_read(customer_id, ('ad-final-urls', query), fetch_final_urls)
         
-        # Filtrar duplicados y vacíos
-        unique_urls = list(set([u for u in urls if u and (u.startswith('http') or u.startswith('https'))]))
-        
-        return jsonify({
+        response = jsonify({
             "success": True,
             "urls": unique_urls,
             "count": len(unique_urls)
         })
+        response.headers['X-Cache'] = cache_status
+        return response
         
     except Exception as e:
         print(f"❌ Error getting ad URLs: {str(e)}")
@@ -8223,7 +8244,7 @@ def start_automation():
             )
         
         # Enviar job al worker pool
-        automation_worker.submit_job(job_id, config, client_factory)
+        get_automation_worker().submit_job(job_id, config, client_factory)
         
         print(f"✅ Job {job_id} enviado al worker pool")
         
@@ -8416,7 +8437,7 @@ def cancel_automation(job_id):
         return response, 400
     
     try:
-        cancelled = automation_worker.cancel_job(job_id)
+        cancelled = get_automation_worker().cancel_job(job_id)
         
         if cancelled:
             result = jsonify({
@@ -8636,8 +8657,8 @@ def diagnostic():
             "sqlalchemy": sqlalchemy_version
         },
         "worker_status": {
-            "active_jobs": len(automation_worker.active_jobs),
-            "max_workers": automation_worker.executor._max_workers
+            "active_jobs": len(get_automation_worker().active_jobs),
+            "max_workers": get_automation_worker().executor._max_workers
         }
     })
     
@@ -8649,33 +8670,10 @@ def diagnostic():
 # WEB CLONER ENDPOINTS
 # ============================================================================
 
-# File-based storage for cloning jobs (persistent across restarts)
-import json
-from threading import Lock
+# SQLite-backed storage for cloning jobs (shared across workers, persistent across restarts)
+from cloning_job_store import get_cloning_job_store
 
-CLONING_JOBS_FILE = '/tmp/cloning_jobs.json'
-jobs_lock = Lock()
-
-def load_cloning_jobs():
-    """Load jobs from file"""
-    try:
-        if os.path.exists(CLONING_JOBS_FILE):
-            with open(CLONING_JOBS_FILE, 'r') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.error(f"Error loading cloning jobs: {e}")
-    return {}
-
-def save_cloning_jobs(jobs):
-    """Save jobs to file"""
-    try:
-        with open(CLONING_JOBS_FILE, 'w') as f:
-            json.dump(jobs, f)
-    except Exception as e:
-        logger.error(f"Error saving cloning jobs: {e}")
-
-# Initialize from file
-cloning_jobs = load_cloning_jobs()
+cloning_job_store = get_cloning_job_store()
 
 
 def validate_url(url: str) -> Tuple[bool, Optional[str]]:
@@ -8726,17 +8724,15 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
     """Background task to clone website using Playwright (primary) or requests (fallback)"""
     
     def update_status(status: str, progress: int, message: str, data: dict = None):
-        with jobs_lock:
-            cloning_jobs[job_id].update({
-                'status': status,
-                'progress': progress,
-                'message': message,
-                'updated_at': datetime.now().isoformat()
-            })
-            if data:
-                cloning_jobs[job_id].update(data)
-            # Persist to file
-            save_cloning_jobs(cloning_jobs)
+        fields = {
+            'status': status,
+            'progress': progress,
+            'message': message,
+            'updated_at': datetime.now().isoformat()
+        }
+        if data:
+            fields.update(data)
+        cloning_job_store.update_job(job_id, **fields)
     
     resources = None
     result = None
@@ -8745,7 +8741,8 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
     try:
         # Try Playwright first (better for sites with anti-bot protection)
         try:
-            from playwright_cloner import clone_with_playwright, PLAYWRIGHT_AVAILABLE
+            import importlib.util
+            PLAYWRIGHT_AVAILABLE = importlib.util.find_spec('playwright') is not None
             
             if PLAYWRIGHT_AVAILABLE:
                 update_status('cloning', 5, '🎭 Iniciando navegador Playwright...')
@@ -8755,12 +8752,19 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
                     mapped_pct = 5 + int(pct * 0.55)
                     update_status('cloning', mapped_pct, msg)
                 
-                result, resources = clone_with_playwright(
-                    url=url,
-                    whatsapp=whatsapp or None,
-                    phone=phone or None,
-                    gtm_id=gtm_id or None,
-                    progress_callback=progress_callback
+                # Runs in a child process; the browser is bounded by the RSS watchdog
+                result, resources = run_heavy_task(
+                    'playwright_clone',
+                    'playwright_cloner:clone_with_playwright',
+                    kwargs=dict(
+                        url=url,
+                        whatsapp=whatsapp or None,
+                        phone=phone or None,
+                        gtm_id=gtm_id or None
+                    ),
+                    progress_callback=progress_callback,
+                    limit_address_space=False,
+                    rss_limit_mb=HEAVY_TASK_BROWSER_RSS_LIMIT_MB
                 )
                 
                 if result.get('success') and resources and len(resources) > 0:
@@ -8784,17 +8788,18 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
         if not use_playwright or not resources:
             update_status('cloning', 10, 'Downloading website resources (fallback mode)...')
             
-            config = WebClonerConfig()
-            config.timeout = 30
-            config.max_retries = 3
-            cloner = WebCloner(config)
-            
             update_status('cloning', 30, 'Processing HTML and assets...')
-            result = cloner.clone_website(
-                url=url,
-                whatsapp=whatsapp or None,
-                phone=phone or None,
-                gtm_id=gtm_id or None
+            result, resources = run_heavy_task(
+                'web_clone',
+                'web_cloner:clone_with_requests',
+                kwargs=dict(
+                    url=url,
+                    whatsapp=whatsapp or None,
+                    phone=phone or None,
+                    gtm_id=gtm_id or None,
+                    timeout=30,
+                    max_retries=3
+                )
             )
             
             if not isinstance(result, dict):
@@ -8805,8 +8810,6 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
                 error_msg = result.get('error', 'Unknown error during cloning')
                 update_status('failed', 0, f"Failed to clone: {error_msg}")
                 return
-            
-            resources = cloner.get_resources()
         
         # Validate resources were downloaded
         if not resources or len(resources) == 0:
@@ -8815,12 +8818,26 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
             
         update_status('uploading', 65, f'Uploading {len(resources)} files to GitHub...')
         
-        # Upload to GitHub
+        # Blobs already uploaded by an interrupted upload of the same site are not sent again
+        previous_job = cloning_job_store.find_by_site_name(site_name, exclude_job_id=job_id)
+        known_blobs = (previous_job or {}).get('uploaded_blobs') or []
+        
+        def upload_progress(done, total, uploaded_blobs):
+            # Map upload progress to our progress range (65-84)
+            update_status('uploading', 65 + int(done * 19 / max(total, 1)), f'Uploaded {done}/{total} files to GitHub...', {
+                'upload_done': done,
+                'upload_total': total,
+                'uploaded_blobs': uploaded_blobs
+            })
+        
+        # Upload to GitHub (parallel blobs, one commit for the whole site)
         uploader = GitHubClonerUploader()
         upload_result = uploader.upload_cloned_website(
             site_name=site_name,
             resources=resources,
-            optimize_for_jsdelivr=True  # Use jsDelivr CDN URLs for reliability
+            optimize_for_jsdelivr=True,  # Use jsDelivr CDN URLs for reliability
+            progress_callback=upload_progress,
+            known_blobs=known_blobs
         )
         
         if not upload_result.get('success'):
@@ -8859,6 +8876,7 @@ def clone_website_task(job_id: str, url: str, site_name: str, whatsapp: str, pho
             'jsdelivr_url': upload_result.get('jsdelivr_url'),
             'raw_url': upload_result.get('raw_url'),
             'files_uploaded': upload_result.get('uploaded_files', 0),
+            'commit_sha': upload_result.get('commit_sha'),
             'total_files': upload_result.get('total_files', len(resources)),
             'total_resources': len(resources),
             'resources_by_type': result.get('resources_by_type', {}) if result else {},
@@ -8945,19 +8963,14 @@ def clone_website_endpoint():
         job_id = str(uuid.uuid4())
         
         # Create job entry
-        with jobs_lock:
-            cloning_jobs[job_id] = {
-                'job_id': job_id,
-                'url': url,
-                'site_name': site_name,
-                'status': 'queued',
-                'progress': 0,
-                'message': 'Job queued...',
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            # Persist immediately
-            save_cloning_jobs(cloning_jobs)
+        cloning_job_store.create_job(
+            job_id,
+            url=url,
+            site_name=site_name,
+            status='queued',
+            progress=0,
+            message='Job queued...'
+        )
         
         # Start background task
         import threading
@@ -9000,26 +9013,10 @@ def get_clone_status(job_id):
         return response
     
     try:
-        job = None
-        
-        # First try from memory
-        with jobs_lock:
-            job = cloning_jobs.get(job_id)
-        
-        # If not in memory, try reloading from file (handles multi-instance or restart cases)
-        if not job:
-            logger.info(f"Job {job_id} not in memory, trying to reload from file...")
-            reloaded_jobs = load_cloning_jobs()
-            job = reloaded_jobs.get(job_id)
-            
-            # If found in file, update memory cache
-            if job:
-                with jobs_lock:
-                    cloning_jobs[job_id] = job
-                logger.info(f"Job {job_id} reloaded from file")
-            
+        job = cloning_job_store.get_job(job_id)
+
         if not job:
-            logger.warning(f"Job {job_id} not found in memory or file")
+            logger.warning(f"Job {job_id} not found")
             return jsonify({
                 'success': False,
                 'error': 'Job not found'
@@ -9258,11 +9255,9 @@ def verify_cloned_site_by_name(site_name):
         
         # Intentar encontrar la URL original en los jobs guardados
         original_url = ''
-        jobs = load_cloning_jobs()
-        for job_id, job in jobs.items():
-            if job.get('site_name') == site_name or job.get('folder_name') == site_name:
-                original_url = job.get('url', job.get('original_url', ''))
-                break
+        job = cloning_job_store.find_by_site_name(site_name)
+        if job:
+            original_url = job.get('url', job.get('original_url', ''))
         
         # Verificar
         verification_result = verify_cloned_site(html_content, original_url)
@@ -9331,7 +9326,7 @@ def run_automation_rules():
             'login_customer_id': os.getenv('LOGIN_CUSTOMER_ID')
         }
         
-        client = GoogleAdsClient.load_from_dict(credentials)
+        client = get_pooled_client(credentials)
         ga_service = client.get_service("GoogleAdsService")
         
         # 1. Fetch Keywords con métricas relevantes
@@ -9440,7 +9435,7 @@ def get_ads_performance():
             "use_proto_plus": True,
             "login_customer_id": os.getenv("GOOGLE_ADS_LOGIN_CUSTOMER_ID", "8531174172")
         }
-        client = GoogleAdsClient.load_from_dict(credentials)
+        client = get_pooled_client(credentials)
         ga_service = client.get_service("GoogleAdsService")
         
         # Date range
@@ -9468,36 +9463,25 @@ def get_ads_performance():
         """
         
         response = ga_service.search(customer_id=customer_id, query=query)
+        projector = get_projector(query, int64_as_string=False)
         
         ads = []
-        for row in response:
-            ad = row.ad_group_ad.ad
-            
-            # Extract headlines
-            headlines = []
-            if hasattr(ad, 'responsive_search_ad') and ad.responsive_search_ad.headlines:
-                for h in ad.responsive_search_ad.headlines:
-                    if h.text:
-                        headlines.append(h.text)
-            
-            # Extract descriptions
-            descriptions = []
-            if hasattr(ad, 'responsive_search_ad') and ad.responsive_search_ad.descriptions:
-                for d in ad.responsive_search_ad.descriptions:
-                    if d.text:
-                        descriptions.append(d.text)
+        for row in iter_raw_rows(response):
+            r = projector.to_flat_dict(row)
+            headlines = [h['text'] for h in r['ad_group_ad.ad.responsive_search_ad.headlines'] if h.get('text')]
+            descriptions = [d['text'] for d in r['ad_group_ad.ad.responsive_search_ad.descriptions'] if d.get('text')]
             
             ads.append({
-                'id': str(ad.id),
-                'adGroupId': str(row.ad_group.id),
-                'adGroupName': row.ad_group.name,
+                'id': str(r['ad_group_ad.ad.id']),
+                'adGroupId': str(r['ad_group.id']),
+                'adGroupName': r['ad_group.name'],
                 'headlines': headlines if headlines else ['Sin título'],
                 'descriptions': descriptions if descriptions else ['Sin descripción'],
-                'impressions': row.metrics.impressions,
-                'clicks': row.metrics.clicks,
-                'costMicros': row.metrics.cost_micros,
-                'conversions': row.metrics.conversions,
-                'status': row.ad_group_ad.status.name
+                'impressions': r['metrics.impressions'],
+                'clicks': r['metrics.clicks'],
+                'costMicros': r['metrics.cost_micros'],
+                'conversions': r['metrics.conversions'],
+                'status': r['ad_group_ad.status']
             })
         
         return jsonify({
@@ -9539,7 +9523,7 @@ def get_keywords_performance():
             "use_proto_plus": True,
             "login_customer_id": os.getenv("GOOGLE_ADS_LOGIN_CUSTOMER_ID", "8531174172")
         }
-        client = GoogleAdsClient.load_from_dict(credentials)
+        client = get_pooled_client(credentials)
         ga_service = client.get_service("GoogleAdsService")
         
         # Date range
@@ -9568,28 +9552,25 @@ def get_keywords_performance():
         """
         
         response = ga_service.search(customer_id=customer_id, query=query)
+        projector = get_projector(query, int64_as_string=False)
         
         keywords = []
-        for row in response:
-            criterion = row.ad_group_criterion
-            
-            # Quality Score (might not be available for all keywords)
-            quality_score = None
-            if hasattr(criterion, 'quality_info') and criterion.quality_info.quality_score:
-                quality_score = criterion.quality_info.quality_score
+        for row in iter_raw_rows(response):
+            r = projector.to_flat_dict(row)
             
             keywords.append({
-                'id': str(criterion.criterion_id),
-                'adGroupId': str(row.ad_group.id),
-                'adGroupName': row.ad_group.name,
-                'text': criterion.keyword.text,
-                'matchType': criterion.keyword.match_type.name,
-                'impressions': row.metrics.impressions,
-                'clicks': row.metrics.clicks,
-                'costMicros': row.metrics.cost_micros,
-                'conversions': row.metrics.conversions,
-                'qualityScore': quality_score,
-                'status': criterion.status.name
+                'id': str(r['ad_group_criterion.criterion_id']),
+                'adGroupId': str(r['ad_group.id']),
+                'adGroupName': r['ad_group.name'],
+                'text': r['ad_group_criterion.keyword.text'],
+                'matchType': r['ad_group_criterion.keyword.match_type'],
+                'impressions': r['metrics.impressions'],
+                'clicks': r['metrics.clicks'],
+                'costMicros': r['metrics.cost_micros'],
+                'conversions': r['metrics.conversions'],
+                # Quality Score (might not be available for all keywords)
+                'qualityScore': r['ad_group_criterion.quality_info.quality_score'] or None,
+                'status': r['ad_group_criterion.status']
             })
         
         return jsonify({
@@ -10050,6 +10031,9 @@ def batch_pause_ads():
         return result, 500
 
 
+mark_app_ready()
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))
     app.run(host='0.0.0.0', port=port)
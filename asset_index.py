@@ -0,0 +1,194 @@
+"""
+Asset Index
+===========
+Índice local (SQLite WAL, compartido entre workers) de assets ya publicados,
+direccionado por contenido: sha256 -> ruta en el repo y SHA del blob de Git.
+
+Antes cada landing subía sus imágenes con un nombre uuid y cada sitio
+clonado volvía a subir las mismas fuentes, frameworks CSS y logos. Con el
+índice:
+
+- Los assets binarios se publican en rutas compartidas `_assets/<sha256><ext>`:
+  el mismo contenido siempre tiene la misma URL en jsDelivr (una sola
+  entrada de cache para todas las landings/clones que lo usan).
+- Si el contenido ya está publicado en el repo, el commit referencia el blob
+  existente por su SHA en lugar de volver a subir los bytes.
+- El índice es un atajo, no la fuente de verdad: si GitHub rechaza un blob
+  referenciado, el publicador lo sube de nuevo y la entrada se reemplaza.
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlite_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+ASSET_INDEX_DB = os.getenv('ASSET_INDEX_DB', 'asset_index.db')
+ASSET_DEDUPE_ENABLED = os.getenv('ASSET_DEDUPE_ENABLED', 'true').lower() != 'false'
+SHARED_ASSETS_DIR = os.getenv('SHARED_ASSETS_DIR', '_assets')
+# Archivos más chicos no justifican una ruta compartida (la request extra cuesta más)
+ASSET_DEDUPE_MIN_BYTES = int(os.getenv('ASSET_DEDUPE_MIN_BYTES', '1024'))
+
+# Contenido binario que se comparte entre sitios (HTML/CSS/JS se reescriben por sitio)
+SHAREABLE_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.ico', '.bmp',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot',
+    '.mp4', '.webm', '.mp3', '.pdf'
+)
+
+
+# Fragmentos del 422 de POST /git/trees cuando un blob referenciado no existe
+_MISSING_OBJECT_MARKERS = ('badobjectstate', 'invalid tree info', 'not a valid blob', 'object does not exist')
+
+
+class MissingBlobError(RuntimeError):
+    """GitHub rechazó el árbol porque un blob referenciado ya no está en el repo"""
+
+
+def is_missing_blob_response(status_code: int, body: str) -> bool:
+    """422 de creación de árbol por objetos inexistentes (no auth, rate limit ni otra validación)"""
+    body = (body or '').lower()
+    return status_code == 422 and any(marker in body for marker in _MISSING_OBJECT_MARKERS)
+
+
+def content_sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def git_blob_sha(content: bytes) -> str:
+    """SHA que GitHub asigna a un blob con este contenido"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def is_shareable(filename: str, content: bytes) -> bool:
+    return (
+        ASSET_DEDUPE_ENABLED
+        and len(content) >= ASSET_DEDUPE_MIN_BYTES
+        and filename.lower().endswith(SHAREABLE_EXTENSIONS)
+    )
+
+
+def shared_asset_path(sha256: str, filename: str) -> str:
+    """Ruta compartida en el repo para un contenido: _assets/<sha256><ext>"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{SHARED_ASSETS_DIR}/{sha256}{ext}"
+
+
+ASSET_INDEX_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS asset_index (
+            repo TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            path TEXT NOT NULL,
+            blob_sha TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            uses INTEGER NOT NULL DEFAULT 1,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            PRIMARY KEY (repo, sha256)
+        )
+    ''',
+)
+
+
+class AssetIndex:
+    """sha256 -> (ruta publicada, blob SHA) por repositorio"""
+
+    def __init__(self, db_path: str = ASSET_INDEX_DB):
+        self.db_path = db_path
+        self._hits = 0
+        self._misses = 0
+
+    def _get_db(self) -> sqlite3.Connection:
+        return get_connection(self.db_path, schema=ASSET_INDEX_SCHEMA)
+
+    def lookup(self, repo: str, sha256: str) -> Optional[Dict[str, Any]]:
+        """Entrada publicada para este contenido en `repo` (owner/name), o None"""
+        if not ASSET_DEDUPE_ENABLED:
+            return None
+        try:
+            conn = self._get_db()
+            try:
+                row = conn.execute(
+                    'SELECT path, blob_sha, size FROM asset_index WHERE repo = ? AND sha256 = ?',
+                    (repo, sha256)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Índice de assets no disponible: {e}")
+            return None
+
+        if row is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return {'path': row[0], 'blob_sha': row[1], 'size': row[2]}
+
+    def record_many(self, repo: str, entries: Iterable[Tuple[str, str, str, int]]):
+        """Registra (sha256, path, blob_sha, size) publicados en un commit ya aplicado"""
+        now = time.time()
+        rows = [(repo, sha256, path, blob_sha, size, now, now) for sha256, path, blob_sha, size in entries]
+        if not rows or not ASSET_DEDUPE_ENABLED:
+            return
+        try:
+            conn = self._get_db()
+            try:
+                conn.executemany('''
+                    INSERT INTO asset_index (repo, sha256, path, blob_sha, size, uses, created_at, last_used_at)
+                    VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+                    ON CONFLICT(repo, sha256) DO UPDATE SET
+                        path = excluded.path,
+                        blob_sha = excluded.blob_sha,
+                        uses = asset_index.uses + 1,
+                        last_used_at = excluded.last_used_at
+                ''', rows)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo actualizar el índice de assets: {e}")
+
+    def forget(self, repo: str, sha256s: Iterable[str]):
+        """Descarta entradas que GitHub rechazó (el blob ya no existe en el repo)"""
+        rows = [(repo, sha256) for sha256 in sha256s]
+        if not rows:
+            return
+        try:
+            conn = self._get_db()
+            try:
+                conn.executemany('DELETE FROM asset_index WHERE repo = ? AND sha256 = ?', rows)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo limpiar el índice de assets: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {"enabled": ASSET_DEDUPE_ENABLED, "hits": self._hits, "misses": self._misses}
+        try:
+            conn = self._get_db()
+            try:
+                count, total_bytes, reuses = conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(uses - 1), 0) FROM asset_index'
+                ).fetchone()
+            finally:
+                conn.close()
+            stats.update({"assets": count, "bytes": total_bytes, "reuses": reuses})
+        except sqlite3.Error as e:
+            stats["error"] = str(e)
+        return stats
+
+
+# Instancia global
+_asset_index = AssetIndex()
+
+
+def get_asset_index() -> AssetIndex:
+    """Obtiene el índice global de assets publicados"""
+    return _asset_index
@@ -4,16 +4,19 @@ Monitorea campañas cada 30 minutos y pausa automáticamente si detecta gasto an
 """
 
 from flask import Blueprint, request, jsonify
-from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
 from google.protobuf.field_mask_pb2 import FieldMask
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import os
-import json
-import sqlite3
-from typing import Dict, List, Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from google_ads_client_pool import get_pooled_client
+from sqlite_pool import get_connection
+from notification_dispatcher import get_notification_dispatcher
 
 circuit_breaker_bp = Blueprint('circuit_breaker', __name__)
 
@@ -24,13 +27,26 @@ NOTIFICATION_WEBHOOK = os.getenv('NOTIFICATION_WEBHOOK', '')  # Para Slack/Disco
 # Exchange rate COP to USD (aproximado, se puede obtener de API)
 COP_TO_USD = 4000  # 1 USD = 4000 COP (actualizar según necesidad)
 
+# 'account' = 1 query de gasto por cuenta, cuentas en paralelo | 'campaign' = modo legacy (1 query por campaña)
+CIRCUIT_BREAKER_CHECK_MODE = os.getenv('CIRCUIT_BREAKER_CHECK_MODE', 'account')
+CIRCUIT_BREAKER_MAX_WORKERS = int(os.getenv('CIRCUIT_BREAKER_MAX_WORKERS', '4'))
+
 # ============================================
 # DATABASE SETUP
 # ============================================
 
+def get_db():
+    """Obtiene conexión a la base de datos (WAL + conexión reutilizable por hilo, ver sqlite_pool.py)"""
+    return get_connection(DB_PATH)
+
+
+# Alias usado por los endpoints de activación/desactivación por cuenta
+get_db_connection = get_db
+
+
 def init_database():
     """Inicializa la base de datos de circuit breaker"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # Tabla de configuración de límites por cuenta
@@ -100,8 +116,8 @@ def init_database():
 # ============================================
 
 def get_google_ads_client():
-    """Crea cliente de Google Ads con credenciales del ambiente"""
-    return GoogleAdsClient.load_from_dict({
+    """Obtiene cliente de Google Ads con credenciales del ambiente (reutilizado desde el pool)"""
+    return get_pooled_client({
         'developer_token': os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN'),
         'client_id': os.getenv('GOOGLE_ADS_CLIENT_ID'),
         'client_secret': os.getenv('GOOGLE_ADS_CLIENT_SECRET'),
@@ -165,6 +181,57 @@ def get_campaign_spend_last_hour(client, customer_id: str, campaign_id: str) ->
         return {}
 
 
+def get_account_spend_last_hour(client, customer_id: str, campaign_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Gasto de la última hora de todas las campañas monitoreadas de una cuenta
+    en una sola consulta. Retorna {campaign_id: campaign_data} con el mismo
+    formato que get_campaign_spend_last_hour (campañas sin filas no aparecen).
+    Lanza excepción si la consulta falla.
+    """
+    ga_service = client.get_service("GoogleAdsService")
+    
+    one_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    ids_clause = ', '.join(sorted({str(cid) for cid in campaign_ids}))
+    
+    query = f"""
+        SELECT
+          campaign.id,
+          campaign.name,
+          campaign.status,
+          metrics.cost_micros,
+          metrics.impressions,
+          metrics.clicks,
+          metrics.conversions
+        FROM campaign
+        WHERE campaign.id IN ({ids_clause})
+          AND segments.date = '{one_hour_ago.strftime("%Y-%m-%d")}'
+          AND segments.hour = {one_hour_ago.hour}
+    """
+    
+    response = ga_service.search(customer_id=customer_id.replace('-', ''), query=query)
+    
+    spend = {}
+    for row in response:
+        campaign_id = str(row.campaign.id)
+        data = spend.setdefault(campaign_id, {
+            'campaign_id': campaign_id,
+            'campaign_name': row.campaign.name,
+            'status': row.campaign.status.name,
+            'spend_usd': 0.0,
+            'spend_cop': 0.0,
+            'impressions': 0,
+            'clicks': 0,
+            'conversions': 0.0
+        })
+        data['spend_usd'] += row.metrics.cost_micros / 1_000_000
+        data['spend_cop'] = data['spend_usd'] * COP_TO_USD
+        data['impressions'] += int(row.metrics.impressions)
+        data['clicks'] += int(row.metrics.clicks)
+        data['conversions'] += float(row.metrics.conversions)
+    
+    return spend
+
+
 def pause_campaign(client, customer_id: str, campaign_id: str) -> bool:
     """Pausa una campaña"""
     try:
@@ -229,30 +296,26 @@ def resume_campaign(client, customer_id: str, campaign_id: str) -> bool:
         return False
 
 
-def send_notification(title: str, message: str, data: Dict = None):
-    """Envía notificación (Slack, Discord, Telegram, etc.)"""
+def send_notification(title: str, message: str, data: Dict = None, account: str = None):
+    """
+    Envía notificación (Slack, Discord, Telegram, etc.) sin bloquear el monitoreo:
+    se encola en el outbox y la entrega un hilo en segundo plano con reintentos
+    (ver notification_dispatcher.py). Las alertas de una misma cuenta en la
+    misma ventana se envían juntas.
+    """
     if not NOTIFICATION_WEBHOOK:
         print(f"📢 Notification: {title} - {message}")
         return
     
-    # Implementar según el servicio de notificaciones
-    # Ejemplo para Slack:
-    import requests
-    
-    payload = {
-        "text": f"*{title}*\n{message}",
-        "attachments": [{"text": json.dumps(data, indent=2)}] if data else []
-    }
-    
     try:
-        requests.post(NOTIFICATION_WEBHOOK, json=payload)
+        get_notification_dispatcher().notify(title, message, data, account=account)
     except Exception as e:
-        print(f"❌ Error sending notification: {e}")
+        print(f"❌ Error queueing notification: {e}")
 
 
 def check_campaign(customer_id: str, campaign_id: str):
     """Verifica una campaña específica"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # Obtener límite configurado
@@ -279,46 +342,7 @@ def check_campaign(customer_id: str, campaign_id: str):
     
     # Verificar si excede el límite
     if spend_cop > max_spend_cop:
-        print(f"🚨 CIRCUIT BREAKER TRIGGERED: {campaign_data['campaign_name']}")
-        print(f"   Spend: ${spend_cop:,.0f} COP > Limit: ${max_spend_cop:,.0f} COP")
-        
-        # Pausar campaña
-        if pause_campaign(client, customer_id, campaign_id):
-            # Registrar evento
-            cursor.execute('''
-                INSERT INTO circuit_breaker_events 
-                (customer_id, campaign_id, event_type, reason, spend_amount_cop, threshold_cop)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                customer_id,
-                campaign_id,
-                'PAUSED',
-                f'Gasto excedió límite en última hora',
-                spend_cop,
-                max_spend_cop
-            ))
-            
-            # Actualizar estado de campaña monitoreada
-            cursor.execute('''
-                UPDATE monitored_campaigns 
-                SET status = 'PAUSED_BY_CB', last_check = ?
-                WHERE customer_id = ? AND campaign_id = ?
-            ''', (datetime.utcnow(), customer_id, campaign_id))
-            
-            conn.commit()
-            
-            # Enviar notificación
-            send_notification(
-                "⚠️ Circuit Breaker Activado",
-                f"Campaña '{campaign_data['campaign_name']}' pausada automáticamente",
-                {
-                    'customer_id': customer_id,
-                    'campaign_id': campaign_id,
-                    'spend_cop': f"${spend_cop:,.0f} COP",
-                    'limit_cop': f"${max_spend_cop:,.0f} COP",
-                    'will_resume_at': (datetime.utcnow() + timedelta(hours=1)).strftime("%H:%M")
-                }
-            )
+        _trip_circuit_breaker(client, cursor, customer_id, campaign_id, campaign_data, max_spend_cop)
     
     # Guardar historial
     cursor.execute('''
@@ -340,9 +364,144 @@ def check_campaign(customer_id: str, campaign_id: str):
     conn.close()
 
 
+def _trip_circuit_breaker(client, cursor, customer_id: str, campaign_id: str, campaign_data: Dict, max_spend_cop: float):
+    """Pausa la campaña, registra el evento y notifica (mismo flujo que check_campaign)"""
+    spend_cop = campaign_data['spend_cop']
+    print(f"🚨 CIRCUIT BREAKER TRIGGERED: {campaign_data['campaign_name']}")
+    print(f"   Spend: ${spend_cop:,.0f} COP > Limit: ${max_spend_cop:,.0f} COP")
+    
+    if not pause_campaign(client, customer_id, campaign_id):
+        return False
+    
+    cursor.execute('''
+        INSERT INTO circuit_breaker_events 
+        (customer_id, campaign_id, event_type, reason, spend_amount_cop, threshold_cop)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        customer_id,
+        campaign_id,
+        'PAUSED',
+        f'Gasto excedió límite en última hora',
+        spend_cop,
+        max_spend_cop
+    ))
+    
+    cursor.execute('''
+        UPDATE monitored_campaigns 
+        SET status = 'PAUSED_BY_CB', last_check = ?
+        WHERE customer_id = ? AND campaign_id = ?
+    ''', (datetime.utcnow(), customer_id, campaign_id))
+    
+    # Confirmar antes de notificar: no retener el lock de escritura durante el webhook
+    cursor.connection.commit()
+    
+    send_notification(
+        "⚠️ Circuit Breaker Activado",
+        f"Campaña '{campaign_data['campaign_name']}' pausada automáticamente",
+        {
+            'customer_id': customer_id,
+            'campaign_id': campaign_id,
+            'spend_cop': f"${spend_cop:,.0f} COP",
+            'limit_cop': f"${max_spend_cop:,.0f} COP",
+            'will_resume_at': (datetime.utcnow() + timedelta(hours=1)).strftime("%H:%M")
+        },
+        account=customer_id
+    )
+    return True
+
+
+def check_account(client, customer_id: str, campaign_ids: List[str]) -> List[Tuple]:
+    """
+    Verifica todas las campañas monitoreadas de una cuenta con una sola
+    consulta de gasto. Pausa las que exceden el límite y retorna las filas
+    de spend_history para que el llamador las inserte en lote.
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT max_spend_per_hour_cop, enabled FROM account_limits WHERE customer_id = ?",
+            (customer_id,)
+        )
+        result = cursor.fetchone()
+        
+        if not result or result[1] == 0:
+            # Sin límite configurado o deshabilitado
+            return []
+        
+        max_spend_cop = result[0]
+        spend_by_campaign = get_account_spend_last_hour(client, customer_id, campaign_ids)
+        
+        hour_timestamp = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        history_rows = []
+        for campaign_id in campaign_ids:
+            campaign_data = spend_by_campaign.get(str(campaign_id))
+            if not campaign_data:
+                continue
+            
+            if campaign_data['spend_cop'] > max_spend_cop:
+                _trip_circuit_breaker(client, cursor, customer_id, campaign_id, campaign_data, max_spend_cop)
+            
+            history_rows.append((
+                customer_id,
+                campaign_id,
+                hour_timestamp,
+                campaign_data['spend_usd'],
+                campaign_data['spend_cop'],
+                campaign_data['impressions'],
+                campaign_data['clicks'],
+                campaign_data['conversions']
+            ))
+        
+        return history_rows
+    finally:
+        conn.close()
+
+
+def save_spend_history(rows: List[Tuple]):
+    """Guarda el gasto de todas las campañas del ciclo en un solo INSERT"""
+    if not rows:
+        return
+    conn = get_db()
+    try:
+        conn.executemany('''
+            INSERT OR REPLACE INTO spend_history
+            (customer_id, campaign_id, hour_timestamp, spend_usd, spend_cop, impressions, clicks, conversions)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _monitor_by_account(campaigns: List[Tuple[str, str]]):
+    """Agrupa por cuenta y revisa las cuentas en paralelo (pool acotado)"""
+    accounts = defaultdict(list)
+    for customer_id, campaign_id in campaigns:
+        accounts[customer_id].append(campaign_id)
+    
+    client = get_google_ads_client()
+    
+    def run(item):
+        customer_id, campaign_ids = item
+        try:
+            return check_account(client, customer_id, campaign_ids)
+        except Exception as e:
+            print(f"❌ Error checking account {customer_id} ({len(campaign_ids)} campaigns): {e}")
+            return []
+    
+    workers = max(1, min(CIRCUIT_BREAKER_MAX_WORKERS, len(accounts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='CircuitBreaker') as pool:
+        results = list(pool.map(run, accounts.items()))
+    
+    history_rows = [row for rows in results for row in rows]
+    save_spend_history(history_rows)
+    print(f"   {len(accounts)} accounts checked, {len(history_rows)} spend rows saved")
+
+
 def check_paused_campaigns():
     """Verifica campañas pausadas y las reanuda después de 1 hora"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # Buscar eventos de pausa hace más de 1 hora
@@ -389,7 +548,8 @@ def check_paused_campaigns():
             send_notification(
                 "✅ Campaña Reanudada",
                 f"Campaña ID {campaign_id} reanudada automáticamente después del período de enfriamiento",
-                {'customer_id': customer_id, 'campaign_id': campaign_id}
+                {'customer_id': customer_id, 'campaign_id': campaign_id},
+                account=customer_id
             )
     
     conn.close()
@@ -399,7 +559,7 @@ def monitor_all_campaigns():
     """Función principal que monitorea todas las campañas"""
     print(f"🔍 [{datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}] Circuit Breaker check running...")
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # Obtener todas las campañas monitoreadas activas
@@ -414,11 +574,14 @@ def monitor_all_campaigns():
     
     print(f"   Monitoring {len(campaigns)} campaigns...")
     
-    for customer_id, campaign_id in campaigns:
-        try:
-            check_campaign(customer_id, campaign_id)
-        except Exception as e:
-            print(f"❌ Error checking campaign {campaign_id}: {e}")
+    if CIRCUIT_BREAKER_CHECK_MODE == 'account':
+        _monitor_by_account(campaigns)
+    else:
+        for customer_id, campaign_id in campaigns:
+            try:
+                check_campaign(customer_id, campaign_id)
+            except Exception as e:
+                print(f"❌ Error checking campaign {campaign_id}: {e}")
     
     # Verificar campañas pausadas para reanudar
     check_paused_campaigns()
@@ -438,7 +601,7 @@ def add_account():
     max_spend_per_hour_cop = data.get('max_spend_per_hour_cop', 300000)
     max_spend_per_day_cop = data.get('max_spend_per_day_cop', 2000000)
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -461,7 +624,7 @@ def add_campaign():
     campaign_id = data.get('campaign_id')
     campaign_name = data.get('campaign_name', '')
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -479,7 +642,7 @@ def add_campaign():
 @circuit_breaker_bp.route('/api/circuit-breaker/status', methods=['GET'])
 def get_status():
     """Obtener estado del circuit breaker"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # Cuentas monitoreadas
@@ -528,8 +691,19 @@ def start_circuit_breaker_scheduler():
     scheduler.start()
     print("✅ Circuit Breaker Scheduler started (every 30 minutes)")
     
-    # Ejecutar una vez al inicio
-    monitor_all_campaigns()
+    # Entregar lo que quedó en el outbox de un proceso anterior
+    get_notification_dispatcher().start()
+    
+    # Ejecutar una vez al inicio, en el hilo del scheduler (no bloquea el arranque del worker)
+    scheduler.add_job(
+        func=monitor_all_campaigns,
+        trigger='date',
+        run_date=datetime.now(),
+        id='circuit_breaker_initial_run',
+        name='Circuit breaker initial check',
+        misfire_grace_time=None,
+        replace_existing=True
+    )
 
 
 def stop_circuit_breaker_scheduler():
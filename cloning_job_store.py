@@ -0,0 +1,206 @@
+"""
+Cloning Job Store
+=================
+Almacenamiento de jobs del Web Cloner en SQLite (WAL), compartido entre
+workers de gunicorn y persistente entre reinicios.
+
+Reemplaza el antiguo /tmp/cloning_jobs.json:
+- Cada actualización de progreso toca solo la fila del job (antes se
+  reescribía el archivo completo con todos los jobs).
+- /api/clone-status lee por llave primaria desde cualquier worker, así el
+  polling nunca ve un job "perdido" porque lo creó el otro proceso.
+- Los jobs terminados se purgan después de CLONING_JOBS_TTL_HOURS.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from sqlite_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+CLONING_JOBS_DB = os.getenv('CLONING_JOBS_DB', 'cloning_jobs.db')
+CLONING_JOBS_TTL_HOURS = float(os.getenv('CLONING_JOBS_TTL_HOURS', '72'))
+CLONING_JOBS_PURGE_INTERVAL_SECONDS = 600
+
+# Columnas propias; cualquier otro campo del job va en `extra` (JSON)
+JOB_COLUMNS = ('job_id', 'url', 'site_name', 'status', 'progress', 'message', 'created_at', 'updated_at')
+
+
+CLONING_JOBS_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS cloning_jobs (
+            job_id TEXT PRIMARY KEY,
+            url TEXT,
+            site_name TEXT,
+            status TEXT,
+            progress INTEGER DEFAULT 0,
+            message TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            extra TEXT NOT NULL DEFAULT '{}'
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_cloning_jobs_site_name ON cloning_jobs(site_name)',
+    'CREATE INDEX IF NOT EXISTS idx_cloning_jobs_updated ON cloning_jobs(updated_at)',
+)
+
+
+class CloningJobStore:
+    """Jobs de clonación con updates a nivel de fila y limpieza por TTL"""
+
+    def __init__(self, db_path: str = CLONING_JOBS_DB, ttl_hours: float = CLONING_JOBS_TTL_HOURS):
+        self.db_path = db_path
+        self.ttl_hours = ttl_hours
+        self._last_purge = 0.0
+
+    def _get_db(self) -> sqlite3.Connection:
+        return get_connection(self.db_path, schema=CLONING_JOBS_SCHEMA)
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job = {column: row[i] for i, column in enumerate(JOB_COLUMNS)}
+        try:
+            job.update(json.loads(row[len(JOB_COLUMNS)] or '{}'))
+        except ValueError:
+            pass
+        return job
+
+    @staticmethod
+    def _split_fields(fields: Dict[str, Any]):
+        columns = {k: v for k, v in fields.items() if k in JOB_COLUMNS and k != 'job_id'}
+        extra = {k: v for k, v in fields.items() if k not in JOB_COLUMNS}
+        return columns, extra
+
+    def create_job(self, job_id: str, **fields) -> Dict[str, Any]:
+        """Crea un job nuevo (status 'queued' si no se indica otro)"""
+        now = datetime.now().isoformat()
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'progress': 0,
+            'message': 'Job queued...',
+            'created_at': now,
+            'updated_at': now,
+            **fields
+        }
+        columns, extra = self._split_fields(job)
+
+        conn = self._get_db()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO cloning_jobs
+                    (job_id, url, site_name, status, progress, message, created_at, updated_at, extra)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                job_id, columns.get('url'), columns.get('site_name'), columns.get('status'),
+                columns.get('progress'), columns.get('message'), columns.get('created_at'),
+                columns.get('updated_at'), json.dumps(extra)
+            ))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.purge_expired()
+        return job
+
+    def update_job(self, job_id: str, **fields) -> bool:
+        """
+        Actualiza solo la fila del job. Los campos extra se fusionan con los
+        existentes. Retorna False si el job no existe.
+        """
+        fields['updated_at'] = fields.get('updated_at') or datetime.now().isoformat()
+        columns, extra = self._split_fields(fields)
+
+        conn = self._get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+
+            if extra:
+                cursor.execute('SELECT extra FROM cloning_jobs WHERE job_id = ?', (job_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    conn.rollback()
+                    return False
+                try:
+                    merged = json.loads(row[0] or '{}')
+                except ValueError:
+                    merged = {}
+                merged.update(extra)
+                columns['extra'] = json.dumps(merged)
+
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            cursor.execute(
+                f'UPDATE cloning_jobs SET {assignments} WHERE job_id = ?',
+                (*columns.values(), job_id)
+            )
+            updated = cursor.rowcount > 0
+            conn.commit()
+            return updated
+        finally:
+            conn.close()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT {", ".join(JOB_COLUMNS)}, extra FROM cloning_jobs WHERE job_id = ?', (job_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row) if row else None
+
+    def find_by_site_name(self, site_name: str, exclude_job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Job más reciente que publicó en la carpeta indicada (opcionalmente sin contar uno)"""
+        conn = self._get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {", ".join(JOB_COLUMNS)}, extra FROM cloning_jobs
+                WHERE site_name = ? AND job_id != ?
+                ORDER BY updated_at DESC LIMIT 1
+            ''', (site_name, exclude_job_id or ''))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row) if row else None
+
+    def purge_expired(self, force: bool = False) -> int:
+        """Borra jobs sin actividad en las últimas ttl_hours (como mucho cada 10 min)"""
+        now = time.time()
+        if not force and now - self._last_purge < CLONING_JOBS_PURGE_INTERVAL_SECONDS:
+            return 0
+        self._last_purge = now
+
+        cutoff = (datetime.now() - timedelta(hours=self.ttl_hours)).isoformat()
+        try:
+            conn = self._get_db()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM cloning_jobs WHERE updated_at < ?', (cutoff,))
+                deleted = cursor.rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudieron purgar jobs de clonación: {e}")
+            return 0
+
+        if deleted:
+            logger.info(f"🧹 {deleted} jobs de clonación expirados eliminados")
+        return deleted
+
+
+# Instancia global
+_cloning_job_store = CloningJobStore()
+
+
+def get_cloning_job_store() -> CloningJobStore:
+    """Obtiene el store global de jobs de clonación"""
+    return _cloning_job_store
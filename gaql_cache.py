@@ -0,0 +1,298 @@
+"""
+GAQL Read Cache
+===============
+Cache local (SQLite WAL, compartido entre workers de gunicorn) para las
+respuestas de endpoints de solo lectura de Google Ads.
+
+- Llave: customer id + texto de la query (o parámetros del endpoint) +
+  scope de la credencial (hash del refresh token y login customer id), así
+  dos usuarios con accesos distintos nunca comparten respuestas.
+- TTL corto: dentro de GAQL_CACHE_TTL_SECONDS la respuesta es fresca.
+- Stale-while-revalidate: hasta GAQL_CACHE_STALE_SECONDS se sirve la copia
+  vieja de inmediato y se refresca en segundo plano (un solo refresh por
+  llave entre todos los workers).
+- Invalidación: cualquier mutate del proceso contra un customer (ver
+  register_mutate_listener en google_ads_client_pool.py) sube la
+  "generación" del customer y descarta sus entradas; un refresh que empezó
+  antes del mutate no puede volver a escribir datos viejos.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from sqlite_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+GAQL_CACHE_DB = os.getenv('GAQL_CACHE_DB', 'gaql_cache.db')
+GAQL_CACHE_TTL_SECONDS = float(os.getenv('GAQL_CACHE_TTL_SECONDS', '60'))
+GAQL_CACHE_STALE_SECONDS = float(os.getenv('GAQL_CACHE_STALE_SECONDS', '600'))
+GAQL_CACHE_REFRESH_WORKERS = int(os.getenv('GAQL_CACHE_REFRESH_WORKERS', '2'))
+GAQL_CACHE_ENABLED = os.getenv('GAQL_CACHE_ENABLED', 'true').lower() != 'false'
+GAQL_CACHE_PURGE_EVERY = 200
+
+# Tiempo que un worker reserva una llave mientras la refresca
+REFRESH_CLAIM_SECONDS = 30
+
+CACHE_HIT = 'HIT'
+CACHE_STALE = 'STALE'
+CACHE_MISS = 'MISS'
+CACHE_BYPASS = 'BYPASS'
+
+
+def credential_scope(refresh_token: Optional[str], login_customer_id: Optional[str]) -> str:
+    """Scope de la credencial (nunca el refresh token en claro)"""
+    raw = f"{refresh_token or ''}|{str(login_customer_id or '').replace('-', '')}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def normalize_customer_id(customer_id) -> str:
+    return str(customer_id or '').replace('-', '')
+
+
+GAQL_CACHE_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS gaql_cache (
+            cache_key TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            generation INTEGER NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            fresh_until REAL NOT NULL,
+            stale_until REAL NOT NULL,
+            refresh_claimed_until REAL NOT NULL DEFAULT 0
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS gaql_cache_generations (
+            customer_id TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_gaql_cache_customer ON gaql_cache(customer_id)',
+    'CREATE INDEX IF NOT EXISTS idx_gaql_cache_stale ON gaql_cache(stale_until)',
+)
+
+
+class GaqlResponseCache:
+    """Cache TTL + stale-while-revalidate con invalidación por customer"""
+
+    def __init__(self, db_path: str = GAQL_CACHE_DB, ttl_seconds: float = GAQL_CACHE_TTL_SECONDS,
+                 stale_seconds: float = GAQL_CACHE_STALE_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._writes = 0
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+
+    def _get_db(self) -> sqlite3.Connection:
+        return get_connection(self.db_path, schema=GAQL_CACHE_SCHEMA)
+
+    @staticmethod
+    def make_key(customer_id: str, scope: str, key_parts: Tuple) -> str:
+        raw = json.dumps([customer_id, scope, list(key_parts)], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _get_refresh_executor(self) -> ThreadPoolExecutor:
+        """Pool por proceso (los hilos no sobreviven al fork de gunicorn)"""
+        with self._refreshing_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=GAQL_CACHE_REFRESH_WORKERS, thread_name_prefix='GaqlCacheRefresh')
+                self._executor_pid = os.getpid()
+                self._refreshing = set()
+            return self._executor
+
+    def _current_generation(self, conn: sqlite3.Connection, customer_id: str) -> int:
+        row = conn.execute(
+            'SELECT generation FROM gaql_cache_generations WHERE customer_id = ?', (customer_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _read(self, cache_key: str, customer_id: str):
+        """(payload, fresh_until, stale_until) si la entrada existe y es de la generación actual"""
+        conn = self._get_db()
+        try:
+            row = conn.execute('''
+                SELECT c.payload, c.fresh_until, c.stale_until
+                FROM gaql_cache c
+                LEFT JOIN gaql_cache_generations g ON g.customer_id = c.customer_id
+                WHERE c.cache_key = ? AND c.generation = COALESCE(g.generation, 0)
+            ''', (cache_key,)).fetchone()
+        finally:
+            conn.close()
+        return row
+
+    def _write(self, cache_key: str, customer_id: str, generation: int, value: Any, ttl: float):
+        now = time.time()
+        payload = json.dumps(value)
+        conn = self._get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Un mutate pudo ocurrir mientras se ejecutaba la query: no guardar datos viejos
+            if self._current_generation(conn, customer_id) != generation:
+                conn.rollback()
+                return
+            conn.execute('''
+                INSERT OR REPLACE INTO gaql_cache
+                    (cache_key, customer_id, generation, payload, created_at, fresh_until, stale_until, refresh_claimed_until)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            ''', (cache_key, customer_id, generation, payload, now, now + ttl, now + ttl + self.stale_seconds))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._writes += 1
+        if self._writes % GAQL_CACHE_PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def _claim_refresh(self, cache_key: str) -> bool:
+        """Reserva la llave para refrescarla (solo un worker a la vez)"""
+        now = time.time()
+        conn = self._get_db()
+        try:
+            cursor = conn.execute('''
+                UPDATE gaql_cache SET refresh_claimed_until = ?
+                WHERE cache_key = ? AND refresh_claimed_until < ?
+            ''', (now + REFRESH_CLAIM_SECONDS, cache_key, now))
+            claimed = cursor.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        return claimed
+
+    def _fetch_and_store(self, cache_key: str, customer_id: str, fetch: Callable[[], Any], ttl: float) -> Any:
+        conn = self._get_db()
+        try:
+            generation = self._current_generation(conn, customer_id)
+        finally:
+            conn.close()
+
+        value = fetch()
+        try:
+            self._write(cache_key, customer_id, generation, value, ttl)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"No se pudo guardar en cache GAQL: {e}")
+        return value
+
+    def _refresh_in_background(self, cache_key: str, customer_id: str, fetch: Callable[[], Any], ttl: float):
+        executor = self._get_refresh_executor()
+        with self._refreshing_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                if self._claim_refresh(cache_key):
+                    self._fetch_and_store(cache_key, customer_id, fetch, ttl)
+            except Exception as e:
+                # La copia vieja sigue sirviéndose hasta stale_until
+                logger.warning(f"Refresh en segundo plano de cache GAQL falló: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(cache_key)
+
+        executor.submit(refresh)
+
+    def get_or_fetch(self, customer_id, scope: str, key_parts: Tuple, fetch: Callable[[], Any],
+                     ttl: Optional[float] = None, bypass: bool = False) -> Tuple[Any, str]:
+        """
+        Retorna (valor, estado) con estado HIT, STALE, MISS o BYPASS.
+
+        `fetch` se puede ejecutar fuera del request (refresh en segundo plano):
+        no debe depender de flask.request; debe capturar el cliente y los ids.
+        Los errores de `fetch` se propagan solo cuando no hay copia que servir.
+        """
+        customer_id = normalize_customer_id(customer_id)
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if not GAQL_CACHE_ENABLED:
+            return fetch(), CACHE_BYPASS
+
+        cache_key = self.make_key(customer_id, scope, key_parts)
+        if not bypass:
+            try:
+                row = self._read(cache_key, customer_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache GAQL no disponible, consultando directo: {e}")
+                return fetch(), CACHE_BYPASS
+
+            if row is not None:
+                payload, fresh_until, stale_until = row
+                now = time.time()
+                if now < fresh_until:
+                    self._hits += 1
+                    return json.loads(payload), CACHE_HIT
+                if now < stale_until:
+                    self._stale_hits += 1
+                    self._refresh_in_background(cache_key, customer_id, fetch, ttl)
+                    return json.loads(payload), CACHE_STALE
+
+        self._misses += 1
+        return self._fetch_and_store(cache_key, customer_id, fetch, ttl), (CACHE_BYPASS if bypass else CACHE_MISS)
+
+    def invalidate_customer(self, customer_id):
+        """Descarta todo lo cacheado de un customer (llamado tras un mutate)"""
+        customer_id = normalize_customer_id(customer_id)
+        if not customer_id:
+            return
+        try:
+            conn = self._get_db()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('''
+                    INSERT INTO gaql_cache_generations (customer_id, generation) VALUES (?, 1)
+                    ON CONFLICT(customer_id) DO UPDATE SET generation = generation + 1
+                ''', (customer_id,))
+                conn.execute('DELETE FROM gaql_cache WHERE customer_id = ?', (customer_id,))
+                conn.commit()
+            finally:
+                conn.close()
+            logger.info(f"🧹 Cache GAQL invalidada para customer {customer_id}")
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo invalidar cache GAQL de {customer_id}: {e}")
+
+    def purge_expired(self) -> int:
+        try:
+            conn = self._get_db()
+            try:
+                cursor = conn.execute('DELETE FROM gaql_cache WHERE stale_until < ?', (time.time(),))
+                deleted = cursor.rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            return deleted
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo purgar cache GAQL: {e}")
+            return 0
+
+    def get_stats(self):
+        return {
+            "enabled": GAQL_CACHE_ENABLED,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses
+        }
+
+
+# Instancia global
+_gaql_cache = GaqlResponseCache()
+
+
+def get_gaql_cache() -> GaqlResponseCache:
+    """Obtiene el cache global de respuestas GAQL"""
+    return _gaql_cache
@@ -0,0 +1,251 @@
+"""
+GAQL Row Projection
+===================
+Convierte filas de GoogleAdsRow a dicts JSON-serializables usando un
+conversor precompilado a partir de la lista SELECT de la query.
+
+En lugar de recorrer cada fila con cadenas de hasattr()/str(), la query se
+analiza una sola vez: por cada campo seleccionado se arma un getter
+(operator.attrgetter sobre el protobuf crudo) y un conversor según el tipo
+del campo en el descriptor (enum -> nombre, int64 -> str, mensaje -> dict).
+Convertir una fila es entonces un bucle plano sobre esos pares.
+
+Formatos de salida:
+- to_dict: como el JSON de la API REST de Google Ads (llaves camelCase
+  anidadas por recurso, int64 como string, enums por nombre).
+- to_flat_dict / project: {"metrics.clicks": 12, ...} con la ruta GAQL como llave.
+- to_columns: {"metrics.clicks": [12, 7, ...], ...} para agregaciones.
+
+get_projector(query) cachea un proyector por lista de campos, así las
+queries que solo cambian en el WHERE (fechas, ids) reutilizan el mismo.
+"""
+
+import re
+import logging
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.protobuf import json_format
+from google.protobuf.descriptor import FieldDescriptor
+
+logger = logging.getLogger(__name__)
+
+_SELECT_RE = re.compile(r'^\s*SELECT\s+(.*?)\s+FROM\s', re.IGNORECASE | re.DOTALL)
+
+_INT64_TYPES = {
+    FieldDescriptor.TYPE_INT64,
+    FieldDescriptor.TYPE_UINT64,
+    FieldDescriptor.TYPE_SINT64,
+    FieldDescriptor.TYPE_FIXED64,
+    FieldDescriptor.TYPE_SFIXED64,
+}
+
+
+def parse_select_fields(query: str) -> List[str]:
+    """Campos de la cláusula SELECT, en orden y sin duplicados"""
+    match = _SELECT_RE.search(query or '')
+    if not match:
+        raise ValueError("La query GAQL no tiene una cláusula SELECT ... FROM válida")
+
+    fields = []
+    for field in match.group(1).split(','):
+        field = field.strip()
+        if field and field not in fields:
+            fields.append(field)
+    return fields
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split('_')
+    return head + ''.join(part[:1].upper() + part[1:] for part in rest)
+
+
+def raw_row(row):
+    """Protobuf crudo de una fila (proto-plus envuelve el mensaje en _pb)"""
+    return getattr(row, '_pb', row)
+
+
+def iter_raw_rows(response) -> Iterator[Any]:
+    """Filas crudas de un pager de search() o de un batch/stream, sin envolver en proto-plus"""
+    pages = getattr(response, 'pages', None)
+    if pages is not None:
+        for page in pages:
+            yield from raw_row(page).results
+    else:
+        for row in response:
+            yield raw_row(row)
+
+
+# Tablas número -> nombre por tipo de enum (compartidas entre proyectores)
+_enum_names: Dict[str, Dict[int, str]] = {}
+
+
+def _enum_name_table(enum_type) -> Dict[int, str]:
+    names = _enum_names.get(enum_type.full_name)
+    if names is None:
+        names = _enum_names[enum_type.full_name] = {value.number: value.name for value in enum_type.values}
+    return names
+
+
+def _value_converter(field: FieldDescriptor, int64_as_string: bool = True) -> Callable[[Any], Any]:
+    if field.type == FieldDescriptor.TYPE_ENUM:
+        names = _enum_name_table(field.enum_type)
+        convert = lambda v: names.get(v, str(v))
+    elif field.type in _INT64_TYPES:
+        if not int64_as_string:
+            return None
+        convert = str
+    elif field.type == FieldDescriptor.TYPE_MESSAGE:
+        convert = json_format.MessageToDict
+    elif field.type == FieldDescriptor.TYPE_BYTES:
+        convert = lambda v: v.hex()
+    else:
+        return None  # escalares nativos: el valor sirve tal cual
+
+    if _is_repeated(field):
+        return lambda values: [convert(v) for v in values]
+    return convert
+
+
+def _is_repeated(field: FieldDescriptor) -> bool:
+    # field.label está deprecado en protobuf 6 y no existe en 7
+    is_repeated = getattr(field, 'is_repeated', None)
+    if is_repeated is not None:
+        return is_repeated
+    return field.label == FieldDescriptor.LABEL_REPEATED
+
+
+def _resolve_field(descriptor, path: str) -> Tuple[FieldDescriptor, str]:
+    """
+    Descriptor del campo y su ruta de atributos en el protobuf. proto-plus
+    renombra las palabras reservadas (type -> type_), así que el nombre GAQL
+    se busca tal cual y, si no existe, con el sufijo '_'.
+    """
+    field = None
+    attrs = []
+    for name in path.split('.'):
+        if descriptor is None:
+            raise ValueError(f"Campo GAQL inválido: {path}")
+        field = descriptor.fields_by_name.get(name) or descriptor.fields_by_name.get(name + '_')
+        if field is None:
+            raise ValueError(f"Campo GAQL desconocido: {path}")
+        attrs.append(field.name)
+        descriptor = field.message_type
+    return field, '.'.join(attrs)
+
+
+class RowProjector:
+    """
+    Conversor precompilado de filas para una lista de campos GAQL.
+
+    Se compila contra el descriptor de GoogleAdsRow la primera vez que ve una
+    fila, así no necesita el cliente ni la versión de la API. `converters`
+    ({ruta GAQL: función}) reemplaza el conversor por tipo de un campo, para
+    respuestas que deben conservar una forma propia.
+    """
+
+    def __init__(self, fields: List[str], int64_as_string: bool = True,
+                 converters: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        self.fields = list(fields)
+        self.int64_as_string = int64_as_string
+        self.converters = dict(converters or {})
+        self._compiled: Optional[List[Tuple[Callable, Optional[Callable], Tuple[str, ...]]]] = None
+
+    @classmethod
+    def from_query(cls, query: str, int64_as_string: bool = True) -> "RowProjector":
+        return cls(parse_select_fields(query), int64_as_string=int64_as_string)
+
+    def compile(self, row_descriptor):
+        compiled = []
+        for path in self.fields:
+            field, attr_path = _resolve_field(row_descriptor, path)
+            # Llaves con el nombre GAQL (sin el sufijo de proto-plus), como la API REST
+            keys = tuple(_camel(part) for part in path.split('.'))
+            convert = self.converters.get(path) or _value_converter(field, self.int64_as_string)
+            compiled.append((attrgetter(attr_path), convert, keys))
+        self._compiled = compiled
+        return self
+
+    def ensure_compiled(self, pb):
+        if self._compiled is None:
+            self.compile(pb.DESCRIPTOR)
+        return self._compiled
+
+    def to_flat_dict(self, row) -> Dict[str, Any]:
+        """Fila -> {ruta GAQL: valor}"""
+        pb = raw_row(row)
+        result = {}
+        for (getter, convert, _), path in zip(self.ensure_compiled(pb), self.fields):
+            value = getter(pb)
+            result[path] = convert(value) if convert is not None else value
+        return result
+
+    def project(self, rows: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Todas las filas como dicts planos"""
+        return [self.to_flat_dict(row) for row in rows]
+
+    def to_columns(self, rows: Iterable[Any]) -> Dict[str, List[Any]]:
+        """Filas -> un arreglo por campo (orden de filas preservado)"""
+        columns: Dict[str, List[Any]] = {path: [] for path in self.fields}
+        appenders = None
+        for row in rows:
+            pb = raw_row(row)
+            compiled = self.ensure_compiled(pb)
+            if appenders is None:
+                appenders = [(getter, convert, columns[path].append) for (getter, convert, _), path in zip(compiled, self.fields)]
+            for getter, convert, append in appenders:
+                value = getter(pb)
+                append(convert(value) if convert is not None else value)
+        return columns
+
+    def to_dict(self, row) -> Dict[str, Any]:
+        """Fila -> dict anidado en camelCase (ej. {'campaign': {'id': '123'}})"""
+        pb = raw_row(row)
+        result: Dict[str, Any] = {}
+        for getter, convert, keys in self.ensure_compiled(pb):
+            value = getter(pb)
+            if convert is not None:
+                value = convert(value)
+            node = result
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = value
+        return result
+
+
+def _text_assets(assets):
+    """AdTextAsset repetidos -> [{'text': ...}] (forma clásica, sin pinnedField ni {} vacíos)"""
+    return [{'text': asset.text} for asset in assets]
+
+
+# Forma de respuesta clásica de /api/query: las mismas secciones para cualquier query
+# (las llaves son la ruta GAQL en camelCase, ej. adGroupCriterion.keyword.matchType)
+QUERY_RESULT_PROJECTOR = RowProjector([
+    'customer_client.id', 'customer_client.descriptive_name', 'customer_client.currency_code',
+    'customer_client.time_zone', 'customer_client.status',
+    'customer.id', 'customer.descriptive_name', 'customer.currency_code',
+    'customer.time_zone', 'customer.status',
+    'ad_group_criterion.criterion_id', 'ad_group_criterion.status',
+    'ad_group_criterion.keyword.text', 'ad_group_criterion.keyword.match_type',
+    'ad_group_criterion.quality_info.quality_score',
+    'ad_group.id', 'ad_group.name',
+    'ad_group_ad.status', 'ad_group_ad.ad.id', 'ad_group_ad.ad.type',
+    'ad_group_ad.ad.responsive_search_ad.headlines', 'ad_group_ad.ad.responsive_search_ad.descriptions',
+    'campaign.id', 'campaign.name',
+    'metrics.impressions', 'metrics.clicks', 'metrics.cost_micros', 'metrics.conversions',
+    'metrics.ctr', 'metrics.conversions_from_interactions_rate',
+], converters={
+    'ad_group_ad.ad.responsive_search_ad.headlines': _text_assets,
+    'ad_group_ad.ad.responsive_search_ad.descriptions': _text_assets,
+})
+
+
+@lru_cache(maxsize=256)
+def _projector_for_fields(fields: Tuple[str, ...], int64_as_string: bool) -> RowProjector:
+    return RowProjector(list(fields), int64_as_string=int64_as_string)
+
+
+def get_projector(query: str, int64_as_string: bool = True) -> RowProjector:
+    """Proyector compartido para la lista SELECT de `query` (compilado una sola vez)"""
+    return _projector_for_fields(tuple(parse_select_fields(query)), int64_as_string)
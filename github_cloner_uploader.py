@@ -8,17 +8,34 @@ import os
 import base64
 import json
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Any, Tuple
 from pathlib import Path
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from asset_index import (
+    get_asset_index, content_sha256, git_blob_sha, is_shareable, shared_asset_path,
+    MissingBlobError, is_missing_blob_response
+)
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 'batch': blobs in parallel + one tree commit per site; 'contents': one commit per file (legacy)
+CLONER_UPLOAD_MODE = os.getenv("CLONER_UPLOAD_MODE", "batch")
+CLONER_UPLOAD_CONCURRENCY = int(os.getenv("CLONER_UPLOAD_CONCURRENCY", "4"))
+CLONER_UPLOAD_RETRIES = 3
+CLONER_REF_RETRIES = 3
+
+# Text files are inlined in the tree (no blob request) up to this size
+INLINE_TEXT_EXTENSIONS = (".html", ".css", ".js", ".json", ".txt", ".svg", ".xml")
+INLINE_TEXT_MAX_BYTES = 256 * 1024
+
 
 class GitHubClonerUploader:
     """Uploads cloned websites to GitHub with jsDelivr optimization"""
@@ -46,13 +63,19 @@ class GitHubClonerUploader:
         
         self.jsdelivr_base = f"https://cdn.jsdelivr.net/gh/{self.github_owner}/{self.github_repo}@main"
         
+        # Pooled keep-alive connections, sized for the parallel blob uploads
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(CLONER_UPLOAD_CONCURRENCY, 1))
+        self.session.mount("https://", adapter)
+        
         logger.info(f"GitHub uploader initialized for {self.github_owner}/{self.github_repo}")
         
     def ensure_repository_exists(self) -> bool:
         """Ensure the cloned websites repository exists, create if not"""
         try:
             # Check if repo exists
-            response = requests.get(self.base_url, headers=self.headers, timeout=10)
+            response = self.session.get(self.base_url, timeout=10)
             
             if response.status_code == 200:
                 logger.info(f"✅ Repository exists: {self.github_owner}/{self.github_repo}")
@@ -83,9 +106,8 @@ class GitHubClonerUploader:
                 "has_wiki": False
             }
             
-            response = requests.post(
+            response = self.session.post(
                 create_url,
-                headers=self.headers,
                 json=payload,
                 timeout=10
             )
@@ -107,7 +129,9 @@ class GitHubClonerUploader:
         self,
         site_name: str,
         resources: Dict[str, Dict[str, Any]],
-        optimize_for_jsdelivr: bool = True
+        optimize_for_jsdelivr: bool = True,
+        progress_callback: Optional[Callable[[int, int, List[str]], None]] = None,
+        known_blobs: Optional[Iterable[str]] = None
     ) -> Dict[str, Any]:
         """
         Upload a cloned website to GitHub
@@ -116,6 +140,8 @@ class GitHubClonerUploader:
             site_name: Unique name for the cloned site
             resources: Dict of {filename: {content, type, url}}
             optimize_for_jsdelivr: Create optimized version for jsDelivr preview
+            progress_callback: Called as (files_done, total_files, uploaded_blob_shas)
+            known_blobs: Blob SHAs already uploaded by an interrupted attempt (skipped)
             
         Returns:
             Dict with upload results and URLs
@@ -135,13 +161,22 @@ class GitHubClonerUploader:
         # Create files to upload dict
         files_to_upload = {}
         
+        # Binary assets (images, fonts...) also get a content-addressed path shared by all
+        # sites, so the jsDelivr preview of every clone points at the same URL for the same bytes
+        shared_paths = {}
+        if CLONER_UPLOAD_MODE == "batch" and optimize_for_jsdelivr:
+            for filename, data in resources.items():
+                content = data['content']
+                if isinstance(content, bytes) and is_shareable(filename, content):
+                    shared_paths[filename] = shared_asset_path(content_sha256(content), filename)
+        
         # Create optimized version for jsDelivr preview if enabled
         if optimize_for_jsdelivr and 'index.html' in resources:
             # Keep original index.html for Vercel deployment
             original_index = resources['index.html'].copy()
             
             # Create optimized version with jsDelivr URLs
-            preview_resources = self._optimize_for_jsdelivr(resources, folder_path)
+            preview_resources = self._optimize_for_jsdelivr(resources, folder_path, shared_paths)
             
             # Add all optimized resources (including optimized index.html)
             files_to_upload.update(preview_resources)
@@ -152,30 +187,20 @@ class GitHubClonerUploader:
             # No optimization, just upload as-is
             files_to_upload = resources
             
-        # Upload each resource
-        uploaded_files = []
-        failed_files = []
-        
-        for filename, data in files_to_upload.items():
-            file_path = f"{folder_path}/{filename}"
-            
+        commit_sha = None
+        if CLONER_UPLOAD_MODE == "batch":
             try:
-                success = self._upload_file(
-                    file_path=file_path,
-                    content=data['content'],
-                    message=f"Add {filename} for {site_name}"
+                uploaded_files, failed_files, commit_sha = self._upload_batch(
+                    site_name, folder_path, files_to_upload, progress_callback, known_blobs, shared_paths
                 )
-                
-                if success:
-                    uploaded_files.append(filename)
-                    logger.info(f"✅ Uploaded: {filename}")
-                else:
-                    failed_files.append(filename)
-                    logger.warning(f"❌ Failed: {filename}")
-                    
             except Exception as e:
-                logger.error(f"Error uploading {filename}: {str(e)}")
-                failed_files.append(filename)
+                logger.error(f"Batch upload failed: {str(e)}")
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+        else:
+            uploaded_files, failed_files = self._upload_per_file(site_name, folder_path, files_to_upload)
                 
         # Generate URLs
         github_url = f"https://github.com/{self.github_owner}/{self.github_repo}/tree/main/{folder_path}"
@@ -192,7 +217,9 @@ class GitHubClonerUploader:
             'jsdelivr_url': jsdelivr_url,
             'raw_url': raw_github_url,
             'folder_path': folder_path,
-            'files': uploaded_files
+            'files': uploaded_files,
+            'upload_mode': CLONER_UPLOAD_MODE,
+            'commit_sha': commit_sha
         }
         
         if failed_files:
@@ -202,6 +229,229 @@ class GitHubClonerUploader:
         
         return result
         
+    def _upload_batch(
+        self,
+        site_name: str,
+        folder_path: str,
+        files_to_upload: Dict[str, Dict[str, Any]],
+        progress_callback: Optional[Callable[[int, int, List[str]], None]] = None,
+        known_blobs: Optional[Iterable[str]] = None,
+        shared_paths: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[str], List[str], Optional[str]]:
+        """
+        Upload all files as blobs (bounded concurrency) and land them in one commit
+        
+        Identical contents share one blob. Blobs listed in known_blobs (already
+        created by an interrupted attempt) or found in the asset index (already
+        published by another site) are referenced by SHA instead of uploaded.
+        Files in shared_paths are also committed at their shared _assets/ path.
+        
+        Returns:
+            (uploaded_files, failed_files, commit_sha)
+        """
+        known = set(known_blobs or ())
+        shared_paths = shared_paths or {}
+        repo = f"{self.github_owner}/{self.github_repo}"
+        asset_index = get_asset_index()
+        total = len(files_to_upload)
+        entries: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, bytes] = {}
+        filenames_by_sha: Dict[str, List[str]] = {}
+        shareable: Dict[str, Tuple[str, int]] = {}  # blob sha -> (sha256, size)
+        indexed_sha256s = set()
+        
+        for filename, data in files_to_upload.items():
+            content = data['content']
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            entry = {"path": f"{folder_path}/{filename}", "mode": "100644", "type": "blob"}
+            if filename.lower().endswith(INLINE_TEXT_EXTENSIONS) and len(content) <= INLINE_TEXT_MAX_BYTES:
+                try:
+                    entry["content"] = content.decode('utf-8')
+                    entries[filename] = entry
+                    continue
+                except UnicodeDecodeError:
+                    pass
+            sha = git_blob_sha(content)
+            entry["sha"] = sha
+            entries[filename] = entry
+            filenames_by_sha.setdefault(sha, []).append(filename)
+            if sha not in shareable and is_shareable(filename, content):
+                sha256 = content_sha256(content)
+                shareable[sha] = (sha256, len(content))
+                indexed = asset_index.lookup(repo, sha256)
+                if indexed and indexed['blob_sha'] == sha and sha not in known:
+                    known.add(sha)
+                    indexed_sha256s.add(sha256)
+            if sha not in known:
+                pending[sha] = content
+                
+        uploaded_blobs = sorted(known & set(filenames_by_sha))
+        failed_shas = set()
+        done = total - sum(len(filenames_by_sha[sha]) for sha in pending)
+        
+        def report():
+            if progress_callback:
+                try:
+                    progress_callback(done, total, list(uploaded_blobs))
+                except Exception as e:
+                    logger.warning(f"Upload progress callback failed: {str(e)}")
+                    
+        report()
+        if pending:
+            logger.info(f"📦 Uploading {len(pending)} blobs ({CLONER_UPLOAD_CONCURRENCY} in parallel, {len(uploaded_blobs)} already uploaded)")
+            with ThreadPoolExecutor(max_workers=max(CLONER_UPLOAD_CONCURRENCY, 1), thread_name_prefix='ClonerUpload') as executor:
+                futures = {executor.submit(self._create_blob, content, sha): sha for sha, content in pending.items()}
+                for future in as_completed(futures):
+                    sha = futures[future]
+                    try:
+                        future.result()
+                        uploaded_blobs.append(sha)
+                        done += len(filenames_by_sha[sha])
+                        report()
+                    except Exception as e:
+                        failed_shas.add(sha)
+                        logger.warning(f"❌ Blob for {', '.join(filenames_by_sha[sha])} failed: {str(e)}")
+                        
+        failed_files = [filename for sha in failed_shas for filename in filenames_by_sha[sha]]
+        tree_entries = [entry for filename, entry in entries.items() if filename not in failed_files]
+        if not tree_entries:
+            return [], failed_files, None
+        shared_entries = {
+            shared_paths[filename]: entry["sha"]
+            for filename, entry in entries.items()
+            if filename in shared_paths and filename not in failed_files and "sha" in entry
+        }
+        tree_entries += [
+            {"path": path, "mode": "100644", "type": "blob", "sha": sha}
+            for path, sha in shared_entries.items()
+        ]
+        if indexed_sha256s:
+            logger.info(f"♻️ Reusing {len(indexed_sha256s)} already published assets (no upload)")
+            
+        message = f"Add cloned site {site_name} ({len(tree_entries)} files)"
+        try:
+            commit_sha = self._commit_tree(tree_entries, message)
+        except MissingBlobError:
+            # Blobs from a previous attempt may have been garbage collected: upload them again
+            reused = [sha for sha in known & set(filenames_by_sha) if sha not in pending]
+            if not reused:
+                raise
+            asset_index.forget(repo, indexed_sha256s)
+            logger.warning(f"Tree rejected, re-uploading {len(reused)} previously uploaded blobs")
+            for sha in reused:
+                content = files_to_upload[filenames_by_sha[sha][0]]['content']
+                self._create_blob(content.encode('utf-8') if isinstance(content, str) else content, sha)
+            commit_sha = self._commit_tree(tree_entries, message)
+            
+        shared_path_by_sha = {sha: path for path, sha in shared_entries.items()}
+        asset_index.record_many(repo, [
+            (sha256, shared_path_by_sha.get(sha) or f"{folder_path}/{filenames_by_sha[sha][0]}", sha, size)
+            for sha, (sha256, size) in shareable.items()
+            if sha not in failed_shas
+        ])
+        
+        uploaded_files = [filename for filename in entries if filename not in failed_files]
+        logger.info(f"✅ Committed {len(uploaded_files)} files in one commit ({commit_sha[:7]})")
+        return uploaded_files, failed_files, commit_sha
+        
+    def _request_with_retry(self, method: str, url: str, expected: Tuple[int, ...], **kwargs) -> requests.Response:
+        """Session request retried with exponential backoff on 5xx, rate limits and network errors"""
+        kwargs.setdefault('timeout', 30)
+        for attempt in range(CLONER_UPLOAD_RETRIES):
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code in expected:
+                    return response
+                retryable = response.status_code >= 500 or (
+                    response.status_code == 403 and 'rate limit' in response.text.lower()
+                )
+                if not retryable or attempt == CLONER_UPLOAD_RETRIES - 1:
+                    raise RuntimeError(f"{method} {url} failed: {response.status_code} - {response.text[:200]}")
+            except requests.RequestException as e:
+                if attempt == CLONER_UPLOAD_RETRIES - 1:
+                    raise RuntimeError(f"{method} {url} failed after {CLONER_UPLOAD_RETRIES} attempts: {str(e)}")
+            time.sleep(2 ** attempt)
+        raise RuntimeError(f"{method} {url} failed after {CLONER_UPLOAD_RETRIES} attempts")
+        
+    def _create_blob(self, content: bytes, expected_sha: Optional[str] = None) -> str:
+        """Create a git blob and return its SHA"""
+        response = self._request_with_retry('POST', f"{self.base_url}/git/blobs", (201,), json={
+            "content": base64.b64encode(content).decode('ascii'),
+            "encoding": "base64"
+        })
+        sha = response.json()["sha"]
+        if expected_sha and sha != expected_sha:
+            logger.warning(f"Blob SHA mismatch: expected {expected_sha}, got {sha}")
+        return sha
+        
+    def _commit_tree(self, tree_entries: List[Dict[str, Any]], message: str, branch: str = "main") -> str:
+        """One tree on top of the branch head, one commit, one fast-forward ref update"""
+        for attempt in range(CLONER_REF_RETRIES):
+            ref = self._request_with_retry('GET', f"{self.base_url}/git/ref/heads/{branch}", (200,), timeout=10)
+            head_sha = ref.json()["object"]["sha"]
+            head_commit = self._request_with_retry('GET', f"{self.base_url}/git/commits/{head_sha}", (200,), timeout=10)
+            
+            tree = self._request_with_retry('POST', f"{self.base_url}/git/trees", (201, 422), json={
+                "base_tree": head_commit.json()["tree"]["sha"],
+                "tree": tree_entries
+            }, timeout=60)
+            if tree.status_code == 422:
+                if is_missing_blob_response(tree.status_code, tree.text):
+                    raise MissingBlobError(f"Tree references missing blobs: {tree.text[:200]}")
+                raise RuntimeError(f"POST {self.base_url}/git/trees failed: 422 - {tree.text[:200]}")
+            commit = self._request_with_retry('POST', f"{self.base_url}/git/commits", (201,), json={
+                "message": message,
+                "tree": tree.json()["sha"],
+                "parents": [head_sha]
+            })
+            commit_sha = commit.json()["sha"]
+            
+            ref_update = self._request_with_retry('PATCH', f"{self.base_url}/git/refs/heads/{branch}", (200, 422), json={
+                "sha": commit_sha,
+                "force": False
+            })
+            if ref_update.status_code == 200:
+                return commit_sha
+                
+            # Someone else pushed in between: rebuild the tree on the new head
+            logger.warning(f"Branch {branch} moved while uploading (attempt {attempt + 1}/{CLONER_REF_RETRIES}), retrying...")
+            
+        raise RuntimeError(f"Could not update branch {branch} after {CLONER_REF_RETRIES} attempts")
+        
+    def _upload_per_file(
+        self,
+        site_name: str,
+        folder_path: str,
+        files_to_upload: Dict[str, Dict[str, Any]]
+    ) -> Tuple[List[str], List[str]]:
+        """Legacy mode: one Contents API commit per file"""
+        uploaded_files = []
+        failed_files = []
+        
+        for filename, data in files_to_upload.items():
+            file_path = f"{folder_path}/{filename}"
+            
+            try:
+                success = self._upload_file(
+                    file_path=file_path,
+                    content=data['content'],
+                    message=f"Add {filename} for {site_name}"
+                )
+                
+                if success:
+                    uploaded_files.append(filename)
+                    logger.info(f"✅ Uploaded: {filename}")
+                else:
+                    failed_files.append(filename)
+                    logger.warning(f"❌ Failed: {filename}")
+                    
+            except Exception as e:
+                logger.error(f"Error uploading {filename}: {str(e)}")
+                failed_files.append(filename)
+                
+        return uploaded_files, failed_files
+        
     def _upload_file(
         self,
         file_path: str,
@@ -213,7 +463,7 @@ class GitHubClonerUploader:
         try:
             # Check if file exists
             check_url = f"{self.base_url}/contents/{file_path}"
-            response = requests.get(check_url, headers=self.headers, timeout=10)
+            response = self.session.get(check_url, timeout=10)
             
             sha = None
             if response.status_code == 200:
@@ -236,9 +486,8 @@ class GitHubClonerUploader:
                 payload["sha"] = sha
                 
             # Upload
-            response = requests.put(
+            response = self.session.put(
                 check_url,
-                headers=self.headers,
                 json=payload,
                 timeout=30
             )
@@ -256,11 +505,13 @@ class GitHubClonerUploader:
     def _optimize_for_jsdelivr(
         self,
         resources: Dict[str, Dict[str, Any]],
-        folder_path: str
+        folder_path: str,
+        shared_paths: Optional[Dict[str, str]] = None
     ) -> Dict[str, Dict[str, Any]]:
         """
         Optimize resources to use jsDelivr CDN URLs
         Replaces local paths with CDN URLs in HTML and CSS
+        (files in shared_paths point at their shared _assets/ URL)
         """
         logger.info("🔧 Optimizing resources for jsDelivr CDN...")
         
@@ -269,9 +520,13 @@ class GitHubClonerUploader:
         
         # Build resource map (filename -> CDN URL)
         resource_map = {}
+        shared_paths = shared_paths or {}
         for filename in resources.keys():
             if filename != 'index.html':
-                cdn_url = f"{cdn_base}/{filename}"
+                if filename in shared_paths:
+                    cdn_url = f"{self.jsdelivr_base}/{shared_paths[filename]}"
+                else:
+                    cdn_url = f"{cdn_base}/{filename}"
                 resource_map[filename] = cdn_url
                 
         # Process HTML
@@ -345,7 +600,7 @@ class GitHubClonerUploader:
         """List all cloned websites in the repository"""
         try:
             url = f"{self.base_url}/contents/clonedwebs"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(url, timeout=10)
             
             if response.status_code == 200:
                 contents = response.json()
@@ -377,7 +632,7 @@ class GitHubClonerUploader:
             
             # Get all files in folder
             url = f"{self.base_url}/contents/{folder_path}"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(url, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Failed to get folder contents: {response.status_code}")
@@ -395,9 +650,8 @@ class GitHubClonerUploader:
                         "branch": "main"
                     }
                     
-                    del_response = requests.delete(
+                    del_response = self.session.delete(
                         delete_url,
-                        headers=self.headers,
                         json=payload,
                         timeout=10
                     )
@@ -418,7 +672,8 @@ def upload_cloned_website(
     resources: Dict[str, Dict[str, Any]],
     github_token: Optional[str] = None,
     github_owner: Optional[str] = None,
-    optimize_for_jsdelivr: bool = True
+    optimize_for_jsdelivr: bool = True,
+    progress_callback: Optional[Callable[[int, int, List[str]], None]] = None
 ) -> Dict[str, Any]:
     """
     Convenience function to upload a cloned website
@@ -431,7 +686,7 @@ def upload_cloned_website(
         )
     """
     uploader = GitHubClonerUploader(github_token, github_owner)
-    return uploader.upload_cloned_website(site_name, resources, optimize_for_jsdelivr)
+    return uploader.upload_cloned_website(site_name, resources, optimize_for_jsdelivr, progress_callback)
 
 
 if __name__ == "__main__":
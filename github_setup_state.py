@@ -0,0 +1,146 @@
+"""
+GitHub Setup State
+==================
+Estado persistido (SQLite WAL, compartido entre workers) de la configuración
+del repositorio de landings: acceso/permisos, GitHub Pages y dominio propio.
+
+Antes cada publicación llamaba a setup_github_pages(), setup_custom_domain()
+y _verify_github_repository_access(): entre 2 y 4 round trips a la API de
+GitHub (y un commit del CNAME) que casi nunca cambian nada. Ahora:
+
+- Un chequeo exitoso se guarda con TTL (GITHUB_SETUP_STATE_TTL_SECONDS).
+- Mientras no expire, la publicación va directo a escribir contenido.
+- Si una publicación falla, el estado del repo se invalida y la siguiente
+  vuelve a verificar todo (revalidación por error o por expiración).
+- La llave incluye un hash del token: otro token (otros permisos) no
+  reutiliza las verificaciones del anterior.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from sqlite_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+GITHUB_SETUP_STATE_DB = os.getenv('GITHUB_SETUP_STATE_DB', 'github_setup_state.db')
+GITHUB_SETUP_STATE_TTL_SECONDS = float(os.getenv('GITHUB_SETUP_STATE_TTL_SECONDS', str(6 * 3600)))
+
+
+def setup_scope(owner: str, repo: str, token: Optional[str]) -> str:
+    """owner/repo + hash del token (nunca el token en claro)"""
+    token_hash = hashlib.sha256((token or '').encode('utf-8')).hexdigest()[:16]
+    return f"{owner}/{repo}#{token_hash}"
+
+
+GITHUB_SETUP_STATE_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS github_setup_state (
+            scope TEXT NOT NULL,
+            check_name TEXT NOT NULL,
+            value TEXT NOT NULL,
+            checked_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (scope, check_name)
+        )
+    ''',
+)
+
+
+class GitHubSetupState:
+    """Resultados de chequeos de configuración con TTL e invalidación por scope"""
+
+    def __init__(self, db_path: str = GITHUB_SETUP_STATE_DB, ttl_seconds: float = GITHUB_SETUP_STATE_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._hits = 0
+        self._checks = 0
+
+    def _get_db(self) -> sqlite3.Connection:
+        return get_connection(self.db_path, schema=GITHUB_SETUP_STATE_SCHEMA)
+
+    def get(self, scope: str, check_name: str) -> Optional[Any]:
+        """Valor guardado si no expiró, o None"""
+        try:
+            conn = self._get_db()
+            try:
+                row = conn.execute(
+                    'SELECT value FROM github_setup_state WHERE scope = ? AND check_name = ? AND expires_at > ?',
+                    (scope, check_name, time.time())
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Estado de setup de GitHub no disponible: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, scope: str, check_name: str, value: Any, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            conn = self._get_db()
+            try:
+                conn.execute('''
+                    INSERT OR REPLACE INTO github_setup_state (scope, check_name, value, checked_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (scope, check_name, json.dumps(value), now, now + ttl_seconds))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar el estado de setup de GitHub: {e}")
+
+    def invalidate(self, scope: str, check_name: Optional[str] = None):
+        """Olvida un chequeo (o todos los del scope) para revalidar en el próximo uso"""
+        try:
+            conn = self._get_db()
+            try:
+                if check_name is None:
+                    conn.execute('DELETE FROM github_setup_state WHERE scope = ?', (scope,))
+                else:
+                    conn.execute('DELETE FROM github_setup_state WHERE scope = ? AND check_name = ?', (scope, check_name))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo invalidar el estado de setup de GitHub: {e}")
+
+    def ensure(self, scope: str, check_name: str, check: Callable[[], Any],
+               is_ok: Callable[[Any], bool] = bool, force: bool = False) -> Any:
+        """
+        Retorna el resultado guardado del chequeo o lo ejecuta. Solo se guardan
+        los resultados que pasan `is_ok`: un fallo se vuelve a verificar siempre.
+        """
+        if not force:
+            cached = self.get(scope, check_name)
+            if cached is not None:
+                self._hits += 1
+                return cached
+
+        self._checks += 1
+        value = check()
+        if is_ok(value):
+            self.put(scope, check_name, value)
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "checks": self._checks
+        }
+
+
+# Instancia global
+_github_setup_state = GitHubSetupState()
+
+
+def get_github_setup_state() -> GitHubSetupState:
+    """Obtiene el estado global de setup de GitHub"""
+    return _github_setup_state
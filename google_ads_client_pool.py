@@ -0,0 +1,201 @@
+"""
+Google Ads Client Pool
+======================
+Pool LRU acotado de instancias de GoogleAdsClient, una por credencial.
+
+Crear un cliente por request implica parsear la configuración, refrescar el
+access token OAuth y abrir un canal gRPC nuevo en cada llamada. El pool
+reutiliza el mismo cliente (y por lo tanto sus credenciales y canales) para
+la misma combinación de refresh token, client id y login customer id:
+- Las credenciales OAuth se refrescan solas cuando el access token expira.
+- Los servicios (get_service) se memorizan por cliente, así los canales gRPC
+  se reutilizan entre requests.
+- Cada llamada mutate* notifica a los listeners registrados con
+  register_mutate_listener (ej. para invalidar caches de lectura).
+"""
+
+import os
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from google.ads.googleads.client import GoogleAdsClient
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ADS_CLIENT_POOL_SIZE = int(os.getenv('GOOGLE_ADS_CLIENT_POOL_SIZE', '16'))
+GOOGLE_ADS_CLIENT_MAX_AGE_SECONDS = int(os.getenv('GOOGLE_ADS_CLIENT_MAX_AGE_SECONDS', '21600'))  # 6 horas
+
+
+def _hash_secret(value: Optional[str]) -> str:
+    """Nunca usar el refresh token en claro como llave del pool"""
+    return hashlib.sha256((value or '').encode('utf-8')).hexdigest()[:32]
+
+
+# Callbacks (customer_id) invocados después de cada mutate
+_mutate_listeners: List[Callable[[str], None]] = []
+
+
+def register_mutate_listener(callback: Callable[[str], None]):
+    """Registra un callback que recibe el customer_id de cada mutate del proceso"""
+    if callback not in _mutate_listeners:
+        _mutate_listeners.append(callback)
+
+
+def _notify_mutate(customer_id: Optional[str]):
+    if not customer_id:
+        return
+    customer_id = str(customer_id).replace('-', '')
+    for callback in list(_mutate_listeners):
+        try:
+            callback(customer_id)
+        except Exception as e:
+            logger.warning(f"Listener de mutate falló para {customer_id}: {e}")
+
+
+def _mutate_customer_id(args, kwargs) -> Optional[str]:
+    """customer_id de una llamada mutate (kwarg o request=...)"""
+    if kwargs.get('customer_id'):
+        return kwargs['customer_id']
+    mutate_request = kwargs.get('request') or (args[0] if args else None)
+    if isinstance(mutate_request, dict):
+        return mutate_request.get('customer_id')
+    return getattr(mutate_request, 'customer_id', None)
+
+
+class _MutateNotifyingService:
+    """Proxy de un servicio: delega todo y notifica los mutate* (exitosos o no)"""
+
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not name.startswith('mutate') or not callable(attr):
+            return attr
+
+        def mutate(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                # Aun con error parcial pudo haber cambios: invalidar igual
+                _notify_mutate(_mutate_customer_id(args, kwargs))
+        return mutate
+
+
+def _memoize_services(client: GoogleAdsClient):
+    """Envuelve client.get_service para reutilizar servicios (y sus canales gRPC)"""
+    original_get_service = client.get_service
+    services: Dict[Tuple, Any] = {}
+    lock = threading.Lock()
+
+    def get_service(name, version=None, interceptors=None):
+        if interceptors:
+            # Interceptores custom: no compartir el servicio
+            if version:
+                return _MutateNotifyingService(original_get_service(name, version=version, interceptors=interceptors))
+            return _MutateNotifyingService(original_get_service(name, interceptors=interceptors))
+
+        key = (name, version)
+        with lock:
+            service = services.get(key)
+            if service is None:
+                service = original_get_service(name, version=version) if version else original_get_service(name)
+                service = services[key] = _MutateNotifyingService(service)
+            return service
+
+    client.get_service = get_service
+    return client
+
+
+class GoogleAdsClientPool:
+    """
+    Pool LRU de GoogleAdsClient por (hash refresh token, client id, login customer id).
+    """
+
+    def __init__(self, max_size: int = GOOGLE_ADS_CLIENT_POOL_SIZE, max_age_seconds: int = GOOGLE_ADS_CLIENT_MAX_AGE_SECONDS):
+        self.max_size = max(1, max_size)
+        self.max_age_seconds = max_age_seconds
+        self._clients: "OrderedDict[Tuple, Tuple[GoogleAdsClient, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(config: Dict[str, Any]) -> Tuple:
+        login_customer_id = str(config.get('login_customer_id') or '').replace('-', '')
+        return (
+            _hash_secret(config.get('refresh_token')),
+            config.get('client_id') or '',
+            login_customer_id,
+            _hash_secret(config.get('developer_token')),
+        )
+
+    def get_client(self, config: Dict[str, Any]) -> GoogleAdsClient:
+        """Retorna un cliente reutilizado para la credencial o crea uno nuevo"""
+        key = self.make_key(config)
+        now = time.time()
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                client, created_at = entry
+                if now - created_at < self.max_age_seconds:
+                    self._clients.move_to_end(key)
+                    self._hits += 1
+                    return client
+                # Expirado: se reconstruye abajo
+                del self._clients[key]
+
+            self._misses += 1
+            client = _memoize_services(GoogleAdsClient.load_from_dict(config))
+            self._clients[key] = (client, now)
+
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+
+            return client
+
+    def invalidate(self, config: Dict[str, Any]):
+        """Descarta el cliente de una credencial (ej. tras un error de autenticación)"""
+        with self._lock:
+            self._clients.pop(self.make_key(config), None)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def _reset_after_fork(self):
+        """En el hijo el lock pudo quedar tomado por otro hilo del padre"""
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._clients),
+                "max_size": self.max_size,
+                "max_age_seconds": self.max_age_seconds,
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+
+# Instancia global por proceso
+_client_pool = GoogleAdsClientPool()
+
+# Los canales gRPC no sobreviven a un fork: cada worker arranca con el pool vacío
+os.register_at_fork(after_in_child=_client_pool._reset_after_fork)
+
+
+def get_client_pool() -> GoogleAdsClientPool:
+    """Obtiene el pool global de clientes"""
+    return _client_pool
+
+
+def get_pooled_client(config: Dict[str, Any]) -> GoogleAdsClient:
+    """Atajo: cliente de Google Ads reutilizado para la configuración dada"""
+    return _client_pool.get_client(config)
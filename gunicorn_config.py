@@ -67,6 +67,11 @@ reload_engine = 'auto'
 # Preload app for better performance
 preload_app = True
 
+# Schedulers (Circuit Breaker / Profit Guardian): no arrancarlos al importar app.py
+# en el master, sino en cada worker tras el fork con elección de líder.
+# Solo un worker ejecuta los jobs; si se recicla (max_requests) otro toma el relevo.
+os.environ.setdefault('SCHEDULER_START_MODE', 'post_fork')
+
 # Worker lifecycle hooks
 def on_starting(server):
     """Called just before the master process is initialized."""
@@ -83,6 +88,23 @@ def when_ready(server):
     server.log.info(f"⏱️  Timeout: {timeout}s (AI optimization support)")
     server.log.info(f"🚀 Professional Plan: Autoscaling enabled, 500GB bandwidth")
 
+def post_fork(server, worker):
+    """Called just after a worker has been forked."""
+    if os.environ.get('SCHEDULER_START_MODE') == 'post_fork':
+        from app import start_background_schedulers
+        start_background_schedulers()
+    
+    # Presupuesto de memoria por worker (WORKER_RSS_BUDGET_MB, ver startup_profile.py)
+    from startup_profile import check_budget
+    check_budget(f"Worker {worker.pid}")
+    from heavy_task_runner import get_heavy_task_runner
+    get_heavy_task_runner().record_worker_memory(force=True)
+
+def worker_exit(server, worker):
+    """Called just after a worker has exited."""
+    from scheduler_leader import get_scheduler_leader
+    get_scheduler_leader().release()
+
 def worker_int(worker):
     """Called when a worker receives the INT or QUIT signal."""
     worker.log.info(f"⚠️ Worker {worker.pid} interrupted")
@@ -0,0 +1,483 @@
+"""
+Heavy Task Runner
+=================
+Ejecuta trabajos pesados (clonación con Playwright, WebCloner, procesamiento
+de video) en procesos hijos aislados, fuera del worker de gunicorn.
+
+En el host de 512MB un solo clonado o video podía llevar al worker por
+encima de la memoria disponible y el OOM killer lo mataba a mitad de
+request. Con este runner:
+
+- El hijo es un intérprete nuevo (`python heavy_task_runner.py`): no hereda
+  los ~150MB del worker ni re-importa app.py, y corre en su propia sesión.
+- RLIMIT_AS (HEAVY_TASK_ADDRESS_SPACE_MB) limita el espacio de direcciones
+  del hijo: una asignación desmedida termina en MemoryError dentro del hijo,
+  no en un OOM del host. Chromium/Node reservan varios GB de memoria
+  virtual y no arrancan bajo RLIMIT_AS, así que las tareas de navegador
+  corren sin ese límite (limit_address_space=False).
+- Un watchdog en el padre suma el RSS de todo el árbol del hijo (incluido el
+  navegador) y lo mata si supera HEAVY_TASK_RSS_LIMIT_MB o el timeout. Las
+  tareas de navegador usan HEAVY_TASK_BROWSER_RSS_LIMIT_MB.
+- HEAVY_TASK_MAX_CONCURRENT limita los hijos simultáneos en todo el host
+  (flock sobre archivos de slot, compartido entre workers).
+- La tarea se entrega en un archivo temporal (pickle); el progreso llega por
+  un pipe (JSON por línea) al callback del padre y el resultado vuelve en
+  otro archivo temporal, sin pasar por el pipe.
+- Peak RSS por worker: record_worker_memory() guarda el RSS actual y el pico
+  de cada worker en SQLite para que /api/system/memory los muestre todos.
+
+HEAVY_TASK_MODE=inline ejecuta las tareas en el mismo proceso (desarrollo).
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import pickle
+import select
+import signal
+import sqlite3
+import logging
+import tempfile
+import importlib
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlite_pool import get_connection
+from startup_profile import current_rss_mb, peak_rss_mb, WORKER_RSS_BUDGET_MB
+
+logger = logging.getLogger(__name__)
+
+HEAVY_TASK_MODE = os.getenv('HEAVY_TASK_MODE', 'subprocess')
+HEAVY_TASK_ADDRESS_SPACE_MB = int(os.getenv('HEAVY_TASK_ADDRESS_SPACE_MB', '768'))
+HEAVY_TASK_RSS_LIMIT_MB = float(os.getenv('HEAVY_TASK_RSS_LIMIT_MB', '256'))
+# Chromium reparte su memoria entre varios procesos que comparten páginas: la
+# suma de VmRSS del árbol cuenta esas páginas varias veces
+HEAVY_TASK_BROWSER_RSS_LIMIT_MB = float(os.getenv('HEAVY_TASK_BROWSER_RSS_LIMIT_MB', '768'))
+# Debajo del timeout de gunicorn (600s) para poder responder con error
+HEAVY_TASK_TIMEOUT_SECONDS = float(os.getenv('HEAVY_TASK_TIMEOUT_SECONDS', '540'))
+HEAVY_TASK_MAX_CONCURRENT = int(os.getenv('HEAVY_TASK_MAX_CONCURRENT', '1'))
+HEAVY_TASK_LOCK_DIR = os.getenv('HEAVY_TASK_LOCK_DIR', '/tmp')
+HEAVY_TASK_DB = os.getenv('HEAVY_TASK_DB', 'heavy_tasks.db')
+WORKER_MEMORY_RECORD_SECONDS = float(os.getenv('WORKER_MEMORY_RECORD_SECONDS', '30'))
+
+WATCHDOG_INTERVAL_SECONDS = 0.5
+RECENT_TASKS_KEPT = 20
+
+
+class HeavyTaskError(RuntimeError):
+    """La tarea falló dentro del proceso hijo (o el hijo murió)"""
+
+
+class HeavyTaskMemoryError(HeavyTaskError):
+    """El hijo excedió su límite de memoria"""
+
+
+class HeavyTaskTimeout(HeavyTaskError):
+    """El hijo no terminó antes del timeout"""
+
+
+def _resolve(entrypoint: str) -> Callable:
+    module_name, func_name = entrypoint.split(':', 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _child_main(spec_path: str, result_path: str, message_fd: int):
+    """Punto de entrada del proceso hijo (ver __main__ al final del módulo)"""
+    def send(*message):
+        try:
+            os.write(message_fd, (json.dumps(message, default=str) + '\n').encode('utf-8'))
+        except OSError:
+            pass
+
+    with open(spec_path, 'rb') as f:
+        spec = pickle.load(f)
+    address_space_mb = spec['address_space_mb']
+    if address_space_mb:
+        import resource
+        limit = address_space_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    try:
+        func = _resolve(spec['entrypoint'])
+        kwargs = spec['kwargs']
+        if spec['progress_kwarg']:
+            kwargs = dict(kwargs, **{spec['progress_kwarg']: lambda pct, msg: send('progress', pct, msg)})
+        value = func(*spec['args'], **kwargs)
+        with open(result_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        send('done')
+    except MemoryError:
+        send('error', 'MemoryError', f'address space limit of {address_space_mb}MB exceeded')
+    except BaseException as e:
+        send('error', type(e).__name__, str(e))
+    finally:
+        os.close(message_fd)
+
+
+def _process_tree(pid: int) -> List[int]:
+    """pid y todos sus descendientes (vía /proc/<pid>/task/*/children)"""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            for tid in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{tid}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def _tree_rss_mb(pid: int) -> float:
+    total_kb = 0
+    for member in _process_tree(pid):
+        try:
+            with open(f'/proc/{member}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def _kill_tree(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait(5)
+
+
+WORKER_MEMORY_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS worker_memory (
+            pid INTEGER PRIMARY KEY,
+            rss_mb REAL,
+            peak_rss_mb REAL,
+            heavy_tasks_completed INTEGER DEFAULT 0,
+            heavy_tasks_failed INTEGER DEFAULT 0,
+            max_child_rss_mb REAL DEFAULT 0,
+            started_at TEXT,
+            updated_at TEXT
+        )
+    ''',
+)
+
+
+class HeavyTaskRunner:
+    """Runner de tareas pesadas en procesos hijos con límites de memoria y tiempo"""
+
+    def __init__(self, db_path: str = HEAVY_TASK_DB):
+        self.db_path = db_path
+        self._stats_lock = threading.Lock()
+        self._last_memory_record = 0.0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats_pid = os.getpid()
+        self._counts = {'completed': 0, 'failed': 0, 'memory_killed': 0, 'timed_out': 0}
+        self._recent = deque(maxlen=RECENT_TASKS_KEPT)
+        self._running = 0
+
+    def _get_db(self) -> sqlite3.Connection:
+        return get_connection(self.db_path, schema=WORKER_MEMORY_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Slots (límite de hijos simultáneos en todo el host)
+    # ------------------------------------------------------------------
+
+    def _acquire_slot(self, deadline: float) -> int:
+        while True:
+            for slot in range(max(1, HEAVY_TASK_MAX_CONCURRENT)):
+                path = os.path.join(HEAVY_TASK_LOCK_DIR, f'heavy_task_slot_{slot}.lock')
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except OSError:
+                    os.close(fd)
+            if time.monotonic() >= deadline:
+                raise HeavyTaskTimeout('no free heavy task slot before the timeout')
+            time.sleep(WATCHDOG_INTERVAL_SECONDS)
+
+    @staticmethod
+    def _release_slot(fd: int):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    def run(self, name: str, entrypoint: str, args: tuple = (), kwargs: Optional[Dict[str, Any]] = None,
+            progress_callback: Optional[Callable[[int, str], None]] = None,
+            progress_kwarg: str = 'progress_callback', limit_address_space: bool = True,
+            rss_limit_mb: Optional[float] = None, timeout_seconds: Optional[float] = None) -> Any:
+        """
+        Ejecuta `entrypoint` ("modulo:funcion") en un proceso hijo y retorna su resultado.
+
+        Si hay progress_callback, la función recibe en `progress_kwarg` un
+        callback (pct, msg) cuyas llamadas se reenvían al padre. Args, kwargs y
+        el resultado deben ser picklables.
+        """
+        kwargs = dict(kwargs or {})
+        if HEAVY_TASK_MODE == 'inline':
+            if progress_callback is not None:
+                kwargs[progress_kwarg] = progress_callback
+            return _resolve(entrypoint)(*args, **kwargs)
+
+        if self._stats_pid != os.getpid():
+            self._reset_stats()
+
+        timeout_seconds = HEAVY_TASK_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+        rss_limit_mb = HEAVY_TASK_RSS_LIMIT_MB if rss_limit_mb is None else rss_limit_mb
+        address_space_mb = HEAVY_TASK_ADDRESS_SPACE_MB if limit_address_space else None
+        started = time.monotonic()
+        deadline = started + timeout_seconds
+
+        slot_fd = self._acquire_slot(deadline)
+        temp_paths = []
+        for suffix in ('spec', 'result'):
+            fd, path = tempfile.mkstemp(prefix=f'heavy_{name}_', suffix=f'.{suffix}.pkl')
+            os.close(fd)
+            temp_paths.append(path)
+        spec_path, result_path = temp_paths
+        read_fd, write_fd = os.pipe()
+        status, peak_child_mb = 'failed', 0.0
+        with self._stats_lock:
+            self._running += 1
+        try:
+            with open(spec_path, 'wb') as f:
+                pickle.dump({
+                    'entrypoint': entrypoint,
+                    'args': tuple(args),
+                    'kwargs': kwargs,
+                    'progress_kwarg': progress_kwarg if progress_callback is not None else None,
+                    'address_space_mb': address_space_mb
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # Sesión propia: el padre puede matar al hijo y a sus descendientes (navegador, ffmpeg)
+            try:
+                process = subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), spec_path, result_path, str(write_fd)],
+                    pass_fds=(write_fd,),
+                    start_new_session=True,
+                    cwd=os.path.dirname(os.path.abspath(__file__))
+                )
+            finally:
+                os.close(write_fd)
+            logger.info(f"🧱 Tarea pesada '{name}' en hijo pid={process.pid} "
+                        f"(RSS máx {rss_limit_mb:.0f}MB, AS {address_space_mb or 'sin límite'}MB)")
+
+            outcome, buffer = None, b''
+            while outcome is None:
+                readable, _, _ = select.select([read_fd], [], [], WATCHDOG_INTERVAL_SECONDS)
+                if readable:
+                    chunk = os.read(read_fd, 65536)
+                    if not chunk:
+                        # EOF sin mensaje final: el hijo murió
+                        outcome = ('died',)
+                        continue
+                    buffer += chunk
+                    *lines, buffer = buffer.split(b'\n')
+                    for line in lines:
+                        message = json.loads(line)
+                        if message[0] != 'progress':
+                            outcome = message
+                        elif progress_callback is not None:
+                            try:
+                                progress_callback(message[1], message[2])
+                            except Exception as e:
+                                logger.warning(f"Callback de progreso de '{name}' falló: {e}")
+                    if outcome is not None:
+                        continue
+
+                # En cada vuelta, no solo cuando select() vence: un hijo que
+                # reporta progreso seguido también debe pasar por el watchdog
+                tree_mb = _tree_rss_mb(process.pid)
+                peak_child_mb = max(peak_child_mb, tree_mb)
+                if tree_mb > rss_limit_mb:
+                    _kill_tree(process)
+                    status = 'memory_killed'
+                    raise HeavyTaskMemoryError(
+                        f"'{name}' exceeded its memory limit ({tree_mb:.0f}MB > {rss_limit_mb:.0f}MB)")
+                if time.monotonic() > deadline:
+                    _kill_tree(process)
+                    status = 'timed_out'
+                    raise HeavyTaskTimeout(f"'{name}' did not finish within {timeout_seconds:.0f}s")
+
+            exitcode = process.wait(30)
+            if outcome[0] == 'done':
+                with open(result_path, 'rb') as f:
+                    value = pickle.load(f)
+                status = 'completed'
+                return value
+            if outcome[0] == 'error':
+                _, error_type, error_message = outcome
+                if error_type == 'MemoryError':
+                    status = 'memory_killed'
+                    raise HeavyTaskMemoryError(f"'{name}': {error_message}")
+                raise HeavyTaskError(f"{error_type}: {error_message}")
+
+            if exitcode == -signal.SIGKILL:
+                # SIGKILL sin mensaje: normalmente el OOM killer del host
+                status = 'memory_killed'
+                raise HeavyTaskMemoryError(f"'{name}' was killed (SIGKILL, likely out of memory)")
+            raise HeavyTaskError(f"'{name}' exited unexpectedly (exit code {exitcode})")
+        finally:
+            self._release_slot(slot_fd)
+            os.close(read_fd)
+            for path in temp_paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elapsed = time.monotonic() - started
+            with self._stats_lock:
+                self._running -= 1
+                self._counts[status] += 1
+                self._recent.append({
+                    'name': name,
+                    'status': status,
+                    'seconds': round(elapsed, 2),
+                    'peak_child_rss_mb': round(peak_child_mb, 1),
+                    'finished_at': datetime.now().isoformat()
+                })
+            logger.info(f"🧱 Tarea pesada '{name}': {status} en {elapsed:.1f}s (pico hijo {peak_child_mb:.0f}MB)")
+            self.record_worker_memory(force=True)
+
+    # ------------------------------------------------------------------
+    # Memoria por worker
+    # ------------------------------------------------------------------
+
+    def worker_memory(self) -> Dict[str, Any]:
+        """RSS actual y pico de este worker"""
+        rss_mb, peak_mb = current_rss_mb(), peak_rss_mb()
+        return {
+            'pid': os.getpid(),
+            'rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+            'peak_rss_mb': round(peak_mb, 1) if peak_mb is not None else None,
+            'rss_budget_mb': WORKER_RSS_BUDGET_MB,
+            'peak_over_budget': peak_mb is not None and peak_mb > WORKER_RSS_BUDGET_MB
+        }
+
+    def record_worker_memory(self, force: bool = False):
+        """Guarda la memoria de este worker (como máximo cada WORKER_MEMORY_RECORD_SECONDS)"""
+        now = time.monotonic()
+        if not force and now - self._last_memory_record < WORKER_MEMORY_RECORD_SECONDS:
+            return
+        self._last_memory_record = now
+        memory = self.worker_memory()
+        completed, failed, max_child = 0, 0, 0
+        with self._stats_lock:
+            if self._stats_pid == os.getpid():
+                completed = self._counts['completed']
+                failed = sum(v for k, v in self._counts.items() if k != 'completed')
+                max_child = max((t['peak_child_rss_mb'] for t in self._recent), default=0)
+        try:
+            conn = self._get_db()
+            try:
+                timestamp = datetime.now().isoformat()
+                conn.execute('''
+                    INSERT INTO worker_memory
+                        (pid, rss_mb, peak_rss_mb, heavy_tasks_completed, heavy_tasks_failed,
+                         max_child_rss_mb, started_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(pid) DO UPDATE SET
+                        rss_mb = excluded.rss_mb,
+                        peak_rss_mb = excluded.peak_rss_mb,
+                        heavy_tasks_completed = excluded.heavy_tasks_completed,
+                        heavy_tasks_failed = excluded.heavy_tasks_failed,
+                        max_child_rss_mb = MAX(worker_memory.max_child_rss_mb, excluded.max_child_rss_mb),
+                        updated_at = excluded.updated_at
+                ''', (memory['pid'], memory['rss_mb'], memory['peak_rss_mb'], completed, failed,
+                      max_child, timestamp, timestamp))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo registrar memoria del worker: {e}")
+
+    def get_workers_memory(self) -> List[Dict[str, Any]]:
+        """Memoria registrada de los workers vivos (los muertos se purgan)"""
+        try:
+            conn = self._get_db()
+            try:
+                rows = conn.execute('''
+                    SELECT pid, rss_mb, peak_rss_mb, heavy_tasks_completed, heavy_tasks_failed,
+                           max_child_rss_mb, started_at, updated_at
+                    FROM worker_memory ORDER BY pid
+                ''').fetchall()
+                workers, dead = [], []
+                for row in rows:
+                    try:
+                        os.kill(row[0], 0)
+                    except ProcessLookupError:
+                        dead.append((row[0],))
+                        continue
+                    except PermissionError:
+                        pass
+                    workers.append({
+                        'pid': row[0],
+                        'rss_mb': row[1],
+                        'peak_rss_mb': row[2],
+                        'heavy_tasks_completed': row[3],
+                        'heavy_tasks_failed': row[4],
+                        'max_child_rss_mb': row[5],
+                        'started_at': row[6],
+                        'updated_at': row[7]
+                    })
+                if dead:
+                    conn.executemany('DELETE FROM worker_memory WHERE pid = ?', dead)
+                    conn.commit()
+            finally:
+                conn.close()
+            return workers
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo leer memoria de workers: {e}")
+            return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            own = self._stats_pid == os.getpid()
+            return {
+                'mode': HEAVY_TASK_MODE,
+                'address_space_limit_mb': HEAVY_TASK_ADDRESS_SPACE_MB,
+                'rss_limit_mb': HEAVY_TASK_RSS_LIMIT_MB,
+                'browser_rss_limit_mb': HEAVY_TASK_BROWSER_RSS_LIMIT_MB,
+                'timeout_seconds': HEAVY_TASK_TIMEOUT_SECONDS,
+                'max_concurrent': HEAVY_TASK_MAX_CONCURRENT,
+                'running': self._running if own else 0,
+                'counts': dict(self._counts) if own else {},
+                'recent': list(self._recent) if own else []
+            }
+
+
+# Instancia global
+_heavy_task_runner = HeavyTaskRunner()
+
+
+def get_heavy_task_runner() -> HeavyTaskRunner:
+    """Obtiene el runner global de tareas pesadas"""
+    return _heavy_task_runner
+
+
+def run_heavy_task(name: str, entrypoint: str, **kwargs) -> Any:
+    """Atajo de get_heavy_task_runner().run(...)"""
+    return _heavy_task_runner.run(name, entrypoint, **kwargs)
+
+
+if __name__ == '__main__':
+    # Proceso hijo: heavy_task_runner.py <spec_path> <result_path> <message_fd>
+    logging.basicConfig(level=logging.INFO)
+    _child_main(sys.argv[1], sys.argv[2], int(sys.argv[3]))
@@ -6,7 +6,10 @@ import re
 import random
 import unicodedata
 import logging
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Any, Dict, List, Optional, Callable, Tuple
 import io
 import uuid
@@ -21,6 +24,12 @@ from google.protobuf.field_mask_pb2 import FieldMask
 
 # Import quality and retry modules
 from landing_quality import validate_landing_page, sanitize_landing_page, QualityLevel
+from landing_manifest import get_landing_manifest, extract_landing_metadata, upsert_entry
+from github_setup_state import get_github_setup_state, setup_scope
+from asset_index import (
+    get_asset_index, content_sha256, git_blob_sha, is_shareable, shared_asset_path, SHARED_ASSETS_DIR,
+    MissingBlobError, is_missing_blob_response
+)
 from retry_handler import (
     RetryHandler, RetryConfig, CircuitBreaker, CircuitBreakerConfig,
     with_retry, OPENAI_CIRCUIT, GITHUB_CIRCUIT, get_all_circuit_breaker_stats
@@ -38,6 +47,52 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 DEFAULT_PUBLIC_DOMAIN = os.getenv("DEFAULT_PUBLIC_LANDING_DOMAIN", "consultadebrujosgratis.store")
 
+# Post-publish asset check. Assets are part of the publish commit (GitHub rejects a tree
+# that references a missing blob), so "commit" trusts that; "http" also confirms they are
+# served by raw.githubusercontent, concurrently and bounded by a deadline; "off" skips both.
+ASSET_VERIFY_MODE = os.getenv("ASSET_VERIFY_MODE", "http")
+ASSET_VERIFY_DEADLINE_SECONDS = float(os.getenv("ASSET_VERIFY_DEADLINE_SECONDS", "10"))
+ASSET_VERIFY_MAX_WORKERS = int(os.getenv("ASSET_VERIFY_MAX_WORKERS", "6"))
+
+# User images are optimized concurrently. Threads instead of processes: Pillow releases the
+# GIL while decoding, resizing and encoding, and a thread doesn't duplicate the worker's memory.
+IMAGE_OPTIMIZE_MAX_WORKERS = int(os.getenv("IMAGE_OPTIMIZE_MAX_WORKERS", "3"))
+# Decoded pixels in flight across all runs of this worker (512MB host, 2 workers)
+IMAGE_OPTIMIZE_MEMORY_MB = float(os.getenv("IMAGE_OPTIMIZE_MEMORY_MB", "96"))
+IMAGE_OPTIMIZE_TIMEOUT_SECONDS = float(os.getenv("IMAGE_OPTIMIZE_TIMEOUT_SECONDS", "60"))
+IMAGE_AI_TIMEOUT_SECONDS = float(os.getenv("IMAGE_AI_TIMEOUT_SECONDS", "30"))
+# Full-size copies of the bitmap alive at once while optimizing (decoded, converted, stripped)
+IMAGE_BITMAP_COPIES = 3
+
+
+class GitBranchUnavailableError(RuntimeError):
+    """The branch can't be read with the Git Data API (empty repository or no such branch)."""
+
+
+class _MemoryBudget:
+    """Counting budget in MB; a reservation larger than the capacity runs alone"""
+
+    def __init__(self, capacity_mb: float):
+        self.capacity_mb = capacity_mb
+        self._in_use_mb = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, mb: float):
+        mb = min(mb, self.capacity_mb)
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_use_mb + mb <= self.capacity_mb)
+            self._in_use_mb += mb
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use_mb -= mb
+                self._cond.notify_all()
+
+
+_image_memory_budget = _MemoryBudget(IMAGE_OPTIMIZE_MEMORY_MB)
+
 # Retry configurations for different services
 OPENAI_RETRY_CONFIG = RetryConfig(
     max_retries=3,
@@ -640,7 +695,7 @@ class LandingPageGenerator:
         response = model.generate_content([
             prompt + " Analiza esta imagen y sugiere mejoras específicas (brillo, contraste, saturación, encuadre).",
             {"mime_type": "image/jpeg", "data": img_data}
-        ])
+        ], request_options={"timeout": IMAGE_AI_TIMEOUT_SECONDS})
         
         ai_suggestions = response.text
         logger.info(f"🧠 Gemini analysis: {ai_suggestions[:200]}...")
@@ -739,10 +794,8 @@ class LandingPageGenerator:
             logger.warning(f"⚠️ Image below minimum resolution ({image.width}x{image.height})")
         
         # Remove EXIF metadata for privacy and smaller file size
-        # Create new image without metadata
-        data = list(image.getdata())
-        image_without_exif = Image.new(image.mode, image.size)
-        image_without_exif.putdata(data)
+        # Create new image without metadata (raw pixel copy, no per-pixel Python objects)
+        image_without_exif = Image.frombytes(image.mode, image.size, image.tobytes())
         logger.info("🔒 Removed EXIF metadata")
         
         # Convert to WebP with intelligent compression
@@ -785,9 +838,7 @@ class LandingPageGenerator:
                 logger.info(f"📏 Resized {position} to max {max_dimension}px")
             
             # Remove EXIF metadata
-            data = list(image.getdata())
-            image_without_exif = Image.new(image.mode, image.size)
-            image_without_exif.putdata(data)
+            image_without_exif = Image.frombytes(image.mode, image.size, image.tobytes())
             logger.info(f"🔒 Removed EXIF metadata from {position}")
             
             with io.BytesIO() as output_buf:
@@ -801,6 +852,97 @@ class LandingPageGenerator:
                 )
                 return output_buf.getvalue()
 
+    def _estimate_image_memory_mb(self, image_bytes: bytes) -> float:
+        """Decoded size of the image while it's being optimized, read from the header only"""
+        try:
+            with io.BytesIO(image_bytes) as buf:
+                width, height = Image.open(buf).size
+        except Exception:
+            return 0.0
+        return width * height * 4 * IMAGE_BITMAP_COPIES / (1024 * 1024)
+
+    def _optimize_user_image(self, position: str, image_bytes: Optional[bytes], url: Optional[str], keywords: List[str], optimize_with_ai: bool, on_reserved: Optional[Callable[[], None]] = None) -> Optional[Tuple[str, bytes, Optional[ImageOptimizationMetrics]]]:
+        """Download (if needed) and optimize one user image. Runs on the image pool.
+        `on_reserved` is called once the image's memory is reserved and the work starts.
+
+        Returns:
+            Tuple of (source_md5, webp_bytes, metrics) or None if the image couldn't be downloaded
+        """
+        if image_bytes is None:
+            logger.info(f"Downloading image from URL: {url}")
+            resp = requests.get(url, timeout=15)
+            if resp.status_code != 200:
+                logger.warning(f"Failed to download image from {url}: {resp.status_code}")
+                return None
+            image_bytes = resp.content
+
+        img_hash = hashlib.md5(image_bytes).hexdigest()
+        metrics = None
+        with _image_memory_budget.reserve(self._estimate_image_memory_mb(image_bytes)):
+            if on_reserved:
+                on_reserved()
+            if optimize_with_ai:
+                try:
+                    webp_data, metrics = self._optimize_image_with_gemini(image_bytes, keywords, position)
+                except Exception as ai_error:
+                    logger.error(f"❌ AI optimization failed for {position}: {ai_error}")
+                    logger.info("⚠️ Falling back to standard compression")
+                    webp_data = self._compress_image_standard(image_bytes, position)
+            else:
+                webp_data = self._compress_image_standard(image_bytes, position)
+        return img_hash, webp_data, metrics
+
+    def _optimize_user_images(self, jobs: List[Tuple[str, Optional[bytes], Optional[str]]], keywords: List[str], optimize_with_ai: bool) -> Dict[str, Tuple[str, bytes, Optional[ImageOptimizationMetrics]]]:
+        """Optimize all user images concurrently.
+
+        `jobs` are (position, image_bytes, url) with either bytes or a URL to download.
+        The stage takes as long as the slowest image: a job that optimizes for longer
+        than IMAGE_OPTIMIZE_TIMEOUT_SECONDS (waiting for memory doesn't count) is
+        abandoned and its image skipped.
+        """
+        if not jobs:
+            return {}
+
+        started_at: Dict[str, float] = {}
+
+        def timed(position: str, image_bytes: Optional[bytes], url: Optional[str]):
+            def reserved():
+                started_at[position] = time.monotonic()
+            return self._optimize_user_image(position, image_bytes, url, keywords, optimize_with_ai, reserved)
+
+        stage_start = time.time()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(jobs), IMAGE_OPTIMIZE_MAX_WORKERS)), thread_name_prefix="ImageOptimize")
+        futures = {executor.submit(timed, *job): job[0] for job in jobs}
+        results = {}
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to process/upload user image at {position}: {e}")
+                        continue
+                    if result is not None:
+                        results[position] = result
+
+                now = time.monotonic()
+                for future in list(pending):
+                    position = futures[future]
+                    if position in started_at and now - started_at[position] > IMAGE_OPTIMIZE_TIMEOUT_SECONDS:
+                        logger.error(f"⏱️ Image optimization for {position} timed out after {IMAGE_OPTIMIZE_TIMEOUT_SECONDS:.0f}s, skipping it")
+                        pending.discard(future)
+        finally:
+            for future in futures:
+                future.cancel()
+            # An abandoned job keeps its thread (and memory reservation) until it returns
+            executor.shutdown(wait=False)
+
+        logger.info(f"🖼️ Optimized {len(results)}/{len(jobs)} images in {time.time() - stage_start:.1f}s")
+        return results
+
     def _system_prompt(self, niche: str = "general", paragraph_template_text: Optional[str] = None, extra_sections: Dict[str, bool] = None) -> str:
         base_prompt = (
             "Eres un generador experto de contenido para Landing Pages de alta conversión. "
@@ -2278,7 +2420,7 @@ class LandingPageGenerator:
 
         raise RuntimeError("GitHub API request failed after all retries")
 
-    def _github_post(self, path: str, payload: dict, retries: int = None) -> requests.Response:
+    def _github_post(self, path: str, payload: dict, retries: int = None, allow_422: bool = False) -> requests.Response:
         """Make POST request to GitHub API with retry logic."""
         if retries is None:
             retries = self.max_retries
@@ -2300,6 +2442,62 @@ class LandingPageGenerator:
                 if response.status_code == 404:
                     raise RuntimeError(f"GitHub repository or path not found: {url}")
                 if response.status_code == 422:
+                    # e.g. a tree that references a missing blob - caller decides
+                    if allow_422:
+                        return response
+                    raise RuntimeError(f"GitHub validation error: {response.text}")
+
+                # For server errors, retry
+                if response.status_code >= 500:
+                    if attempt == retries - 1:
+                        raise RuntimeError(f"GitHub API server error: {response.status_code} - {response.text}")
+                    time.sleep(2 ** attempt)
+                    continue
+
+                return response
+
+            except requests.RequestException as e:
+                if attempt == retries - 1:
+                    raise RuntimeError(f"GitHub API request failed after {retries} attempts: {str(e)}")
+                logger.warning(f"GitHub API request failed (attempt {attempt + 1}): {str(e)}")
+                time.sleep(2 ** attempt)
+
+        raise RuntimeError("GitHub API request failed after all retries")
+
+    def _create_tree(self, base_tree_sha: str, entries: List[Dict[str, Any]]) -> requests.Response:
+        """POST /git/trees; raises MissingBlobError if a referenced blob is not in the repository."""
+        tree_response = self._github_post("/git/trees", {"base_tree": base_tree_sha, "tree": entries}, allow_422=True)
+        if tree_response.status_code == 422:
+            if is_missing_blob_response(tree_response.status_code, tree_response.text):
+                raise MissingBlobError(f"Tree references missing blobs: {tree_response.text[:200]}")
+            raise RuntimeError(f"GitHub validation error: {tree_response.text}")
+        return tree_response
+
+    def _github_patch(self, path: str, payload: dict, retries: int = None, allow_422: bool = False) -> requests.Response:
+        """Make PATCH request to GitHub API with retry logic."""
+        if retries is None:
+            retries = self.max_retries
+
+        url = self._github_api(path)
+        headers = self._github_headers()
+
+        for attempt in range(retries):
+            try:
+                logger.debug(f"GitHub PATCH attempt {attempt + 1}/{retries}: {url}")
+                response = requests.patch(url, headers=headers, json=payload, timeout=self.request_timeout)
+
+                if response.status_code == 401:
+                    raise RuntimeError("GitHub authentication failed. Check GITHUB_TOKEN.")
+                if response.status_code == 403:
+                    if "rate limit" in response.text.lower():
+                        raise RuntimeError("GitHub API rate limit exceeded. Please wait before retrying.")
+                    raise RuntimeError("GitHub API access forbidden. Check repository permissions.")
+                if response.status_code == 404:
+                    raise RuntimeError(f"GitHub repository or path not found: {url}")
+                if response.status_code == 422:
+                    # e.g. ref update that is not a fast-forward - caller may retry on the new head
+                    if allow_422:
+                        return response
                     raise RuntimeError(f"GitHub validation error: {response.text}")
 
                 # For server errors, retry
@@ -2319,8 +2517,162 @@ class LandingPageGenerator:
 
         raise RuntimeError("GitHub API request failed after all retries")
 
-    def _verify_github_repository_access(self) -> Dict[str, Any]:
-        """Verify GitHub repository exists and check permissions."""
+    def _create_blob(self, path: str, content: bytes) -> str:
+        """Create a Git blob for a binary file and return its SHA."""
+        blob_response = self._github_post("/git/blobs", {
+            "content": base64.b64encode(content).decode("ascii"),
+            "encoding": "base64"
+        })
+        if blob_response.status_code != 201:
+            raise RuntimeError(f"Failed to create blob for {path}: {blob_response.status_code} - {blob_response.text[:200]}")
+        return blob_response.json()["sha"]
+
+    def _commit_files_to_github(self, files: Dict[str, bytes], message: str, branch: str = "main", max_ref_retries: int = 3, extra_files: Optional[Callable[[str], Dict[str, bytes]]] = None, known_blobs: Optional[Dict[str, str]] = None) -> str:
+        """
+        Commit several files at once with the Git Data API.
+
+        Creates one blob per binary file, a single tree on top of the branch head,
+        one commit and one ref update - so GitHub Pages rebuilds once no matter
+        how many files are published. Text files (HTML) are inlined in the tree.
+        `extra_files(head_sha)` is called on every attempt for files that depend
+        on the current branch content (e.g. landings.json). Paths in
+        `known_blobs` ({path: blob_sha}) reference a blob already in the
+        repository instead of uploading the bytes again.
+
+        Raises GitBranchUnavailableError if the branch ref returns 404/409
+        (empty repository or missing branch), before anything is uploaded.
+
+        Returns:
+            SHA of the new commit
+        """
+        if not files:
+            raise ValueError("files must contain at least one entry")
+
+        ref_response = self._github_get(f"/git/ref/heads/{branch}")
+        if ref_response.status_code in (404, 409):
+            raise GitBranchUnavailableError(f"Branch {branch} not available: {ref_response.status_code} - {ref_response.text[:200]}")
+
+        # Blobs don't depend on the branch head, create them once
+        known_blobs = dict(known_blobs or {})
+        tree_entries = []
+        for path, content in files.items():
+            entry = {"path": path, "mode": "100644", "type": "blob"}
+            if path.endswith((".html", ".css", ".js", ".json", ".txt")):
+                entry["content"] = content.decode("utf-8")
+            elif path in known_blobs:
+                entry["sha"] = known_blobs[path]
+            else:
+                entry["sha"] = self._create_blob(path, content)
+            tree_entries.append(entry)
+
+        for attempt in range(max_ref_retries):
+            if attempt > 0:
+                ref_response = self._github_get(f"/git/ref/heads/{branch}")
+            if ref_response.status_code != 200:
+                raise RuntimeError(f"Could not read branch {branch}: {ref_response.status_code} - {ref_response.text[:200]}")
+            head_sha = ref_response.json()["object"]["sha"]
+
+            head_commit = self._github_get(f"/git/commits/{head_sha}")
+            if head_commit.status_code != 200:
+                raise RuntimeError(f"Could not read commit {head_sha}: {head_commit.status_code}")
+            base_tree_sha = head_commit.json()["tree"]["sha"]
+
+            entries = list(tree_entries)
+            if extra_files:
+                for path, content in extra_files(head_sha).items():
+                    entries.append({"path": path, "mode": "100644", "type": "blob", "content": content.decode("utf-8")})
+
+            try:
+                tree_response = self._create_tree(base_tree_sha, entries)
+            except MissingBlobError:
+                if not known_blobs:
+                    raise
+                # A reused blob is not in the repository anymore: upload the bytes and retry
+                logger.warning(f"⚠️ Tree rejected with {len(known_blobs)} reused blobs, uploading them")
+                for entry in tree_entries:
+                    if entry["path"] in known_blobs:
+                        entry["sha"] = self._create_blob(entry["path"], files[entry["path"]])
+                get_asset_index().forget(f"{self.github_owner}/{self.github_repo}", [
+                    content_sha256(files[path]) for path in known_blobs
+                ])
+                known_blobs = {}
+                tree_response = self._create_tree(base_tree_sha, entries)
+            if tree_response.status_code != 201:
+                raise RuntimeError(f"Failed to create tree: {tree_response.status_code} - {tree_response.text[:200]}")
+
+            commit_response = self._github_post("/git/commits", {
+                "message": message,
+                "tree": tree_response.json()["sha"],
+                "parents": [head_sha]
+            })
+            if commit_response.status_code != 201:
+                raise RuntimeError(f"Failed to create commit: {commit_response.status_code} - {commit_response.text[:200]}")
+            commit_sha = commit_response.json()["sha"]
+
+            ref_update = self._github_patch(f"/git/refs/heads/{branch}", {"sha": commit_sha, "force": False}, allow_422=True)
+            if ref_update.status_code == 200:
+                logger.info(f"✅ Committed {len(files)} files in one commit ({commit_sha[:7]})")
+                return commit_sha
+
+            # Someone else pushed in between: rebuild the tree on the new head
+            logger.warning(f"Branch {branch} moved while publishing (attempt {attempt + 1}/{max_ref_retries}), retrying...")
+
+        raise RuntimeError(f"Could not update branch {branch} after {max_ref_retries} attempts")
+
+    def _put_file_contents(self, path: str, content_bytes: bytes, message: str) -> Optional[str]:
+        """Create or update a single file with the Contents API (one commit). Returns the commit SHA."""
+        get_response = self._github_get(f"/contents/{path}")
+        sha = None
+        if get_response.status_code == 200:
+            try:
+                sha = get_response.json().get("sha")
+            except (json.JSONDecodeError, KeyError):
+                pass
+        elif get_response.status_code != 404:
+            raise RuntimeError(f"Unexpected GitHub response for {path}: {get_response.status_code} - {get_response.text[:200]}")
+
+        payload = {
+            "message": message,
+            "content": base64.b64encode(content_bytes).decode("ascii"),
+            "branch": "main"
+        }
+        if sha:
+            payload["sha"] = sha
+
+        put_response = self._github_put(f"/contents/{path}", payload)
+        if put_response.status_code not in [200, 201]:
+            error_msg = f"GitHub upload failed for {path}: {put_response.status_code}"
+            try:
+                error_data = put_response.json()
+                if "message" in error_data:
+                    error_msg += f" - {error_data['message']}"
+            except:
+                error_msg += f" - {put_response.text[:200]}"
+            raise RuntimeError(error_msg)
+
+        try:
+            return put_response.json().get("commit", {}).get("sha")
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"Failed to parse GitHub response: {str(e)}")
+
+    def _setup_scope(self) -> str:
+        """Key of this repository + token in the persisted setup state."""
+        return setup_scope(self.github_owner, self.github_repo, self.github_token)
+
+    def _verify_github_repository_access(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Verify GitHub repository exists and check permissions.
+
+        A successful check (exists + push) is reused until it expires or a
+        publish fails; pass force=True to always ask GitHub.
+        """
+        return get_github_setup_state().ensure(
+            self._setup_scope(), "repository_access", self._check_github_repository_access,
+            is_ok=lambda result: result.get("exists") and result.get("can_push"), force=force
+        )
+
+    def _check_github_repository_access(self) -> Dict[str, Any]:
+        """Ask GitHub whether the repository exists and we can push to it."""
         try:
             response = self._github_get("")
             if response.status_code == 200:
@@ -2453,14 +2805,21 @@ class LandingPageGenerator:
 
         except Exception as e:
             logger.error(f"GitHub publishing failed: {str(e)}")
+            get_github_setup_state().invalidate(self._setup_scope())
             raise
 
-    def setup_custom_domain(self) -> bool:
-        """Configure custom domain for GitHub Pages."""
+    def setup_custom_domain(self, force: bool = False) -> bool:
+        """Configure custom domain for GitHub Pages (skipped while a previous setup is still valid)."""
         if not self.custom_domain:
             logger.info("ℹ️ No custom domain configured, using default GitHub Pages URL")
             return True
 
+        return get_github_setup_state().ensure(
+            self._setup_scope(), f"custom_domain:{self.custom_domain}", self._configure_custom_domain, force=force
+        )
+
+    def _configure_custom_domain(self) -> bool:
+        """Create or update the CNAME file (no commit if it already has the domain)."""
         try:
             logger.info(f"🔧 Setting up custom domain: {self.custom_domain}")
 
@@ -2475,8 +2834,12 @@ class LandingPageGenerator:
                 try:
                     file_data = get_response.json()
                     sha = file_data.get("sha")
+                    current = base64.b64decode(file_data.get("content", "")).decode("utf-8").strip()
+                    if current == cname_content:
+                        logger.info("✅ CNAME file already points to the custom domain")
+                        return True
                     logger.info("📄 CNAME file exists, updating...")
-                except (json.JSONDecodeError, KeyError) as e:
+                except (json.JSONDecodeError, KeyError, ValueError) as e:
                     logger.warning(f"Could not parse CNAME file data: {str(e)}")
             elif get_response.status_code == 404:
                 logger.info("📄 CNAME file does not exist, creating...")
@@ -2512,8 +2875,12 @@ class LandingPageGenerator:
             logger.warning(f"Could not setup custom domain: {str(e)}")
             return False
 
-    def setup_github_pages(self) -> bool:
-        """Setup GitHub Pages for the repository if not already enabled."""
+    def setup_github_pages(self, force: bool = False) -> bool:
+        """Setup GitHub Pages for the repository if not already enabled (skipped while a previous setup is still valid)."""
+        return get_github_setup_state().ensure(self._setup_scope(), "github_pages", self._configure_github_pages, force=force)
+
+    def _configure_github_pages(self) -> bool:
+        """Check the Pages configuration and enable it from main / if needed."""
         try:
             logger.info("Setting up GitHub Pages for repository...")
 
@@ -2552,66 +2919,105 @@ class LandingPageGenerator:
             logger.warning(f"Could not setup GitHub Pages: {str(e)}")
             return False
 
+    @staticmethod
+    def _asset_path(filename: str) -> str:
+        """Repository path for an uploaded landing asset."""
+        return f"assets/images/{filename}"
+
+    def _asset_cdn_url(self, path: str) -> str:
+        """jsDelivr URL for a repository path on main."""
+        return f"https://cdn.jsdelivr.net/gh/{self.github_owner}/{self.github_repo}@main/{path}"
+
     def upload_asset_to_github(self, content_bytes: bytes, filename: str) -> str:
         """Upload an asset to GitHub and return the jsdelivr URL."""
-        path = f"assets/images/{filename}"
-        
-        # Check if file exists (to get SHA for update)
-        get_response = self._github_get(f"/contents/{path}")
-        sha = None
-        if get_response.status_code == 200:
-            try:
-                sha = get_response.json().get("sha")
-            except:
-                pass
-            
-        # Encode content
-        content_b64 = base64.b64encode(content_bytes).decode("ascii")
-        
-        payload = {
-            "message": f"Upload asset: {filename}",
-            "content": content_b64,
-            "branch": "main"
-        }
-        if sha:
-            payload["sha"] = sha
-            
-        put_response = self._github_put(f"/contents/{path}", payload)
-        
-        if put_response.status_code not in [200, 201]:
-             raise RuntimeError(f"Failed to upload asset {filename}: {put_response.text}")
-             
-        # Return jsdelivr URL
-        return f"https://cdn.jsdelivr.net/gh/{self.github_owner}/{self.github_repo}@main/{path}"
+        path = self._asset_path(filename)
+        self._put_file_contents(path, content_bytes, f"Upload asset: {filename}")
+        return self._asset_cdn_url(path)
+
+    def _shared_asset(self, content: bytes, extension: str = ".webp") -> Tuple[str, Optional[str]]:
+        """
+        Content-addressed repository path for an asset, plus the blob SHA if the
+        same bytes are already published in this repository (see asset_index.py).
+        Without dedupe (disabled or tiny file) a unique assets/images/ path is used.
+        """
+        if not is_shareable(f"asset{extension}", content):
+            return self._asset_path(f"{uuid.uuid4()}{extension}"), None
+        sha256 = content_sha256(content)
+        path = shared_asset_path(sha256, f"asset{extension}")
+        indexed = get_asset_index().lookup(f"{self.github_owner}/{self.github_repo}", sha256)
+        if indexed and indexed["path"] == path and indexed["blob_sha"] == git_blob_sha(content):
+            return path, indexed["blob_sha"]
+        return path, None
+
+    def _record_shared_assets(self, assets: Dict[str, bytes]):
+        """Add published _assets/ files to the content index for later landings."""
+        get_asset_index().record_many(f"{self.github_owner}/{self.github_repo}", [
+            (content_sha256(content), path, git_blob_sha(content), len(content))
+            for path, content in assets.items()
+            if path.startswith(f"{SHARED_ASSETS_DIR}/")
+        ])
 
-    def _verify_asset_availability(self, filename: str, max_retries: int = 3) -> bool:
+    def _verify_asset_availability(self, path: str, deadline_seconds: Optional[float] = None) -> bool:
         """
         Diagnostic: Verify that the asset was successfully uploaded and is accessible.
-        Checks the raw GitHub URL for immediate availability.
+        `path` is the repository path (a bare filename is looked up under assets/images/).
         """
-        raw_url = f"https://raw.githubusercontent.com/{self.github_owner}/{self.github_repo}/main/assets/images/{filename}"
-        
-        for i in range(max_retries):
-            try:
-                response = requests.head(raw_url, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"✅ Asset verification successful: {filename}")
-                    return True
-                elif response.status_code == 404:
-                    logger.warning(f"Asset not found yet (attempt {i+1}/{max_retries}): {filename}")
-                else:
-                    logger.warning(f"Asset verification returned {response.status_code} (attempt {i+1}/{max_retries})")
-            except Exception as e:
-                logger.warning(f"Asset verification error (attempt {i+1}/{max_retries}): {e}")
-            
-            if i < max_retries - 1:
-                time.sleep(1) # Wait before retry
-                
-        logger.error(f"❌ Asset verification failed after {max_retries} attempts: {filename}")
-        return False
+        if "/" not in path:
+            path = self._asset_path(path)
+        return self._verify_assets_available([path], deadline_seconds).get(path, False)
+
+    def _verify_assets_available(self, paths: List[str], deadline_seconds: Optional[float] = None) -> Dict[str, bool]:
+        """
+        Check concurrently that published assets are served by raw.githubusercontent.
+
+        Every path is HEAD-polled with exponential backoff (0.25s, 0.5s, 1s, ...)
+        until it answers 200 or the shared deadline passes.
+        """
+        if not paths:
+            return {}
+        if deadline_seconds is None:
+            deadline_seconds = ASSET_VERIFY_DEADLINE_SECONDS
+        deadline = time.monotonic() + deadline_seconds
+
+        def check(path: str) -> bool:
+            raw_url = f"https://raw.githubusercontent.com/{self.github_owner}/{self.github_repo}/main/{path}"
+            delay = 0.25
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    response = requests.head(raw_url, timeout=max(1.0, min(5.0, remaining)))
+                    if response.status_code == 200:
+                        return True
+                    logger.debug(f"Asset not served yet ({response.status_code}): {path}")
+                except requests.RequestException as e:
+                    logger.debug(f"Asset verification error for {path}: {e}")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(delay, remaining))
+                delay *= 2
+
+        with ThreadPoolExecutor(max_workers=min(len(paths), ASSET_VERIFY_MAX_WORKERS)) as executor:
+            results = dict(zip(paths, executor.map(check, paths)))
+
+        served = sum(results.values())
+        if served == len(results):
+            logger.info(f"✅ Asset verification successful: {served}/{len(results)} served")
+        else:
+            logger.error(f"❌ Asset verification: {len(results) - served}/{len(results)} not served after {deadline_seconds:.0f}s")
+        return results
 
-    def publish_as_github_pages(self, folder_name: str, html_content: str) -> Dict[str, Any]:
-        """Publish landing page optimized for GitHub Pages."""
+    def publish_as_github_pages(self, folder_name: str, html_content: str, assets: Optional[Dict[str, bytes]] = None, known_blobs: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Publish landing page optimized for GitHub Pages.
+
+        The HTML and any assets ({repo_path: bytes}) are pushed together in a
+        single Git commit, so Pages rebuilds once per landing. Assets listed in
+        `known_blobs` ({repo_path: blob_sha}) are already published and are
+        referenced instead of re-uploaded. Falls back to one Contents API
+        commit per file only if the branch can't be read with the Git Data API
+        (empty repository or no `main`); any other error is raised.
+        """
         if not folder_name or not isinstance(folder_name, str):
             raise ValueError("folder_name must be a non-empty string")
         if not html_content or not isinstance(html_content, str):
@@ -2622,7 +3028,7 @@ class LandingPageGenerator:
         if content_size > 50 * 1024 * 1024:  # 50MB limit
             raise ValueError(f"HTML content too large: {content_size} bytes. Maximum allowed: 50MB")
 
-        # Setup GitHub Pages first
+        # Setup GitHub Pages first (cached: steady-state publishes go straight to the commit)
         self.setup_github_pages()
 
         # Setup custom domain if configured
@@ -2634,89 +3040,66 @@ class LandingPageGenerator:
         # For GitHub Pages, use the clean folder name (not the full domain alias)
         folder = folder_name
         path = f"{folder}/index.html"
+        assets = assets or {}
 
-        logger.info(f"🚀 Publishing to GitHub Pages: {folder}/index.html")
+        logger.info(f"🚀 Publishing to GitHub Pages: {folder}/index.html (+{len(assets)} assets)")
 
         try:
-            # Check if file exists
-            get_response = self._github_get(f"/contents/{path}")
-            sha = None
-
-            if get_response.status_code == 200:
-                try:
-                    file_data = get_response.json()
-                    sha = file_data.get("sha")
-                    logger.info(f"📄 File exists, updating...")
-                except (json.JSONDecodeError, KeyError) as e:
-                    logger.warning(f"Could not parse existing file data: {str(e)}")
-            elif get_response.status_code == 404:
-                logger.info("📄 File does not exist, creating new...")
-            else:
-                error_msg = f"Unexpected GitHub response: {get_response.status_code}"
-                try:
-                    error_data = get_response.json()
-                    if "message" in error_data:
-                        error_msg += f" - {error_data['message']}"
-                except:
-                    error_msg += f" - {get_response.text[:200]}"
-                raise RuntimeError(error_msg)
-
-            # Encode content
             try:
-                content_b64 = base64.b64encode(html_content.encode("utf-8")).decode("ascii")
+                html_bytes = html_content.encode("utf-8")
             except (UnicodeEncodeError, UnicodeDecodeError) as e:
                 raise RuntimeError(f"Failed to encode HTML content: {str(e)}")
 
-            # Prepare payload
-            payload = {
-                "message": f"🚀 Deploy landing page: {alias}",
-                "content": content_b64,
-                "branch": "main"
-            }
-
-            if sha:
-                payload["sha"] = sha
-
-            # Upload file
-            put_response = self._github_put(f"/contents/{path}", payload)
+            # landings.json entry for the history endpoint, committed together with the landing
+            manifest = get_landing_manifest(self.github_owner, self.github_repo, self.github_token)
+            manifest_fields = extract_landing_metadata(html_content)
 
-            if put_response.status_code not in [200, 201]:
-                error_msg = f"GitHub upload failed: {put_response.status_code}"
+            def manifest_file(head_sha: str) -> Dict[str, bytes]:
                 try:
-                    error_data = put_response.json()
-                    if "message" in error_data:
-                        error_msg += f" - {error_data['message']}"
-                except:
-                    error_msg += f" - {put_response.text[:200]}"
-                raise RuntimeError(error_msg)
+                    content = manifest.render_update(head_sha, lambda m: upsert_entry(m, folder_name, **manifest_fields))
+                    return {manifest.path: content}
+                except Exception as manifest_error:
+                    logger.warning(f"⚠️ Could not update {manifest.path}: {manifest_error}")
+                    return {}
 
+            message = f"🚀 Deploy landing page: {alias}"
             try:
-                result = put_response.json()
-                commit_sha = result.get("commit", {}).get("sha")
-                logger.info(f"✅ Published to GitHub Pages (commit: {commit_sha})")
-
-                # Generate URL based on domain configuration
-                public_url = self._get_public_url(folder_name)
-                github_preview_url = f"https://{self.github_owner}.github.io/{self.github_repo}/{folder_name}/"
-                logger.info(f"🌐 Public landing URL: {public_url}")
-                if public_url != github_preview_url:
-                    logger.info(f"🔎 GitHub preview URL: {github_preview_url}")
-
-                return {
-                    "commit_sha": commit_sha,
-                    "url": public_url,
-                    "alias": public_url,  # Alias always matches the public URL
-                    "github_preview_url": github_preview_url,
-                    "path": f"{folder_name}/index.html",
-                    "size": content_size,
-                    "custom_domain": self.custom_domain
-                }
+                commit_sha = self._commit_files_to_github({**assets, path: html_bytes}, message, extra_files=manifest_file, known_blobs=known_blobs)
+            except GitBranchUnavailableError as branch_error:
+                logger.warning(f"⚠️ Single-commit publish unavailable ({branch_error}), falling back to per-file uploads")
+                for asset_path, asset_bytes in assets.items():
+                    self._put_file_contents(asset_path, asset_bytes, f"Upload asset: {asset_path.rsplit('/', 1)[-1]}")
+                commit_sha = self._put_file_contents(path, html_bytes, message)
+                try:
+                    manifest.upsert(folder_name, **manifest_fields)
+                except Exception as manifest_error:
+                    logger.warning(f"⚠️ Could not update {manifest.path}: {manifest_error}")
 
-            except json.JSONDecodeError as e:
-                raise RuntimeError(f"Failed to parse GitHub response: {str(e)}")
+            logger.info(f"✅ Published to GitHub Pages (commit: {commit_sha})")
+            self._record_shared_assets(assets)
+
+            # Generate URL based on domain configuration
+            public_url = self._get_public_url(folder_name)
+            github_preview_url = f"https://{self.github_owner}.github.io/{self.github_repo}/{folder_name}/"
+            logger.info(f"🌐 Public landing URL: {public_url}")
+            if public_url != github_preview_url:
+                logger.info(f"🔎 GitHub preview URL: {github_preview_url}")
+
+            return {
+                "commit_sha": commit_sha,
+                "url": public_url,
+                "alias": public_url,  # Alias always matches the public URL
+                "github_preview_url": github_preview_url,
+                "path": f"{folder_name}/index.html",
+                "size": content_size,
+                "assets": list(assets.keys()),
+                "custom_domain": self.custom_domain
+            }
 
         except Exception as e:
             logger.error(f"GitHub Pages publishing failed: {str(e)}")
+            # Revalidate repository, Pages and domain setup on the next publish
+            get_github_setup_state().invalidate(self._setup_scope())
             raise
 
     def build_alias_domain(self, keyword: str) -> str:
@@ -3203,6 +3586,8 @@ class LandingPageGenerator:
 
             # Process user images if provided
             image_metrics = []  # Track optimization metrics
+            pending_assets: Dict[str, bytes] = {}  # repo path -> bytes, committed with index.html
+            known_asset_blobs: Dict[str, str] = {}  # repo path -> blob sha already in the repository
             
             if user_images:
                 processed_images = []
@@ -3220,23 +3605,18 @@ class LandingPageGenerator:
                     pos = img.get("position", "middle")
                     unique_positions[pos] = img
                 
-                # Deduplication Strategy 2: Content Hashing
-                # Avoid uploading the exact same image twice in the same run
-                content_hash_map = {} # hash -> url
-                
+                # Collect sources; downloads and optimization run on the image pool
+                jobs = []  # (position, bytes, url)
                 for pos, img in unique_positions.items():
-                    image_bytes = None
-                    
                     # Case 1: Base64 Content
                     if img.get("content"):
                         try:
                             b64_data = img["content"]
                             if "," in b64_data:
                                 b64_data = b64_data.split(",")[1]
-                            image_bytes = base64.b64decode(b64_data)
+                            jobs.append((pos, base64.b64decode(b64_data), None))
                         except Exception as e:
                             logger.error(f"Failed to decode base64 for user image at {pos}: {e}")
-                            continue
 
                     # Case 2: URL Content
                     elif img.get("url"):
@@ -3245,70 +3625,59 @@ class LandingPageGenerator:
                         if "cdn.jsdelivr.net" in url and self.github_repo in url:
                              processed_images.append(img)
                              continue
-                        
-                        try:
-                            logger.info(f"Downloading image from URL: {url}")
-                            resp = requests.get(url, timeout=15)
-                            if resp.status_code == 200:
-                                image_bytes = resp.content
-                            else:
-                                logger.warning(f"Failed to download image from {url}: {resp.status_code}")
-                        except Exception as e:
-                            logger.error(f"Error downloading image from {url}: {e}")
+                        jobs.append((pos, None, url))
 
-                    # Process and Upload if we have bytes
-                    if image_bytes:
-                        try:
-                            # Calculate hash for deduplication
-                            img_hash = hashlib.md5(image_bytes).hexdigest()
-                            
-                            if img_hash in content_hash_map:
-                                # Reuse existing URL for this content
-                                url = content_hash_map[img_hash]
-                                logger.info(f"♻️ Reusing uploaded image for {pos} (Hash match)")
-                            else:
-                                # AI OPTIMIZATION BRANCH
-                                if optimize_images_with_ai:
-                                    try:
-                                        # Use Gemini to optimize image
-                                        optimized_bytes, metrics = self._optimize_image_with_gemini(
-                                            image_bytes, 
-                                            ctx.keywords, 
-                                            pos
-                                        )
-                                        image_metrics.append(metrics)
-                                        
-                                        # Use optimized bytes
-                                        webp_data = optimized_bytes
-                                    except Exception as ai_error:
-                                        logger.error(f"❌ AI optimization failed for {pos}: {ai_error}")
-                                        logger.info("⚠️ Falling back to standard compression")
-                                        # Fallback: standard compression
-                                        webp_data = self._compress_image_standard(image_bytes, pos)
-                                else:
-                                    # STANDARD COMPRESSION (No AI)
-                                    webp_data = self._compress_image_standard(image_bytes, pos)
-                                
-                                # Generate filename
-                                filename = f"{uuid.uuid4()}.webp"
-                                
-                                # Upload
-                                url = self.upload_asset_to_github(webp_data, filename)
-                                
-                                # Diagnostic: Verify upload
-                                if self._verify_asset_availability(filename):
-                                    content_hash_map[img_hash] = url
-                                else:
-                                    logger.error(f"❌ Image verification failed for {pos}. Skipping.")
-                                    continue
-                            
-                            processed_images.append({
-                                "url": url,
-                                "position": pos
-                            })
-                            logger.info(f"✅ Processed and uploaded user image to {url}")
-                        except Exception as e:
-                            logger.error(f"Failed to process/upload user image: {e}")
+                # Deduplication Strategy 2: Content Hashing
+                # The same base64 content in several positions is optimized once
+                job_by_hash = {}  # md5 -> position of the job that optimizes it
+                alias_positions = {}  # position -> position with identical content
+                unique_jobs = []
+                for pos, image_bytes, url in jobs:
+                    if image_bytes is not None:
+                        img_hash = hashlib.md5(image_bytes).hexdigest()
+                        if img_hash in job_by_hash:
+                            alias_positions[pos] = job_by_hash[img_hash]
+                            continue
+                        job_by_hash[img_hash] = pos
+                    unique_jobs.append((pos, image_bytes, url))
+
+                optimized = self._optimize_user_images(unique_jobs, ctx.keywords, optimize_images_with_ai)
+
+                # Stage results in position order; identical content reuses one URL
+                content_hash_map = {} # hash -> url
+                for pos, _, _ in jobs:
+                    result = optimized.get(alias_positions.get(pos, pos))
+                    if result is None:
+                        continue
+                    try:
+                        img_hash, webp_data, metrics = result
+
+                        if img_hash in content_hash_map:
+                            # Reuse existing URL for this content
+                            url = content_hash_map[img_hash]
+                            logger.info(f"♻️ Reusing uploaded image for {pos} (Hash match)")
+                        else:
+                            if metrics is not None:
+                                image_metrics.append(metrics)
+
+                            # Content-addressed path: identical images across landings share one file and URL
+                            asset_path, existing_blob = self._shared_asset(webp_data)
+                            if existing_blob:
+                                known_asset_blobs[asset_path] = existing_blob
+                                logger.info(f"♻️ Image for {pos} already published at {asset_path}")
+
+                            # Stage for the landing commit (published together with index.html)
+                            pending_assets[asset_path] = webp_data
+                            url = self._asset_cdn_url(asset_path)
+                            content_hash_map[img_hash] = url
+
+                        processed_images.append({
+                            "url": url,
+                            "position": pos
+                        })
+                        logger.info(f"✅ Processed user image, will be published at {url}")
+                    except Exception as e:
+                        logger.error(f"Failed to process/upload user image: {e}")
                 
                 # Update user_images with processed ones
                 user_images = processed_images
@@ -3316,8 +3685,8 @@ class LandingPageGenerator:
                 # Log metrics summary if AI was used
                 if optimize_images_with_ai and image_metrics:
                     total_reduction = sum(m.reduction_percentage for m in image_metrics) / len(image_metrics)
-                    total_time = sum(m.processing_time for m in image_metrics)
-                    logger.info(f"📊 AI Optimization Summary: {len(image_metrics)} images, {total_reduction:.1f}% avg reduction, {total_time:.1f}s total")
+                    total_time = max(m.processing_time for m in image_metrics)
+                    logger.info(f"📊 AI Optimization Summary: {len(image_metrics)} images, {total_reduction:.1f}% avg reduction, {total_time:.1f}s slowest")
 
             # Step 3: Prepare configuration
             config = {
@@ -3378,13 +3747,19 @@ class LandingPageGenerator:
 
             # Step 5: Publish to GitHub Pages
             logger.info("📄 Step 4: Publishing to GitHub Pages...")
-            gh_result = self.publish_as_github_pages(folder_name, html)
+            gh_result = self.publish_as_github_pages(folder_name, html, pending_assets, known_asset_blobs)
             commit_sha = gh_result.get("commit_sha")
             final_url = gh_result.get("url")
             alias = gh_result.get("alias")
             logger.info(f"✅ Published to GitHub Pages (commit: {commit_sha})")
             logger.info(f"🌐 GitHub Pages URL: {final_url}")
 
+            # Diagnostic: the publish commit already proves the assets exist in the repository.
+            # Confirm new ones are served while the health check runs (reused blobs were served before)
+            verify_paths = [p for p in pending_assets if p not in known_asset_blobs] if ASSET_VERIFY_MODE == "http" else []
+            verify_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AssetVerify") if verify_paths else None
+            verify_future = verify_executor.submit(self._verify_assets_available, verify_paths) if verify_executor else None
+
             # Step 6: Health check
             logger.info("🏥 Step 6: Performing health check...")
             ok = self.health_check(final_url, whatsapp_number, phone_number, gtm_id)
@@ -3393,6 +3768,18 @@ class LandingPageGenerator:
             else:
                 logger.info("✅ Health check passed")
 
+            asset_verification = {
+                "mode": ASSET_VERIFY_MODE,
+                "committed": len(pending_assets) if ASSET_VERIFY_MODE != "off" else 0,
+                "not_served": []
+            }
+            if verify_future:
+                served = verify_future.result()
+                verify_executor.shutdown(wait=False)
+                asset_verification["not_served"] = [path for path, available in served.items() if not available]
+                for asset_path in asset_verification["not_served"]:
+                    logger.warning(f"⚠️ Asset not served yet after publish: {asset_path}")
+
             # Step 7: Handle Google Ads based on selected mode
             google_ads_result = None
             if google_ads_mode == "none":
@@ -3466,6 +3853,7 @@ class LandingPageGenerator:
                 "headlines_found": len(ctx.headlines),
                 "google_ads_mode": google_ads_mode,
                 "google_ads_result": google_ads_result,
+                "asset_verification": asset_verification,
                 "quality": quality_data  # Include quality report
             }
             
@@ -3630,7 +4018,7 @@ class LandingPageGenerator:
         results["environment"] = env_vars
 
         # Check repository access
-        repo_check = self._verify_github_repository_access()
+        repo_check = self._verify_github_repository_access(force=True)
         results["repository_check"] = repo_check
 
         if not repo_check.get("exists"):
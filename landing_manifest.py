@@ -0,0 +1,330 @@
+"""
+Landing Manifest
+================
+Índice `landings.json` en la raíz del monorepo de landings.
+
+Antes, el historial listaba la raíz del repo y por cada carpeta descargaba
+index.html (parseándolo con BeautifulSoup) y consultaba la API de commits:
+2N+1 requests por vista. Ahora:
+- publish_as_github_pages, update_landing_metadata, delete_landing_from_github
+  y commit_template_to_github mantienen el manifiesto al día.
+- El historial hace un único GET condicional (If-None-Match) y reutiliza la
+  copia local (compartida entre workers vía archivo) cuando GitHub responde 304.
+- Si el manifiesto aún no existe se reconstruye una sola vez escaneando el repo.
+
+Formato:
+    {"version": 1, "updated_at": "...", "landings": {"<folder>": {
+        "whatsapp_number": ..., "phone_number": ..., "gtm_id": ...,
+        "created_at": ..., "updated_at": ...}}}
+"""
+
+import os
+import re
+import json
+import base64
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.getenv('LANDING_MANIFEST_PATH', 'landings.json')
+MANIFEST_CACHE_DIR = os.getenv('LANDING_MANIFEST_CACHE_DIR', tempfile.gettempdir())
+MANIFEST_WRITE_RETRIES = 3
+GITHUB_TIMEOUT_SECONDS = 30
+
+
+def extract_landing_metadata(html_content: str) -> Dict[str, Optional[str]]:
+    """WhatsApp, teléfono y GTM de una landing (mismo criterio que el historial original)"""
+    # Import diferido: app.py importa este módulo al arrancar y bs4 solo se usa aquí
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    whatsapp_number = None
+    whatsapp_link = soup.find('a', href=lambda x: x and 'wa.me' in x)
+    if whatsapp_link:
+        href = whatsapp_link['href']
+        if 'wa.me/' in href:
+            whatsapp_number = href.split('wa.me/')[-1].split('?')[0]
+
+    phone_number = None
+    phone_link = soup.find('a', href=lambda x: x and x.startswith('tel:'))
+    if phone_link:
+        phone_number = phone_link['href'].replace('tel:', '')
+
+    gtm_id = None
+    gtm_script = soup.find('script', string=lambda x: x and 'GTM-' in x)
+    if gtm_script:
+        match = re.search(r'GTM-[A-Z0-9]+', gtm_script.string)
+        gtm_id = match.group() if match else None
+
+    return {
+        "whatsapp_number": whatsapp_number,
+        "phone_number": phone_number,
+        "gtm_id": gtm_id
+    }
+
+
+def empty_manifest() -> Dict[str, Any]:
+    return {"version": 1, "updated_at": None, "landings": {}}
+
+
+def upsert_entry(manifest: Dict[str, Any], folder_name: str, **fields) -> Dict[str, Any]:
+    """
+    Crea o actualiza la entrada de una landing (created_at se conserva).
+
+    Los campos se escriben tal cual, incluidos los None: un WhatsApp, teléfono
+    o GTM que ya no está en el HTML debe quedar vacío en el manifiesto.
+    """
+    now = datetime.now().isoformat()
+    entry = manifest["landings"].setdefault(folder_name, {"created_at": now})
+    entry.update(fields)
+    entry["updated_at"] = now
+    manifest["updated_at"] = now
+    return manifest
+
+
+def remove_entry(manifest: Dict[str, Any], folder_name: str) -> Dict[str, Any]:
+    manifest["landings"].pop(folder_name, None)
+    manifest["updated_at"] = datetime.now().isoformat()
+    return manifest
+
+
+def serialize_manifest(manifest: Dict[str, Any]) -> bytes:
+    return json.dumps(manifest, indent=2, sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+
+class LandingManifest:
+    """Lectura con ETag y escritura optimista (por SHA) de landings.json"""
+
+    def __init__(self, owner: str, repo: str, token: str, path: str = MANIFEST_PATH, cache_dir: str = MANIFEST_CACHE_DIR):
+        self.owner = owner
+        self.repo = repo
+        self.token = token
+        self.path = path
+        self.cache_file = os.path.join(cache_dir, f"landings_manifest_{owner}_{repo}.json")
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict[str, Any]] = None  # {"etag", "sha", "manifest"}
+
+    # ------------------------------------------------------------------
+    # GitHub
+    # ------------------------------------------------------------------
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"token {self.token}",
+            "Accept": "application/vnd.github+json"
+        }
+
+    def _api(self, path: str) -> str:
+        return f"https://api.github.com/repos/{self.owner}/{self.repo}{path}"
+
+    def _decode_contents(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        raw = data.get("content")
+        if not raw and data.get("sha"):
+            # > 1MB: la Contents API no incluye el contenido, leer el blob
+            blob = requests.get(self._api(f"/git/blobs/{data['sha']}"), headers=self._headers(), timeout=GITHUB_TIMEOUT_SECONDS)
+            blob.raise_for_status()
+            raw = blob.json().get("content", "")
+        manifest = json.loads(base64.b64decode(raw).decode('utf-8'))
+        manifest.setdefault("landings", {})
+        return manifest
+
+    def fetch(self, ref: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Lee el manifiesto. Sin `ref` usa GET condicional contra la copia cacheada.
+
+        Returns:
+            (manifest, sha) o (None, None) si todavía no existe
+        """
+        url = self._api(f"/contents/{self.path}")
+        headers = self._headers()
+
+        if ref:
+            response = requests.get(url, headers=headers, params={"ref": ref}, timeout=GITHUB_TIMEOUT_SECONDS)
+            if response.status_code == 404:
+                return None, None
+            response.raise_for_status()
+            data = response.json()
+            return self._decode_contents(data), data.get("sha")
+
+        cached = self._get_cache()
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        response = requests.get(url, headers=headers, timeout=GITHUB_TIMEOUT_SECONDS)
+        if response.status_code == 304 and cached:
+            return cached["manifest"], cached.get("sha")
+        if response.status_code == 404:
+            return None, None
+        response.raise_for_status()
+
+        data = response.json()
+        manifest = self._decode_contents(data)
+        self._set_cache(response.headers.get("ETag"), data.get("sha"), manifest)
+        return manifest, data.get("sha")
+
+    def load_or_bootstrap(self, ref: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Manifiesto actual; si no existe, lo arma escaneando el repo (solo la primera vez)"""
+        manifest, sha = self.fetch(ref=ref)
+        if manifest is None:
+            logger.info(f"📒 {self.path} no existe en {self.owner}/{self.repo}, reconstruyendo desde el repo...")
+            manifest = self.scan_repository()
+        return manifest, sha
+
+    def update(self, mutator: Callable[[Dict[str, Any]], Any], message: str, bootstrap: bool = True) -> Optional[str]:
+        """
+        Aplica `mutator` al manifiesto y lo guarda con la Contents API.
+        Reintenta si otro proceso lo modificó entre la lectura y la escritura.
+
+        Returns:
+            SHA del commit
+        """
+        for attempt in range(MANIFEST_WRITE_RETRIES):
+            if bootstrap:
+                manifest, sha = self.load_or_bootstrap()
+            else:
+                manifest, sha = self.fetch()
+                manifest = manifest or empty_manifest()
+            manifest = json.loads(json.dumps(manifest))  # no mutar la copia cacheada
+            mutator(manifest)
+
+            payload = {
+                "message": message,
+                "content": base64.b64encode(serialize_manifest(manifest)).decode('ascii'),
+                "branch": "main"
+            }
+            if sha:
+                payload["sha"] = sha
+
+            response = requests.put(self._api(f"/contents/{self.path}"), headers=self._headers(), json=payload, timeout=GITHUB_TIMEOUT_SECONDS)
+            if response.status_code in (200, 201):
+                return response.json().get("commit", {}).get("sha")
+            if response.status_code in (409, 422):
+                logger.warning(f"{self.path} cambió durante la escritura (intento {attempt + 1}/{MANIFEST_WRITE_RETRIES}), reintentando...")
+                continue
+            raise RuntimeError(f"Failed to update {self.path}: {response.status_code} - {response.text[:200]}")
+
+        raise RuntimeError(f"Could not update {self.path} after {MANIFEST_WRITE_RETRIES} attempts")
+
+    def upsert(self, folder_name: str, **fields) -> Optional[str]:
+        return self.update(lambda m: upsert_entry(m, folder_name, **fields), f"Update {self.path}: {folder_name}")
+
+    def remove(self, folder_name: str) -> Optional[str]:
+        return self.update(lambda m: remove_entry(m, folder_name), f"Update {self.path}: remove {folder_name}")
+
+    def render_update(self, ref: str, mutator: Callable[[Dict[str, Any]], Any]) -> bytes:
+        """Contenido actualizado del manifiesto sobre el commit `ref` (para incluirlo en otro commit)"""
+        manifest, _ = self.load_or_bootstrap(ref=ref)
+        mutator(manifest)
+        return serialize_manifest(manifest)
+
+    def scan_repository(self) -> Dict[str, Any]:
+        """Escaneo completo (2N+1 requests): solo para crear el manifiesto o con refresh forzado"""
+        headers = self._headers()
+        response = requests.get(self._api("/contents"), headers=headers, timeout=GITHUB_TIMEOUT_SECONDS)
+        response.raise_for_status()
+
+        manifest = empty_manifest()
+        for item in response.json():
+            if item.get('type') != 'dir':
+                continue
+            folder_name = item['name']
+
+            html_resp = requests.get(self._api(f"/contents/{folder_name}/index.html"), headers=headers, timeout=GITHUB_TIMEOUT_SECONDS)
+            if html_resp.status_code != 200:
+                continue
+            html_content = base64.b64decode(html_resp.json()['content']).decode('utf-8')
+
+            created_at = datetime.now().isoformat()
+            commits_resp = requests.get(self._api(f"/commits?path={folder_name}/index.html"), headers=headers, timeout=GITHUB_TIMEOUT_SECONDS)
+            if commits_resp.status_code == 200:
+                commits = commits_resp.json()
+                if commits:
+                    created_at = commits[0]['commit']['committer']['date']
+
+            manifest["landings"][folder_name] = {
+                **extract_landing_metadata(html_content),
+                "created_at": created_at,
+                "updated_at": created_at
+            }
+
+        manifest["updated_at"] = datetime.now().isoformat()
+        return manifest
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Reescanea el repo y reemplaza el manifiesto publicado"""
+        manifest = self.scan_repository()
+
+        def replace(current):
+            current.clear()
+            current.update(manifest)
+
+        self.update(replace, f"Rebuild {self.path}", bootstrap=False)
+        return manifest
+
+    def get_landings(self, force_rebuild: bool = False) -> List[Dict[str, Any]]:
+        """Entradas del manifiesto ordenadas por carpeta (un GET condicional)"""
+        if force_rebuild:
+            manifest = self.rebuild()
+        else:
+            manifest, sha = self.fetch()
+            if manifest is None:
+                manifest = self.rebuild()
+
+        return [
+            {"folder": folder_name, **entry}
+            for folder_name, entry in sorted(manifest.get("landings", {}).items())
+        ]
+
+    # ------------------------------------------------------------------
+    # Copia local (memoria + archivo compartido entre workers)
+    # ------------------------------------------------------------------
+
+    def _get_cache(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._cache is not None:
+                return self._cache
+        try:
+            with open(self.cache_file, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._cache = cached
+        return cached
+
+    def _set_cache(self, etag: Optional[str], sha: Optional[str], manifest: Dict[str, Any]):
+        cached = {"etag": etag, "sha": sha, "manifest": manifest}
+        with self._lock:
+            self._cache = cached
+        try:
+            tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la copia local de {self.path}: {e}")
+
+
+_manifests: Dict[Tuple[str, str], LandingManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_landing_manifest(owner: Optional[str] = None, repo: Optional[str] = None, token: Optional[str] = None) -> LandingManifest:
+    """Instancia por repositorio (por defecto el monorepo configurado en el entorno)"""
+    owner = owner or os.getenv("GITHUB_REPO_OWNER", "")
+    repo = repo or os.getenv("GITHUB_REPO_NAME", "monorepo-landings")
+    token = token or os.getenv("GITHUB_TOKEN", "")
+
+    with _manifests_lock:
+        manifest = _manifests.get((owner, repo))
+        if manifest is None:
+            manifest = _manifests[(owner, repo)] = LandingManifest(owner, repo, token)
+        manifest.token = token
+        return manifest
@@ -0,0 +1,339 @@
+"""
+Notification Dispatcher
+=======================
+Envío asíncrono de notificaciones a webhooks (Slack/Discord/Telegram) con
+un outbox durable en SQLite.
+
+- notify() solo escribe en el outbox (milisegundos) y despierta al hilo de
+  envío: un receptor lento o caído nunca bloquea el ciclo de monitoreo.
+- Coalescencia: las alertas de una misma cuenta se fusionan en la
+  notificación pendiente de esa cuenta mientras no haya salido; la primera
+  alerta abre una ventana de NOTIFICATION_COALESCE_SECONDS y todo lo que
+  llega antes de que venza se envía como un solo mensaje.
+- Cada POST tiene timeout; los fallos se reintentan con backoff exponencial
+  hasta NOTIFICATION_MAX_ATTEMPTS y luego quedan como 'failed'.
+- Cola acotada: si hay más de NOTIFICATION_OUTBOX_MAX_PENDING pendientes se
+  descartan las más antiguas (quedan como 'dropped', no se borran).
+- Durable: lo que no se envió sobrevive a reinicios del worker y se entrega
+  al volver a arrancar. Las filas se reservan con un lease, así dos procesos
+  no envían la misma notificación y un envío interrumpido se reintenta.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlite_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_OUTBOX_DB = os.getenv('NOTIFICATION_OUTBOX_DB', 'notification_outbox.db')
+NOTIFICATION_TIMEOUT_SECONDS = float(os.getenv('NOTIFICATION_TIMEOUT_SECONDS', '5'))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '6'))
+NOTIFICATION_BACKOFF_BASE_SECONDS = float(os.getenv('NOTIFICATION_BACKOFF_BASE_SECONDS', '5'))
+NOTIFICATION_BACKOFF_MAX_SECONDS = float(os.getenv('NOTIFICATION_BACKOFF_MAX_SECONDS', '600'))
+NOTIFICATION_COALESCE_SECONDS = float(os.getenv('NOTIFICATION_COALESCE_SECONDS', '15'))
+NOTIFICATION_OUTBOX_MAX_PENDING = int(os.getenv('NOTIFICATION_OUTBOX_MAX_PENDING', '1000'))
+NOTIFICATION_BATCH_SIZE = 20
+NOTIFICATION_POLL_SECONDS = 30
+# Días que se conservan las filas enviadas/fallidas
+NOTIFICATION_RETENTION_DAYS = 7
+
+
+def format_webhook_payload(title: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Formato Slack: un mensaje con una línea y un attachment por alerta"""
+    if len(items) == 1:
+        text = f"*{title}*\n{items[0]['message']}"
+    else:
+        lines = '\n'.join(f"• {item['title']}: {item['message']}" for item in items)
+        text = f"*{title}* ({len(items)} alertas)\n{lines}"
+    return {
+        "text": text,
+        "attachments": [{"text": json.dumps(item['data'], indent=2)} for item in items if item.get('data')]
+    }
+
+
+NOTIFICATION_OUTBOX_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coalesce_key TEXT,
+            title TEXT NOT NULL,
+            items_json TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            next_attempt_at REAL NOT NULL,
+            claimed_until REAL NOT NULL DEFAULT 0,
+            sent_at REAL
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox(status, next_attempt_at)',
+    'CREATE INDEX IF NOT EXISTS idx_outbox_coalesce ON notification_outbox(coalesce_key, status)',
+)
+
+
+class NotificationDispatcher:
+    """Outbox + hilo de envío en segundo plano (uno por proceso)"""
+
+    def __init__(self, webhook_url: Optional[str], db_path: str = NOTIFICATION_OUTBOX_DB,
+                 post: Optional[Callable[..., Any]] = None,
+                 timeout_seconds: float = NOTIFICATION_TIMEOUT_SECONDS,
+                 coalesce_seconds: float = NOTIFICATION_COALESCE_SECONDS):
+        self.webhook_url = webhook_url
+        self.db_path = db_path
+        self.timeout_seconds = timeout_seconds
+        self.coalesce_seconds = coalesce_seconds
+        self._post = post
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._sent = 0
+        self._failed_attempts = 0
+
+    def _get_db(self) -> sqlite3.Connection:
+        return get_connection(self.db_path, schema=NOTIFICATION_OUTBOX_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Productores
+    # ------------------------------------------------------------------
+
+    def notify(self, title: str, message: str, data: Optional[Dict] = None, account: Optional[str] = None) -> int:
+        """
+        Encola una notificación (no hace I/O de red). Con `account`, se fusiona
+        con la notificación de la misma cuenta que aún espera su envío (nunca
+        intentada y con la ventana abierta). Retorna el id de la fila del outbox.
+        """
+        now = time.time()
+        item = {"title": title, "message": message, "data": data or {}}
+        coalesce_key = f"account:{account}" if account and self.coalesce_seconds > 0 else None
+
+        conn = self._get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = None
+            if coalesce_key:
+                row = conn.execute('''
+                    SELECT id, items_json FROM notification_outbox
+                    WHERE coalesce_key = ? AND status = 'pending' AND attempts = 0
+                      AND next_attempt_at > ?
+                    ORDER BY id DESC LIMIT 1
+                ''', (coalesce_key, now)).fetchone()
+
+            if row:
+                outbox_id = row[0]
+                items = json.loads(row[1]) + [item]
+                conn.execute('''
+                    UPDATE notification_outbox SET title = ?, items_json = ? WHERE id = ?
+                ''', (f"Alertas cuenta {account}", json.dumps(items), outbox_id))
+            else:
+                # Sin cuenta no hay nada con qué fusionar: sale de inmediato
+                due_at = now + self.coalesce_seconds if coalesce_key else now
+                cursor = conn.execute('''
+                    INSERT INTO notification_outbox (coalesce_key, title, items_json, created_at, next_attempt_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (coalesce_key, title, json.dumps([item]), now, due_at))
+                outbox_id = cursor.lastrowid
+                self._enforce_bound(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.start()
+        self._wake.set()
+        return outbox_id
+
+    def _enforce_bound(self, conn: sqlite3.Connection):
+        pending = conn.execute(
+            "SELECT COUNT(*) FROM notification_outbox WHERE status IN ('pending', 'sending')"
+        ).fetchone()[0]
+        overflow = pending - NOTIFICATION_OUTBOX_MAX_PENDING
+        if overflow > 0:
+            conn.execute('''
+                UPDATE notification_outbox SET status = 'dropped', last_error = 'outbox full'
+                WHERE id IN (
+                    SELECT id FROM notification_outbox WHERE status = 'pending'
+                    ORDER BY id ASC LIMIT ?
+                )
+            ''', (overflow,))
+            logger.warning(f"Outbox de notificaciones lleno: {overflow} notificaciones antiguas descartadas")
+
+    # ------------------------------------------------------------------
+    # Envío
+    # ------------------------------------------------------------------
+
+    def _claim_due(self, limit: int) -> List[tuple]:
+        """Reserva filas vencidas (pendientes o con lease expirado)"""
+        now = time.time()
+        lease = now + self.timeout_seconds * 2 + 30
+        conn = self._get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('''
+                SELECT id, title, items_json, attempts FROM notification_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_until < ?)
+                ORDER BY next_attempt_at ASC LIMIT ?
+            ''', (now, now, limit)).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE notification_outbox SET status = 'sending', claimed_until = ? WHERE id = ?",
+                    [(lease, row[0]) for row in rows]
+                )
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _send(self, title: str, items: List[Dict[str, Any]]):
+        post = self._post
+        if post is None:
+            import requests
+            post = requests.post
+        response = post(self.webhook_url, json=format_webhook_payload(title, items), timeout=self.timeout_seconds)
+        status_code = getattr(response, 'status_code', 200)
+        if status_code >= 400:
+            raise RuntimeError(f"HTTP {status_code}")
+
+    def _record_result(self, outbox_id: int, attempts: int, error: Optional[str]):
+        now = time.time()
+        conn = self._get_db()
+        try:
+            if error is None:
+                conn.execute('''
+                    UPDATE notification_outbox SET status = 'sent', sent_at = ?, attempts = ?, last_error = NULL
+                    WHERE id = ?
+                ''', (now, attempts, outbox_id))
+            elif attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                conn.execute('''
+                    UPDATE notification_outbox SET status = 'failed', attempts = ?, last_error = ?
+                    WHERE id = ?
+                ''', (attempts, error, outbox_id))
+            else:
+                delay = min(NOTIFICATION_BACKOFF_MAX_SECONDS, NOTIFICATION_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+                conn.execute('''
+                    UPDATE notification_outbox
+                    SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?, claimed_until = 0
+                    WHERE id = ?
+                ''', (attempts, error, now + delay, outbox_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def deliver_due(self, limit: int = NOTIFICATION_BATCH_SIZE) -> int:
+        """Envía las notificaciones vencidas (síncrono). Retorna cuántas se entregaron."""
+        if not self.webhook_url:
+            return 0
+
+        delivered = 0
+        for outbox_id, title, items_json, attempts in self._claim_due(limit):
+            attempts += 1
+            try:
+                self._send(title, json.loads(items_json))
+                error = None
+                delivered += 1
+                self._sent += 1
+            except Exception as e:
+                error = str(e)[:500]
+                self._failed_attempts += 1
+                logger.warning(f"Webhook falló (intento {attempts}/{NOTIFICATION_MAX_ATTEMPTS}): {error}")
+            self._record_result(outbox_id, attempts, error)
+        return delivered
+
+    def _next_due_in(self) -> float:
+        conn = self._get_db()
+        try:
+            row = conn.execute('''
+                SELECT MIN(CASE WHEN status = 'pending' THEN next_attempt_at ELSE claimed_until END)
+                FROM notification_outbox WHERE status IN ('pending', 'sending')
+            ''').fetchone()
+        finally:
+            conn.close()
+        if not row or row[0] is None:
+            return NOTIFICATION_POLL_SECONDS
+        return max(0.0, min(NOTIFICATION_POLL_SECONDS, row[0] - time.time()))
+
+    def _run(self):
+        last_purge = 0.0
+        while not self._stop.is_set():
+            try:
+                while self.deliver_due():
+                    pass
+                if time.time() - last_purge > 3600:
+                    last_purge = time.time()
+                    self.purge_old()
+                wait_seconds = self._next_due_in()
+            except Exception as e:
+                logger.error(f"Error en el dispatcher de notificaciones: {e}")
+                wait_seconds = NOTIFICATION_POLL_SECONDS
+            self._wake.wait(wait_seconds)
+            self._wake.clear()
+
+    def start(self):
+        """Arranca el hilo de envío de este proceso (idempotente, seguro tras fork)"""
+        if not self.webhook_url:
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._wake = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='NotificationDispatcher', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def purge_old(self, retention_days: float = NOTIFICATION_RETENTION_DAYS) -> int:
+        cutoff = time.time() - retention_days * 86400
+        conn = self._get_db()
+        try:
+            cursor = conn.execute('''
+                DELETE FROM notification_outbox
+                WHERE status IN ('sent', 'failed', 'dropped') AND created_at < ?
+            ''', (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._get_db()
+        try:
+            counts = dict(conn.execute(
+                'SELECT status, COUNT(*) FROM notification_outbox GROUP BY status'
+            ).fetchall())
+        finally:
+            conn.close()
+        return {
+            "webhook_configured": bool(self.webhook_url),
+            "outbox": counts,
+            "sent_by_this_process": self._sent,
+            "failed_attempts_by_this_process": self._failed_attempts,
+            "checked_at": datetime.utcnow().isoformat()
+        }
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Dispatcher global (webhook de NOTIFICATION_WEBHOOK)"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher(os.getenv('NOTIFICATION_WEBHOOK', ''))
+        return _dispatcher
@@ -20,6 +20,7 @@ from google.protobuf.field_mask_pb2 import FieldMask
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
 import os
 import json
 import sqlite3
@@ -29,6 +30,9 @@ from dataclasses import dataclass
 from enum import Enum
 import statistics
 
+from google_ads_client_pool import get_pooled_client
+from sqlite_pool import get_connection
+
 # Configurar logger
 logger = logging.getLogger(__name__)
 
@@ -284,7 +288,7 @@ DB_PATH = os.getenv('PROFIT_GUARDIAN_DB', 'profit_guardian.db')
 
 def init_profit_guardian_db():
     """Inicializa la base de datos"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     # Configuración por cuenta
@@ -443,13 +447,197 @@ def init_profit_guardian_db():
     ''')
     
     conn.commit()
+    
+    # Índices y tablas agregadas (también para DBs ya existentes)
+    run_profit_guardian_migrations(conn)
+    
     conn.close()
     print("✅ Profit Guardian database initialized")
 
 
+# Migraciones de esquema versionadas con PRAGMA user_version.
+# Cada entrada se aplica una sola vez, en orden, sobre DBs nuevas o existentes.
+PROFIT_GUARDIAN_MIGRATIONS = [
+    (1, [
+        # Dashboard: historial por cuenta ordenado por fecha
+        'CREATE INDEX IF NOT EXISTS idx_decision_history_customer_ts ON decision_history (customer_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_decision_history_ts ON decision_history (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_alerts_customer_created ON alerts (customer_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_hourly_metrics_customer_date ON hourly_metrics (customer_id, date, hour)',
+        'CREATE INDEX IF NOT EXISTS idx_kw_history_customer_date ON keyword_performance_history (customer_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_kw_history_campaign_date ON keyword_performance_history (customer_id, campaign_id, date)',
+        # Ciclo del guardian: keywords a reanudar y campañas activas
+        'CREATE INDEX IF NOT EXISTS idx_paused_keywords_resume ON paused_keywords (auto_resume, resume_at)',
+        'CREATE INDEX IF NOT EXISTS idx_monitored_campaigns_status ON monitored_campaigns (status, customer_id)',
+    ]),
+    (2, [
+        # Agregados diarios donde se compacta el historial antiguo
+        '''
+        CREATE TABLE IF NOT EXISTS decision_history_daily (
+            customer_id TEXT NOT NULL,
+            campaign_id TEXT NOT NULL DEFAULT '',
+            date TEXT NOT NULL,
+            decision_type TEXT NOT NULL,
+            decisions INTEGER DEFAULT 0,
+            executed INTEGER DEFAULT 0,
+            PRIMARY KEY (customer_id, date, campaign_id, decision_type)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS alerts_daily (
+            customer_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            alert_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            alerts INTEGER DEFAULT 0,
+            PRIMARY KEY (customer_id, date, alert_type, severity)
+        )
+        ''',
+    ]),
+    (3, [
+        # Almacén local de métricas: marca de agua de la ingesta incremental por cuenta
+        '''
+        CREATE TABLE IF NOT EXISTS metrics_ingestion_state (
+            customer_id TEXT PRIMARY KEY,
+            last_date TEXT NOT NULL,
+            last_hour INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'ALTER TABLE keyword_performance_history ADD COLUMN ad_group_id TEXT',
+    ]),
+    (4, [
+        # El criterion_id de una keyword solo es único dentro de su ad group: el historial
+        # se llavea por campaña + ad group (SQLite no permite cambiar un UNIQUE, se reconstruye).
+        # El DDL de sqlite3 se confirma solo: una copia de un intento fallido se descarta
+        'DROP TABLE IF EXISTS keyword_performance_history_v4',
+        '''
+        CREATE TABLE keyword_performance_history_v4 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id TEXT NOT NULL,
+            campaign_id TEXT NOT NULL,
+            ad_group_id TEXT NOT NULL DEFAULT '',
+            keyword_id TEXT NOT NULL,
+            keyword_text TEXT,
+            date TEXT NOT NULL,
+            impressions INTEGER DEFAULT 0,
+            clicks INTEGER DEFAULT 0,
+            conversions REAL DEFAULT 0,
+            cost_micros INTEGER DEFAULT 0,
+            cpa_cop REAL,
+            rating TEXT,
+            UNIQUE(customer_id, campaign_id, ad_group_id, keyword_id, date)
+        )
+        ''',
+        '''
+        INSERT INTO keyword_performance_history_v4
+            (id, customer_id, campaign_id, ad_group_id, keyword_id, keyword_text, date,
+             impressions, clicks, conversions, cost_micros, cpa_cop, rating)
+        SELECT id, customer_id, campaign_id, COALESCE(ad_group_id, ''), keyword_id, keyword_text, date,
+               impressions, clicks, conversions, cost_micros, cpa_cop, rating
+        FROM keyword_performance_history
+        ''',
+        'DROP TABLE keyword_performance_history',
+        'ALTER TABLE keyword_performance_history_v4 RENAME TO keyword_performance_history',
+        'CREATE INDEX IF NOT EXISTS idx_kw_history_customer_date ON keyword_performance_history (customer_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_kw_history_campaign_date ON keyword_performance_history (customer_id, campaign_id, date)',
+        # Las filas ya guardadas mezclan keywords de distintos ad groups: re-ingestar la ventana
+        'DELETE FROM metrics_ingestion_state',
+    ]),
+]
+
+
+def run_profit_guardian_migrations(conn):
+    """Aplica las migraciones pendientes según PRAGMA user_version"""
+    current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    for version, statements in PROFIT_GUARDIAN_MIGRATIONS:
+        if version <= current_version:
+            continue
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+        print(f"   🔧 Profit Guardian DB migrada a versión {version}")
+
+
+# ============================================
+# RETENCIÓN Y COMPACTACIÓN DEL HISTORIAL
+# ============================================
+
+# Días de detalle que se conservan en decision_history / alerts antes de compactar
+HISTORY_RETENTION_DAYS = int(os.getenv('PROFIT_GUARDIAN_HISTORY_RETENTION_DAYS', '30'))
+# Días de métricas por hora que se conservan (keyword_performance_history ya es diario)
+HOURLY_METRICS_RETENTION_DAYS = int(os.getenv('PROFIT_GUARDIAN_HOURLY_RETENTION_DAYS', '90'))
+
+
+def compact_profit_guardian_history(retention_days: int = None, hourly_retention_days: int = None) -> Dict[str, int]:
+    """
+    Compacta el historial antiguo en agregados diarios y elimina el detalle.
+    
+    - decision_history -> decision_history_daily (conteo por tipo, campaña y día)
+    - alerts           -> alerts_daily (conteo por tipo, severidad y día)
+    - hourly_metrics   -> se eliminan filas más antiguas que hourly_retention_days
+    
+    Todo ocurre en una transacción: si algo falla no se pierde detalle.
+    """
+    retention_days = HISTORY_RETENTION_DAYS if retention_days is None else retention_days
+    hourly_retention_days = HOURLY_METRICS_RETENTION_DAYS if hourly_retention_days is None else hourly_retention_days
+    
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    hourly_cutoff = (datetime.utcnow() - timedelta(days=hourly_retention_days)).strftime('%Y-%m-%d')
+    
+    conn = get_db()
+    try:
+        with conn:
+            conn.execute('''
+                INSERT INTO decision_history_daily
+                    (customer_id, campaign_id, date, decision_type, decisions, executed)
+                SELECT customer_id, COALESCE(campaign_id, ''), DATE(timestamp), decision_type,
+                       COUNT(*), SUM(CASE WHEN executed = 1 THEN 1 ELSE 0 END)
+                FROM decision_history
+                WHERE timestamp < ?
+                GROUP BY customer_id, COALESCE(campaign_id, ''), DATE(timestamp), decision_type
+                ON CONFLICT (customer_id, date, campaign_id, decision_type) DO UPDATE SET
+                    decisions = decisions + excluded.decisions,
+                    executed = executed + excluded.executed
+            ''', (cutoff,))
+            decisions_deleted = conn.execute(
+                'DELETE FROM decision_history WHERE timestamp < ?', (cutoff,)
+            ).rowcount
+            
+            conn.execute('''
+                INSERT INTO alerts_daily (customer_id, date, alert_type, severity, alerts)
+                SELECT customer_id, DATE(created_at), alert_type, severity, COUNT(*)
+                FROM alerts
+                WHERE created_at < ?
+                GROUP BY customer_id, DATE(created_at), alert_type, severity
+                ON CONFLICT (customer_id, date, alert_type, severity) DO UPDATE SET
+                    alerts = alerts + excluded.alerts
+            ''', (cutoff,))
+            alerts_deleted = conn.execute(
+                'DELETE FROM alerts WHERE created_at < ?', (cutoff,)
+            ).rowcount
+            
+            hourly_deleted = conn.execute(
+                'DELETE FROM hourly_metrics WHERE date < ?', (hourly_cutoff,)
+            ).rowcount
+    finally:
+        conn.close()
+    
+    result = {
+        'decisions_compacted': decisions_deleted,
+        'alerts_compacted': alerts_deleted,
+        'hourly_metrics_deleted': hourly_deleted
+    }
+    print(f"🧹 Profit Guardian retención: {result}")
+    return result
+
+
 def get_db():
-    """Obtiene conexión a la base de datos"""
-    return sqlite3.connect(DB_PATH)
+    """Obtiene conexión a la base de datos (WAL + conexión reutilizable por hilo, ver sqlite_pool.py)"""
+    return get_connection(DB_PATH)
 
 
 # ============================================
@@ -457,7 +645,7 @@ def get_db():
 # ============================================
 
 def get_google_ads_client(refresh_token: str = None):
-    """Crea cliente de Google Ads"""
+    """Obtiene cliente de Google Ads (reutilizado por credencial desde el pool)"""
     config = {
         'developer_token': os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN') or os.getenv('DEVELOPER_TOKEN'),
         'client_id': os.getenv('GOOGLE_ADS_CLIENT_ID') or os.getenv('CLIENT_ID'),
@@ -475,7 +663,7 @@ def get_google_ads_client(refresh_token: str = None):
     else:
         config['refresh_token'] = os.getenv('GOOGLE_ADS_REFRESH_TOKEN') or os.getenv('REFRESH_TOKEN')
     
-    return GoogleAdsClient.load_from_dict(config)
+    return get_pooled_client(config)
 
 
 # ============================================
@@ -693,6 +881,494 @@ def get_account_hourly_spend_today(client, customer_id: str) -> Dict[int, Dict]:
         print(f"❌ Error getting account hourly spend: {e}")
         return {}
 
+# ============================================
+# FAN-IN POR CUENTA (1 query de campañas + 1 de keywords por cuenta)
+# ============================================
+
+# 'warehouse' = ingesta incremental + análisis desde SQLite
+# 'account' = consultas agregadas por cuenta (5 días completos en cada ciclo)
+# 'campaign' = modo legacy (3 queries por campaña)
+PROFIT_GUARDIAN_FETCH_MODE = os.getenv('PROFIT_GUARDIAN_FETCH_MODE', 'warehouse')
+
+# Ventana de análisis (días) para considerar conversion lag
+ANALYSIS_WINDOW_DAYS = 5
+
+
+def _empty_hour_bucket() -> Dict:
+    return {'impressions': 0, 'clicks': 0, 'conversions': 0, 'cost_micros': 0}
+
+
+class AccountSnapshot:
+    """
+    Datos del ciclo para UNA cuenta, obtenidos con dos consultas GAQL:
+    - campaign segmentado por segments.date + segments.hour (últimos 5 días)
+    - keyword_view de las campañas monitoreadas (últimos 5 días)
+    Las filas se reparten en memoria por campaña para el DecisionEngine.
+    """
+    
+    def __init__(self, customer_id: str):
+        self.customer_id = customer_id
+        self.account_hourly: Dict[int, Dict] = {}
+        self.campaign_totals: Dict[str, Dict] = {}
+        self.campaign_hourly: Dict[str, Dict[int, Dict]] = {}
+        self.keyword_rows: Dict[str, Dict[str, Dict]] = {}
+    
+    @classmethod
+    def fetch(cls, client, customer_id: str, campaign_ids: List[str]) -> 'AccountSnapshot':
+        """Ejecuta las dos consultas de la cuenta. Lanza excepción si fallan."""
+        snapshot = cls(customer_id)
+        ga_service = client.get_service("GoogleAdsService")
+        clean_customer_id = customer_id.replace('-', '')
+        
+        today = datetime.now()
+        five_days_ago = (today - timedelta(days=ANALYSIS_WINDOW_DAYS)).strftime('%Y-%m-%d')
+        today_str = today.strftime('%Y-%m-%d')
+        monitored = {str(cid) for cid in campaign_ids}
+        
+        # 1) Campañas: totales 5 días + gasto por hora de hoy (campaña y cuenta)
+        campaign_query = f"""
+            SELECT
+                campaign.id,
+                campaign.name,
+                campaign.status,
+                segments.date,
+                segments.hour,
+                metrics.impressions,
+                metrics.clicks,
+                metrics.conversions,
+                metrics.cost_micros
+            FROM campaign
+            WHERE segments.date BETWEEN '{five_days_ago}' AND '{today_str}'
+        """
+        
+        for batch in ga_service.search_stream(customer_id=clean_customer_id, query=campaign_query):
+            for row in batch.results:
+                snapshot._add_campaign_row(
+                    str(row.campaign.id), row.campaign.name, row.campaign.status.name,
+                    row.segments.date == today_str, row.segments.hour, monitored,
+                    row.metrics.impressions, row.metrics.clicks,
+                    float(row.metrics.conversions), row.metrics.cost_micros
+                )
+        
+        # 2) Keywords de todas las campañas monitoreadas en una sola consulta
+        if monitored:
+            ids_clause = ', '.join(sorted(monitored))
+            keyword_query = f"""
+                SELECT
+                    ad_group_criterion.criterion_id,
+                    ad_group_criterion.keyword.text,
+                    ad_group.id,
+                    campaign.id,
+                    metrics.impressions,
+                    metrics.clicks,
+                    metrics.conversions,
+                    metrics.cost_micros
+                FROM keyword_view
+                WHERE campaign.id IN ({ids_clause})
+                    AND segments.date BETWEEN '{five_days_ago}' AND '{today_str}'
+                    AND ad_group_criterion.status = 'ENABLED'
+            """
+            
+            for batch in ga_service.search_stream(customer_id=clean_customer_id, query=keyword_query):
+                for row in batch.results:
+                    snapshot._add_keyword_row(
+                        str(row.campaign.id), str(row.ad_group_criterion.criterion_id),
+                        row.ad_group_criterion.keyword.text, str(row.ad_group.id),
+                        row.metrics.impressions, row.metrics.clicks,
+                        float(row.metrics.conversions), row.metrics.cost_micros
+                    )
+        
+        snapshot._finalize()
+        return snapshot
+    
+    @classmethod
+    def from_warehouse(cls, customer_id: str, campaign_ids: List[str],
+                       campaign_states: Dict[str, Tuple[str, str]], enabled_keywords: set) -> 'AccountSnapshot':
+        """
+        Mismo snapshot que fetch(), pero armado desde hourly_metrics y
+        keyword_performance_history (ver ingest_account_metrics).
+        campaign_states: {campaign_id: (nombre, status)} actuales.
+        enabled_keywords: {(campaign_id, keyword_id)} habilitadas actualmente.
+        """
+        snapshot = cls(customer_id)
+        today = datetime.now()
+        window_start = (today - timedelta(days=ANALYSIS_WINDOW_DAYS)).strftime('%Y-%m-%d')
+        today_str = today.strftime('%Y-%m-%d')
+        monitored = {str(cid) for cid in campaign_ids}
+        
+        conn = get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT campaign_id, date, hour, impressions, clicks, conversions, cost_micros
+                FROM hourly_metrics
+                WHERE customer_id = ? AND date BETWEEN ? AND ?
+            ''', (customer_id, window_start, today_str))
+            for campaign_id, date_str, hour, impressions, clicks, conversions, cost_micros in cursor.fetchall():
+                # Las campañas que ya no existen se tratan como eliminadas
+                name, status = campaign_states.get(campaign_id, ('', 'REMOVED'))
+                snapshot._add_campaign_row(
+                    campaign_id, name, status, date_str == today_str, hour, monitored,
+                    impressions or 0, clicks or 0, conversions or 0.0, cost_micros or 0
+                )
+            
+            if monitored:
+                placeholders = ', '.join('?' for _ in monitored)
+                cursor.execute(f'''
+                    SELECT campaign_id, keyword_id, keyword_text, ad_group_id,
+                           impressions, clicks, conversions, cost_micros
+                    FROM keyword_performance_history
+                    WHERE customer_id = ? AND campaign_id IN ({placeholders})
+                      AND date BETWEEN ? AND ?
+                ''', (customer_id, *sorted(monitored), window_start, today_str))
+                for campaign_id, keyword_id, keyword_text, ad_group_id, impressions, clicks, conversions, cost_micros in cursor.fetchall():
+                    if (campaign_id, keyword_id) not in enabled_keywords:
+                        continue
+                    snapshot._add_keyword_row(
+                        campaign_id, keyword_id, keyword_text or '', ad_group_id or '',
+                        impressions or 0, clicks or 0, conversions or 0.0, cost_micros or 0
+                    )
+        finally:
+            conn.close()
+        
+        snapshot._finalize()
+        return snapshot
+    
+    def _add_campaign_row(self, campaign_id: str, name: str, status: str, is_today: bool, hour: int,
+                          monitored: set, impressions: int, clicks: int, conversions: float, cost_micros: int):
+        if is_today and status == 'ENABLED':
+            bucket = self.account_hourly.setdefault(hour, _empty_hour_bucket())
+            bucket['impressions'] += impressions
+            bucket['clicks'] += clicks
+            bucket['conversions'] += conversions
+            bucket['cost_micros'] += cost_micros
+        
+        if campaign_id not in monitored:
+            return
+        
+        totals = self.campaign_totals.setdefault(campaign_id, {
+            'campaign_id': campaign_id,
+            'campaign_name': '',
+            'status': '',
+            'impressions': 0,
+            'clicks': 0,
+            'conversions': 0.0,
+            'cost_micros': 0,
+            'cost_cop': 0.0
+        })
+        totals['campaign_name'] = name
+        totals['status'] = status
+        totals['impressions'] += impressions
+        totals['clicks'] += clicks
+        totals['conversions'] += conversions
+        totals['cost_micros'] += cost_micros
+        
+        if is_today:
+            hourly = self.campaign_hourly.setdefault(campaign_id, {})
+            bucket = hourly.setdefault(hour, _empty_hour_bucket())
+            bucket['impressions'] += impressions
+            bucket['clicks'] += clicks
+            bucket['conversions'] += conversions
+            bucket['cost_micros'] += cost_micros
+    
+    def _add_keyword_row(self, campaign_id: str, keyword_id: str, keyword_text: str, ad_group_id: str,
+                         impressions: int, clicks: int, conversions: float, cost_micros: int):
+        keywords = self.keyword_rows.setdefault(campaign_id, {})
+        
+        if keyword_id not in keywords:
+            keywords[keyword_id] = {
+                'keyword_text': keyword_text,
+                'ad_group_id': ad_group_id,
+                'impressions': 0,
+                'clicks': 0,
+                'conversions': 0.0,
+                'cost_micros': 0
+            }
+        
+        data = keywords[keyword_id]
+        data['impressions'] += impressions
+        data['clicks'] += clicks
+        data['conversions'] += conversions
+        data['cost_micros'] += cost_micros
+    
+    def _finalize(self):
+        for totals in self.campaign_totals.values():
+            totals['cost_cop'] = totals['cost_micros'] / 1_000_000
+    
+    def get_account_hourly_spend(self) -> Dict[int, Dict]:
+        return self.account_hourly
+    
+    def get_hourly_spend(self, campaign_id: str) -> Dict[int, Dict]:
+        return self.campaign_hourly.get(str(campaign_id), {})
+    
+    def get_campaign_performance(self, campaign_id: str) -> Dict:
+        """Mismo contrato que get_campaign_performance_today ({} si no hay impresiones)"""
+        totals = self.campaign_totals.get(str(campaign_id))
+        if not totals or totals['impressions'] <= 0:
+            return {}
+        return totals
+    
+    def get_keywords_performance(self, campaign_id: str, config: BusinessConfig) -> List[KeywordPerformance]:
+        """Mismo contrato que get_keywords_performance_today"""
+        keywords = []
+        for keyword_id, data in self.keyword_rows.get(str(campaign_id), {}).items():
+            kw = KeywordPerformance(
+                keyword_id=keyword_id,
+                keyword_text=data['keyword_text'],
+                ad_group_id=data['ad_group_id'],
+                campaign_id=str(campaign_id),
+                customer_id=self.customer_id,
+                impressions=data['impressions'],
+                clicks=data['clicks'],
+                conversions=data['conversions'],
+                cost_micros=data['cost_micros']
+            )
+            kw.calculate_metrics(config)
+            keywords.append(kw)
+        
+        keywords.sort(key=lambda x: x.cost_micros, reverse=True)
+        return keywords
+
+
+class LiveAccountData:
+    """
+    Modo legacy: consultas por campaña, con la misma interfaz que AccountSnapshot.
+    Memoriza el gasto por hora para no pedirlo dos veces por campaña.
+    """
+    
+    def __init__(self, client, customer_id: str):
+        self.client = client
+        self.customer_id = customer_id
+        self._hourly_cache: Dict[str, Dict[int, Dict]] = {}
+    
+    def get_account_hourly_spend(self) -> Dict[int, Dict]:
+        return get_account_hourly_spend_today(self.client, self.customer_id)
+    
+    def get_hourly_spend(self, campaign_id: str) -> Dict[int, Dict]:
+        if campaign_id not in self._hourly_cache:
+            self._hourly_cache[campaign_id] = get_hourly_spend_today(self.client, self.customer_id, campaign_id)
+        return self._hourly_cache[campaign_id]
+    
+    def get_campaign_performance(self, campaign_id: str) -> Dict:
+        return get_campaign_performance_today(self.client, self.customer_id, campaign_id)
+    
+    def get_keywords_performance(self, campaign_id: str, config: BusinessConfig) -> List[KeywordPerformance]:
+        return get_keywords_performance_today(self.client, self.customer_id, campaign_id, config)
+
+
+# ============================================
+# ALMACÉN LOCAL DE MÉTRICAS (ingesta incremental)
+# ============================================
+
+# Días que se cargan la primera vez (o tras mucho tiempo sin ingesta)
+METRICS_BACKFILL_DAYS = int(os.getenv('PROFIT_GUARDIAN_BACKFILL_DAYS', str(ANALYSIS_WINDOW_DAYS)))
+# Horas ya guardadas que se vuelven a pedir en cada ciclo (conversiones y costos se re-expresan)
+METRICS_RESTATEMENT_HOURS = int(os.getenv('PROFIT_GUARDIAN_RESTATEMENT_HOURS', '6'))
+
+
+def _ingestion_window_start(conn, customer_id: str, now: datetime) -> datetime:
+    """Primera hora a pedir: marca de agua - ventana de re-expresión (acotada al backfill)"""
+    earliest = (now - timedelta(days=METRICS_BACKFILL_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    row = conn.execute(
+        'SELECT last_date, last_hour FROM metrics_ingestion_state WHERE customer_id = ?', (customer_id,)
+    ).fetchone()
+    if not row:
+        return earliest
+    
+    watermark = datetime.strptime(row[0], '%Y-%m-%d').replace(hour=int(row[1]))
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    return max(earliest, min(watermark, current_hour) - timedelta(hours=METRICS_RESTATEMENT_HOURS))
+
+
+def ingest_account_metrics(client, customer_id: str, campaign_ids: List[str]) -> Dict[str, int]:
+    """
+    Trae de Google Ads solo las horas que faltan en hourly_metrics (más la
+    ventana de re-expresión) y los días correspondientes de keywords, y los
+    guarda con upsert. En régimen normal cada ciclo pide unas pocas horas en
+    lugar de 5 días completos.
+    """
+    ga_service = client.get_service("GoogleAdsService")
+    clean_customer_id = customer_id.replace('-', '')
+    now = datetime.now()
+    today_str = now.strftime('%Y-%m-%d')
+    
+    conn = get_db()
+    try:
+        start = _ingestion_window_start(conn, customer_id, now)
+    finally:
+        conn.close()
+    
+    start_date = start.strftime('%Y-%m-%d')
+    # GAQL no permite OR: el filtro por hora solo aplica si la ventana es de un solo día
+    hour_clause = f"AND segments.hour >= {start.hour}" if start_date == today_str else ''
+    
+    campaign_query = f"""
+        SELECT
+            campaign.id,
+            segments.date,
+            segments.hour,
+            metrics.impressions,
+            metrics.clicks,
+            metrics.conversions,
+            metrics.cost_micros
+        FROM campaign
+        WHERE segments.date BETWEEN '{start_date}' AND '{today_str}'
+            {hour_clause}
+    """
+    
+    hourly_rows = []
+    for batch in ga_service.search_stream(customer_id=clean_customer_id, query=campaign_query):
+        for row in batch.results:
+            hourly_rows.append((
+                customer_id, str(row.campaign.id), row.segments.date, row.segments.hour,
+                row.metrics.impressions, row.metrics.clicks,
+                float(row.metrics.conversions), row.metrics.cost_micros
+            ))
+    
+    # Keywords: granularidad diaria, se re-expresan los días completos de la ventana
+    # criterion_id solo es único dentro del ad group: (campaign_id, ad_group_id, criterion_id, date)
+    keyword_days: Dict[Tuple[str, str, str, str], Dict] = {}
+    if campaign_ids:
+        ids_clause = ', '.join(sorted({str(cid) for cid in campaign_ids}))
+        keyword_query = f"""
+            SELECT
+                ad_group_criterion.criterion_id,
+                ad_group_criterion.keyword.text,
+                ad_group.id,
+                campaign.id,
+                segments.date,
+                metrics.impressions,
+                metrics.clicks,
+                metrics.conversions,
+                metrics.cost_micros
+            FROM keyword_view
+            WHERE campaign.id IN ({ids_clause})
+                AND segments.date BETWEEN '{start_date}' AND '{today_str}'
+                AND ad_group_criterion.status != 'REMOVED'
+        """
+        
+        for batch in ga_service.search_stream(customer_id=clean_customer_id, query=keyword_query):
+            for row in batch.results:
+                key = (str(row.campaign.id), str(row.ad_group.id),
+                       str(row.ad_group_criterion.criterion_id), row.segments.date)
+                data = keyword_days.setdefault(key, {
+                    'keyword_text': row.ad_group_criterion.keyword.text,
+                    'impressions': 0,
+                    'clicks': 0,
+                    'conversions': 0.0,
+                    'cost_micros': 0
+                })
+                data['impressions'] += row.metrics.impressions
+                data['clicks'] += row.metrics.clicks
+                data['conversions'] += float(row.metrics.conversions)
+                data['cost_micros'] += row.metrics.cost_micros
+    
+    conn = get_db()
+    try:
+        with conn:
+            conn.executemany('''
+                INSERT INTO hourly_metrics
+                    (customer_id, campaign_id, date, hour, impressions, clicks, conversions, cost_micros)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (customer_id, campaign_id, date, hour) DO UPDATE SET
+                    impressions = excluded.impressions,
+                    clicks = excluded.clicks,
+                    conversions = excluded.conversions,
+                    cost_micros = excluded.cost_micros
+            ''', hourly_rows)
+            
+            conn.executemany('''
+                INSERT INTO keyword_performance_history
+                    (customer_id, campaign_id, keyword_id, keyword_text, ad_group_id, date,
+                     impressions, clicks, conversions, cost_micros)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (customer_id, campaign_id, ad_group_id, keyword_id, date) DO UPDATE SET
+                    keyword_text = excluded.keyword_text,
+                    impressions = excluded.impressions,
+                    clicks = excluded.clicks,
+                    conversions = excluded.conversions,
+                    cost_micros = excluded.cost_micros
+            ''', [
+                (customer_id, campaign_id, keyword_id, data['keyword_text'], ad_group_id, date_str,
+                 data['impressions'], data['clicks'], data['conversions'], data['cost_micros'])
+                for (campaign_id, ad_group_id, keyword_id, date_str), data in keyword_days.items()
+            ])
+            
+            conn.execute('''
+                INSERT INTO metrics_ingestion_state (customer_id, last_date, last_hour, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (customer_id) DO UPDATE SET
+                    last_date = excluded.last_date,
+                    last_hour = excluded.last_hour,
+                    updated_at = excluded.updated_at
+            ''', (customer_id, today_str, now.hour))
+    finally:
+        conn.close()
+    
+    return {
+        'window_start': start.strftime('%Y-%m-%d %H:00'),
+        'hourly_rows': len(hourly_rows),
+        'keyword_rows': len(keyword_days)
+    }
+
+
+def fetch_account_entity_state(client, customer_id: str, campaign_ids: List[str]) -> Tuple[Dict[str, Tuple[str, str]], set]:
+    """
+    Estado actual (sin métricas) que el almacén no guarda: nombre/status de
+    campañas y keywords habilitadas de las campañas monitoreadas.
+    """
+    ga_service = client.get_service("GoogleAdsService")
+    clean_customer_id = customer_id.replace('-', '')
+    
+    campaign_states = {}
+    for row in ga_service.search(customer_id=clean_customer_id, query="""
+        SELECT campaign.id, campaign.name, campaign.status
+        FROM campaign
+    """):
+        campaign_states[str(row.campaign.id)] = (row.campaign.name, row.campaign.status.name)
+    
+    enabled_keywords = set()
+    if campaign_ids:
+        ids_clause = ', '.join(sorted({str(cid) for cid in campaign_ids}))
+        for row in ga_service.search(customer_id=clean_customer_id, query=f"""
+            SELECT ad_group_criterion.criterion_id, campaign.id
+            FROM ad_group_criterion
+            WHERE campaign.id IN ({ids_clause})
+                AND ad_group_criterion.type = 'KEYWORD'
+                AND ad_group_criterion.status = 'ENABLED'
+        """):
+            enabled_keywords.add((str(row.campaign.id), str(row.ad_group_criterion.criterion_id)))
+    
+    return campaign_states, enabled_keywords
+
+
+def load_warehouse_snapshot(client, customer_id: str, campaign_ids: List[str]) -> AccountSnapshot:
+    """Ingesta incremental + snapshot del ciclo leído desde SQLite"""
+    stats = ingest_account_metrics(client, customer_id, campaign_ids)
+    campaign_states, enabled_keywords = fetch_account_entity_state(client, customer_id, campaign_ids)
+    snapshot = AccountSnapshot.from_warehouse(customer_id, campaign_ids, campaign_states, enabled_keywords)
+    print(f"   🗄️ Almacén {customer_id}: desde {stats['window_start']} "
+          f"({stats['hourly_rows']} filas horarias, {stats['keyword_rows']} filas de keywords)")
+    return snapshot
+
+
+def load_account_data(client, customer_id: str, campaign_ids: List[str]):
+    """Obtiene los datos del ciclo para una cuenta según PROFIT_GUARDIAN_FETCH_MODE"""
+    if PROFIT_GUARDIAN_FETCH_MODE == 'warehouse':
+        try:
+            return load_warehouse_snapshot(client, customer_id, campaign_ids)
+        except Exception as e:
+            print(f"   ⚠️ Almacén local falló ({e}), usando fan-in por cuenta")
+    if PROFIT_GUARDIAN_FETCH_MODE in ('warehouse', 'account'):
+        try:
+            snapshot = AccountSnapshot.fetch(client, customer_id, campaign_ids)
+            print(f"   ⚡ Datos de cuenta {customer_id} cargados en 2 consultas ({len(campaign_ids)} campañas)")
+            return snapshot
+        except Exception as e:
+            print(f"   ⚠️ Fan-in por cuenta falló ({e}), usando consultas por campaña")
+    return LiveAccountData(client, customer_id)
+
+
 # ============================================
 # MOTOR DE DECISIONES
 # ============================================
@@ -928,9 +1604,343 @@ class DecisionEngine:
 class DecisionExecutor:
     """Ejecuta las decisiones tomadas"""
     
+    # Tipos que se agrupan en mutates multi-operación (execute_batch)
+    CRITERION_DECISIONS = (
+        DecisionType.PAUSE_KEYWORD,
+        DecisionType.RESUME_KEYWORD,
+        DecisionType.ADJUST_BID_UP,
+        DecisionType.ADJUST_BID_DOWN,
+    )
+    CAMPAIGN_DECISIONS = (
+        DecisionType.PAUSE_CAMPAIGN,
+        DecisionType.RESUME_CAMPAIGN,
+    )
+    
+    # Límite de operaciones por request de mutate de la API
+    MAX_OPERATIONS_PER_MUTATE = 1000
+    # Resource names por consulta de bids actuales (acota el IN (...) del GAQL)
+    MAX_RESOURCE_NAMES_PER_QUERY = 500
+    
     def __init__(self, client):
         self.client = client
     
+    # ------------------------------------------
+    # Ejecución en lote (un ciclo completo)
+    # ------------------------------------------
+    
+    def execute_batch(self, decisions: List[Decision], log_history: bool = True) -> List[bool]:
+        """
+        Ejecuta las decisiones de un ciclo agrupadas por cuenta y tipo de recurso.
+        
+        - Keywords (pausa, reanudación, bids): mutate_ad_group_criteria multi-operación
+        - Campañas (pausa, reanudación): mutate_campaigns multi-operación
+        - partial_failure=True: una operación inválida no tumba al resto
+        - Historial y estado local se guardan en UNA transacción SQLite
+        
+        Returns:
+            Lista de bool (éxito por decisión) en el mismo orden de entrada
+        """
+        results = [False] * len(decisions)
+        batched = [False] * len(decisions)
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        
+        for index, decision in enumerate(decisions):
+            if decision.decision_type in self.CRITERION_DECISIONS:
+                kind = 'ad_group_criterion'
+            elif decision.decision_type in self.CAMPAIGN_DECISIONS:
+                kind = 'campaign'
+            else:
+                results[index] = self.execute(decision)
+                continue
+            batched[index] = True
+            groups.setdefault((decision.customer_id.replace('-', ''), kind), []).append(index)
+        
+        for (customer_id, kind), indexes in groups.items():
+            group = [decisions[i] for i in indexes]
+            try:
+                if kind == 'ad_group_criterion':
+                    succeeded = self._mutate_criteria_batch(customer_id, group)
+                else:
+                    succeeded = self._mutate_campaigns_batch(customer_id, group)
+            except Exception as e:
+                print(f"   ❌ Error en mutate por lote ({kind}, cuenta {customer_id}): {e}")
+                succeeded = set()
+            
+            for position, index in enumerate(indexes):
+                results[index] = position in succeeded
+            
+            print(f"   📦 Lote {kind} cuenta {customer_id}: {len(succeeded)}/{len(indexes)} operaciones aplicadas")
+        
+        for decision, ok in zip(decisions, results):
+            decision.executed = ok
+        
+        try:
+            self._record_batch_outcomes(decisions, results, batched, log_history)
+        except Exception as e:
+            print(f"   ❌ Error guardando resultados del lote: {e}")
+        
+        return results
+    
+    def _mutate_criteria_batch(self, customer_id: str, decisions: List[Decision]) -> set:
+        """Construye y envía las operaciones de keywords. Retorna posiciones exitosas."""
+        agc_service = self.client.get_service("AdGroupCriterionService")
+        
+        resource_names = []
+        for decision in decisions:
+            ad_group_id = decision.data.get('ad_group_id')
+            if ad_group_id:
+                resource_names.append(agc_service.ad_group_criterion_path(customer_id, ad_group_id, decision.entity_id))
+            else:
+                print(f"   ⚠️ Decisión sin ad_group_id para keyword {decision.entity_id}, omitida")
+                resource_names.append(None)
+        
+        bid_types = (DecisionType.ADJUST_BID_UP, DecisionType.ADJUST_BID_DOWN)
+        bids_available = True
+        try:
+            current_bids = self._fetch_current_bids(customer_id, {
+                resource_names[i] for i, d in enumerate(decisions)
+                if d.decision_type in bid_types and resource_names[i]
+            })
+        except Exception as e:
+            # Sin bids actuales solo fallan los ajustes de bid; pausas y reanudaciones siguen
+            print(f"   ❌ Error obteniendo bids actuales (cuenta {customer_id}): {e}")
+            current_bids = {}
+            bids_available = False
+        
+        entries = []
+        for position, decision in enumerate(decisions):
+            resource_name = resource_names[position]
+            if not resource_name:
+                continue
+            
+            operation = self.client.get_type("AdGroupCriterionOperation")
+            operation.update.resource_name = resource_name
+            
+            if decision.decision_type == DecisionType.PAUSE_KEYWORD:
+                operation.update.status = self.client.enums.AdGroupCriterionStatusEnum.PAUSED
+                operation.update_mask.CopyFrom(FieldMask(paths=["status"]))
+            elif decision.decision_type == DecisionType.RESUME_KEYWORD:
+                operation.update.status = self.client.enums.AdGroupCriterionStatusEnum.ENABLED
+                operation.update_mask.CopyFrom(FieldMask(paths=["status"]))
+            else:
+                if not bids_available:
+                    continue
+                current_bid_micros, _ = current_bids.get(resource_name, (0, ''))
+                if current_bid_micros == 0:
+                    print(f"   ⚠️ No se puede ajustar bid de {decision.data.get('keyword_text', decision.entity_id)}: bid actual es 0")
+                    continue
+                new_bid_micros = self._new_bid_micros(decision, current_bid_micros)
+                decision.data['old_bid_micros'] = current_bid_micros
+                decision.data['new_bid_micros'] = new_bid_micros
+                operation.update.cpc_bid_micros = new_bid_micros
+                operation.update_mask.CopyFrom(FieldMask(paths=["cpc_bid_micros"]))
+            
+            entries.append((position, resource_name, operation))
+        
+        return self._submit_mutations(
+            customer_id, entries, "MutateAdGroupCriteriaRequest", agc_service.mutate_ad_group_criteria
+        )
+    
+    def _mutate_campaigns_batch(self, customer_id: str, decisions: List[Decision]) -> set:
+        """Construye y envía las operaciones de campañas. Retorna posiciones exitosas."""
+        campaign_service = self.client.get_service("CampaignService")
+        
+        entries = []
+        for position, decision in enumerate(decisions):
+            resource_name = campaign_service.campaign_path(customer_id, decision.campaign_id)
+            operation = self.client.get_type("CampaignOperation")
+            operation.update.resource_name = resource_name
+            if decision.decision_type == DecisionType.PAUSE_CAMPAIGN:
+                operation.update.status = self.client.enums.CampaignStatusEnum.PAUSED
+            else:
+                operation.update.status = self.client.enums.CampaignStatusEnum.ENABLED
+            operation.update_mask.CopyFrom(FieldMask(paths=["status"]))
+            entries.append((position, resource_name, operation))
+        
+        return self._submit_mutations(
+            customer_id, entries, "MutateCampaignsRequest", campaign_service.mutate_campaigns
+        )
+    
+    def _submit_mutations(self, customer_id: str, entries: List[Tuple], request_type: str, mutate_method) -> set:
+        """
+        Envía operaciones (posición, resource_name, operación) con partial_failure.
+        Un mismo recurso nunca se repite dentro de un request: las decisiones
+        repetidas sobre el mismo recurso van en "olas" sucesivas, en orden.
+        """
+        waves: List[List[Tuple]] = []
+        seen: Dict[str, int] = {}
+        for entry in entries:
+            wave_index = seen.get(entry[1], 0)
+            seen[entry[1]] = wave_index + 1
+            if wave_index == len(waves):
+                waves.append([])
+            waves[wave_index].append(entry)
+        
+        succeeded = set()
+        for wave in waves:
+            for start in range(0, len(wave), self.MAX_OPERATIONS_PER_MUTATE):
+                chunk = wave[start:start + self.MAX_OPERATIONS_PER_MUTATE]
+                
+                request = self.client.get_type(request_type)
+                request.customer_id = customer_id
+                for _, _, operation in chunk:
+                    request.operations.append(operation)
+                request.partial_failure = True
+                
+                try:
+                    response = mutate_method(request=request)
+                except Exception as e:
+                    print(f"   ❌ Error en mutate ({len(chunk)} operaciones): {e}")
+                    continue
+                
+                failed = self._partial_failure_errors(response)
+                for operation_index, (position, resource_name, _) in enumerate(chunk):
+                    if operation_index in failed:
+                        print(f"   ❌ Operación rechazada {resource_name}: {failed[operation_index]}")
+                    else:
+                        succeeded.add(position)
+        
+        return succeeded
+    
+    def _partial_failure_errors(self, response) -> Dict[int, str]:
+        """Mapea índice de operación -> mensaje de error de un response con partial_failure"""
+        partial_failure = getattr(response, 'partial_failure_error', None)
+        if partial_failure is None or partial_failure.code == 0:
+            return {}
+        
+        failure_type = type(self.client.get_type("GoogleAdsFailure"))
+        errors = {}
+        for detail in partial_failure.details:
+            failure = failure_type.deserialize(detail.value)
+            for error in failure.errors:
+                path = error.location.field_path_elements
+                if path:
+                    errors[path[0].index] = error.message
+        return errors
+    
+    def _fetch_current_bids(self, customer_id: str, resource_names: set) -> Dict[str, Tuple[int, str]]:
+        """Obtiene bids actuales de varios criterios (una consulta por bloque de resource names)"""
+        if not resource_names:
+            return {}
+        
+        ga_service = self.client.get_service("GoogleAdsService")
+        names = sorted(resource_names)
+        bids = {}
+        for start in range(0, len(names), self.MAX_RESOURCE_NAMES_PER_QUERY):
+            names_clause = ', '.join(f"'{name}'" for name in names[start:start + self.MAX_RESOURCE_NAMES_PER_QUERY])
+            query = f"""
+                SELECT
+                    ad_group_criterion.resource_name,
+                    ad_group_criterion.cpc_bid_micros,
+                    ad_group_criterion.keyword.text
+                FROM ad_group_criterion
+                WHERE ad_group_criterion.resource_name IN ({names_clause})
+            """
+            
+            for row in ga_service.search(customer_id=customer_id, query=query):
+                bids[row.ad_group_criterion.resource_name] = (
+                    row.ad_group_criterion.cpc_bid_micros,
+                    row.ad_group_criterion.keyword.text
+                )
+        return bids
+    
+    @staticmethod
+    def _new_bid_micros(decision: Decision, current_bid_micros: int) -> int:
+        """Calcula el nuevo bid con los límites de seguridad"""
+        if decision.decision_type == DecisionType.ADJUST_BID_UP:
+            bid_increase = decision.data.get('suggested_bid_increase', 0.15)  # Default 15%
+            new_bid_micros = int(current_bid_micros * (1 + bid_increase))
+            # Límite de seguridad: máximo 50% de aumento
+            return min(new_bid_micros, int(current_bid_micros * 1.5))
+        
+        bid_decrease = decision.data.get('suggested_bid_decrease', 0.20)  # Default 20%
+        new_bid_micros = int(current_bid_micros * (1 - bid_decrease))
+        # Límite de seguridad: mínimo $100 COP
+        min_bid_micros = 100_000_000  # $100 COP en micros
+        return max(new_bid_micros, min_bid_micros)
+    
+    def _record_batch_outcomes(self, decisions: List[Decision], results: List[bool], batched: List[bool], log_history: bool):
+        """Guarda historial + estado local de todo el lote en una sola transacción"""
+        conn = get_db()
+        try:
+            cursor = conn.cursor()
+            for decision, ok, was_batched in zip(decisions, results, batched):
+                if log_history:
+                    _insert_decision_history(cursor, decision)
+                if ok and was_batched:
+                    self._record_state(cursor, decision)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _save_state(self, decision: Decision):
+        """Persiste el estado local de una decisión ejecutada individualmente"""
+        conn = get_db()
+        try:
+            self._record_state(conn.cursor(), decision)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _record_state(cursor, decision: Decision):
+        """Refleja en la DB local el efecto de una decisión ejecutada"""
+        if decision.decision_type == DecisionType.PAUSE_KEYWORD:
+            resume_at = None
+            if decision.data.get('auto_resume'):
+                hours = decision.data.get('resume_after_hours', 2)
+                resume_at = datetime.utcnow() + timedelta(hours=hours)
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO paused_keywords
+                (customer_id, campaign_id, ad_group_id, keyword_id, keyword_text, 
+                 pause_reason, resume_at, auto_resume, performance_data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                decision.customer_id,
+                decision.campaign_id,
+                decision.data.get('ad_group_id'),
+                decision.entity_id,
+                decision.data.get('keyword_text', ''),
+                decision.reason,
+                resume_at,
+                1 if decision.data.get('auto_resume') else 0,
+                json.dumps(decision.data)
+            ))
+        
+        elif decision.decision_type == DecisionType.RESUME_KEYWORD:
+            cursor.execute(
+                'DELETE FROM paused_keywords WHERE customer_id = ? AND keyword_id = ?',
+                (decision.customer_id, decision.entity_id)
+            )
+        
+        elif decision.decision_type == DecisionType.PAUSE_CAMPAIGN:
+            paused_at = datetime.now().isoformat()  # Timestamp de pausa
+            cursor.execute('''
+                UPDATE monitored_campaigns
+                SET status = 'PAUSED_BY_GUARDIAN', 
+                    paused_by_guardian = 1,
+                    pause_reason = ?,
+                    paused_at = ?,
+                    last_check = ?
+                WHERE customer_id = ? AND campaign_id = ?
+            ''', (decision.reason, paused_at, datetime.utcnow(), decision.customer_id, decision.campaign_id))
+        
+        elif decision.decision_type == DecisionType.RESUME_CAMPAIGN:
+            cursor.execute('''
+                UPDATE monitored_campaigns
+                SET status = 'ACTIVE', 
+                    paused_by_guardian = 0,
+                    pause_reason = NULL,
+                    paused_at = NULL,
+                    last_check = ?
+                WHERE customer_id = ? AND campaign_id = ?
+            ''', (datetime.utcnow(), decision.customer_id, decision.campaign_id))
+    
+    # ------------------------------------------
+    # Ejecución individual
+    # ------------------------------------------
+    
     def execute(self, decision: Decision) -> bool:
         """Ejecuta una decisión"""
         try:
@@ -977,32 +1987,7 @@ class DecisionExecutor:
             )
             
             # Guardar en DB
-            conn = get_db()
-            cursor = conn.cursor()
-            
-            resume_at = None
-            if decision.data.get('auto_resume'):
-                hours = decision.data.get('resume_after_hours', 2)
-                resume_at = datetime.utcnow() + timedelta(hours=hours)
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO paused_keywords
-                (customer_id, campaign_id, ad_group_id, keyword_id, keyword_text, 
-                 pause_reason, resume_at, auto_resume, performance_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                decision.customer_id,
-                decision.campaign_id,
-                ad_group_id,
-                criterion_id,
-                decision.data.get('keyword_text', ''),
-                decision.reason,
-                resume_at,
-                1 if decision.data.get('auto_resume') else 0,
-                json.dumps(decision.data)
-            ))
-            conn.commit()
-            conn.close()
+            self._save_state(decision)
             
             print(f"   ⏸️ Keyword pausada: {decision.data.get('keyword_text', criterion_id)}")
             return True
@@ -1035,14 +2020,7 @@ class DecisionExecutor:
             )
             
             # Remover de DB
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute(
-                'DELETE FROM paused_keywords WHERE customer_id = ? AND keyword_id = ?',
-                (decision.customer_id, criterion_id)
-            )
-            conn.commit()
-            conn.close()
+            self._save_state(decision)
             
             print(f"   ▶️ Keyword reactivada: {decision.data.get('keyword_text', criterion_id)}")
             return True
@@ -1072,20 +2050,7 @@ class DecisionExecutor:
             )
             
             # Actualizar DB
-            conn = get_db()
-            cursor = conn.cursor()
-            paused_at = datetime.now().isoformat()  # Timestamp de pausa
-            cursor.execute('''
-                UPDATE monitored_campaigns
-                SET status = 'PAUSED_BY_GUARDIAN', 
-                    paused_by_guardian = 1,
-                    pause_reason = ?,
-                    paused_at = ?,
-                    last_check = ?
-                WHERE customer_id = ? AND campaign_id = ?
-            ''', (decision.reason, paused_at, datetime.utcnow(), decision.customer_id, campaign_id))
-            conn.commit()
-            conn.close()
+            self._save_state(decision)
             
             print(f"   ⏸️ Campaña pausada: {campaign_id} (hora {datetime.now().hour}h)")
             return True
@@ -1115,19 +2080,7 @@ class DecisionExecutor:
             )
             
             # Actualizar DB
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE monitored_campaigns
-                SET status = 'ACTIVE', 
-                    paused_by_guardian = 0,
-                    pause_reason = NULL,
-                    paused_at = NULL,
-                    last_check = ?
-                WHERE customer_id = ? AND campaign_id = ?
-            ''', (datetime.utcnow(), decision.customer_id, campaign_id))
-            conn.commit()
-            conn.close()
+            self._save_state(decision)
             
             print(f"   ▶️ Resumed campaign: {campaign_id}")
             return True
@@ -1181,11 +2134,7 @@ class DecisionExecutor:
             
             # Aumentar bid según sugerencia
             bid_increase = decision.data.get('suggested_bid_increase', 0.15)  # Default 15%
-            new_bid_micros = int(current_bid_micros * (1 + bid_increase))
-            
-            # Límite de seguridad: máximo 50% de aumento
-            max_bid_micros = int(current_bid_micros * 1.5)
-            new_bid_micros = min(new_bid_micros, max_bid_micros)
+            new_bid_micros = self._new_bid_micros(decision, current_bid_micros)
             
             # Actualizar bid
             operation = self.client.get_type("AdGroupCriterionOperation")
@@ -1253,11 +2202,7 @@ class DecisionExecutor:
             
             # Reducir bid según sugerencia
             bid_decrease = decision.data.get('suggested_bid_decrease', 0.20)  # Default 20%
-            new_bid_micros = int(current_bid_micros * (1 - bid_decrease))
-            
-            # Límite de seguridad: mínimo $100 COP
-            min_bid_micros = 100_000_000  # $100 COP en micros
-            new_bid_micros = max(new_bid_micros, min_bid_micros)
+            new_bid_micros = self._new_bid_micros(decision, current_bid_micros)
             
             # Actualizar bid
             operation = self.client.get_type("AdGroupCriterionOperation")
@@ -1307,8 +2252,8 @@ def check_campaigns_to_resume():
         client = get_google_ads_client()
         executor = DecisionExecutor(client)
         
-        for customer_id, campaign_id, ad_group_id, keyword_id, keyword_text in keywords_to_resume:
-            decision = Decision(
+        decisions = [
+            Decision(
                 decision_type=DecisionType.RESUME_KEYWORD,
                 entity_type="keyword",
                 entity_id=keyword_id,
@@ -1317,7 +2262,10 @@ def check_campaigns_to_resume():
                 reason="Auto-resume after cooldown",
                 data={'ad_group_id': ad_group_id, 'keyword_text': keyword_text}
             )
-            executor.execute(decision)
+            for customer_id, campaign_id, ad_group_id, keyword_id, keyword_text in keywords_to_resume
+        ]
+        results = executor.execute_batch(decisions, log_history=False)
+        print(f"   ▶️ Keywords reactivadas: {sum(results)}/{len(decisions)}")
     
     conn.close()
 
@@ -1347,7 +2295,7 @@ def resume_campaigns_for_new_hour():
     
     client = get_google_ads_client()
     executor = DecisionExecutor(client)
-    resumed_count = 0
+    decisions = []
     
     for customer_id, campaign_id, campaign_name, pause_reason, paused_at in campaigns_to_resume:
         # Extraer hora de pausa (formato ISO: 2025-12-12T10:30:45)
@@ -1357,7 +2305,7 @@ def resume_campaigns_for_new_hour():
             
             # Solo reactivar si estamos en una NUEVA hora diferente
             if current_hour != paused_hour:
-                decision = Decision(
+                decisions.append(Decision(
                     decision_type=DecisionType.RESUME_CAMPAIGN,
                     entity_type="campaign",
                     entity_id="",
@@ -1365,17 +2313,20 @@ def resume_campaigns_for_new_hour():
                     campaign_id=campaign_id,
                     reason=f"Nueva hora iniciada: {current_hour}:00h - Cuota horaria renovada (pausada a las {paused_hour}:00h)",
                     data={'campaign_name': campaign_name, 'paused_hour': paused_hour}
-                )
-                success = executor.execute(decision)
-                if success:
-                    resumed_count += 1
-                    print(f"      ✅ {campaign_name or campaign_id} reactivada (pausada hora {paused_hour}h → activa hora {current_hour}h)")
+                ))
             else:
                 # Misma hora - no reactivar aún
                 print(f"      ⏸️ {campaign_name or campaign_id} sigue pausada (misma hora {current_hour}h)")
         except Exception as e:
             print(f"      ⚠️ Error procesando {campaign_id}: {e}")
     
+    # Todas las reactivaciones en un mutate por cuenta
+    resumed_count = 0
+    for decision, success in zip(decisions, executor.execute_batch(decisions, log_history=False)):
+        if success:
+            resumed_count += 1
+            print(f"      ✅ {decision.data['campaign_name'] or decision.campaign_id} reactivada (pausada hora {decision.data['paused_hour']}h → activa hora {current_hour}h)")
+    
     if resumed_count > 0:
         print(f"   🎉 {resumed_count} campañas reactivadas para nueva hora ({current_hour}:00h)")
     
@@ -1448,8 +2399,11 @@ def run_profit_guardian_check():
         except:
             config = BusinessConfig()
         
+        # Datos del ciclo para la cuenta (fan-in: 2 consultas por cuenta)
+        account_data = load_account_data(client, account_id, [c[0] for c in acc_campaigns])
+        
         # Obtener gasto a nivel cuenta por hora
-        account_hourly = get_account_hourly_spend_today(client, account_id)
+        account_hourly = account_data.get_account_hourly_spend()
         current_hour = datetime.now().hour
         acc_current_micros = account_hourly.get(current_hour, {}).get('cost_micros', 0)
         acc_current_cop = acc_current_micros / 1_000_000
@@ -1478,9 +2432,9 @@ def run_profit_guardian_check():
             print(f"   💳 Wallet hoy: disponible ${available_today:,.0f} COP (gastado ${total_spend_today_cop:,.0f})")
             if available_today <= 0:
                 print(f"   🛑 Saldo virtual AGOTADO - pausando campañas hasta nuevo top-up")
-                # Pausar todas las campañas activas de la cuenta
-                for campaign_id, campaign_name, _ in acc_campaigns:
-                    decision = Decision(
+                # Pausar todas las campañas activas de la cuenta (un solo mutate)
+                wallet_decisions = [
+                    Decision(
                         decision_type=DecisionType.PAUSE_CAMPAIGN,
                         entity_type="campaign",
                         entity_id="",
@@ -1494,8 +2448,9 @@ def run_profit_guardian_check():
                             'auto_resume': False
                         }
                     )
-                    log_decision(decision)
-                    executor.execute(decision)
+                    for campaign_id, campaign_name, _ in acc_campaigns
+                ]
+                executor.execute_batch(wallet_decisions)
                 # Pasar a siguiente cuenta (no más análisis)
                 continue
         
@@ -1504,7 +2459,7 @@ def run_profit_guardian_check():
         # Recopilar gasto por campaña en la hora actual
         campaign_hour_spend = []
         for campaign_id, campaign_name, _ in acc_campaigns:
-            hourly_spend = get_hourly_spend_today(client, account_id, campaign_id)
+            hourly_spend = account_data.get_hourly_spend(campaign_id)
             cur_micros = hourly_spend.get(current_hour, {}).get('cost_micros', 0)
             campaign_hour_spend.append((campaign_id, campaign_name, cur_micros))
         
@@ -1516,38 +2471,51 @@ def run_profit_guardian_check():
             campaign_hour_spend.sort(key=lambda x: x[2], reverse=True)
             excess_cop = acc_current_cop - hourly_budget
             reduced_cop = 0.0
+            candidates = [
+                (campaign_id, campaign_name, micros / 1_000_000)
+                for campaign_id, campaign_name, micros in campaign_hour_spend
+                if micros > 0
+            ]
             
-            for campaign_id, campaign_name, micros in campaign_hour_spend:
-                if reduced_cop >= excess_cop:
-                    break
-                cur_cop = micros / 1_000_000
-                if cur_cop <= 0:
-                    continue
+            # Cada ola pausa en un solo mutate las de mayor gasto que cubren el exceso restante.
+            # Solo las pausas exitosas reducen el exceso: si alguna falla, la siguiente ola
+            # sigue con las campañas restantes (igual que el recorrido secuencial)
+            while candidates and reduced_cop < excess_cop:
+                pacing_decisions = []
+                planned_cop = reduced_cop
+                while candidates and planned_cop < excess_cop:
+                    campaign_id, campaign_name, cur_cop = candidates.pop(0)
+                    pacing_decisions.append(Decision(
+                        decision_type=DecisionType.PAUSE_CAMPAIGN,
+                        entity_type="campaign",
+                        entity_id="",
+                        customer_id=account_id,
+                        campaign_id=campaign_id,
+                        reason=f"Cuenta superó cuota horaria: ${acc_current_cop:,.0f}/${hourly_budget:,.0f}. Pausando campaña top gasto (${cur_cop:,.0f}).",
+                        data={
+                            'pause_type': 'account_hourly_budget_pacing',
+                            'current_hour_spend_total': acc_current_cop,
+                            'hourly_budget': hourly_budget,
+                            'campaign_hour_spend': cur_cop,
+                            'resume_at_hour': current_hour + 1,
+                            'auto_resume': True
+                        }
+                    ))
+                    planned_cop += cur_cop
                 
-                decision = Decision(
-                    decision_type=DecisionType.PAUSE_CAMPAIGN,
-                    entity_type="campaign",
-                    entity_id="",
-                    customer_id=account_id,
-                    campaign_id=campaign_id,
-                    reason=f"Cuenta superó cuota horaria: ${acc_current_cop:,.0f}/${hourly_budget:,.0f}. Pausando campaña top gasto (${cur_cop:,.0f}).",
-                    data={
-                        'pause_type': 'account_hourly_budget_pacing',
-                        'current_hour_spend_total': acc_current_cop,
-                        'hourly_budget': hourly_budget,
-                        'campaign_hour_spend': cur_cop,
-                        'resume_at_hour': current_hour + 1,
-                        'auto_resume': True
-                    }
-                )
-                # Log + execute pausa
-                log_decision(decision)
-                if executor.execute(decision):
-                    paused_campaigns.add(campaign_id)
-                    reduced_cop += cur_cop
+                # Log + execute pausas de la ola en un solo mutate
+                for decision, success in zip(pacing_decisions, executor.execute_batch(pacing_decisions)):
+                    if success:
+                        paused_campaigns.add(decision.campaign_id)
+                        reduced_cop += decision.data['campaign_hour_spend']
+                    else:
+                        print(f"   ⚠️ Falló la pausa de {decision.campaign_id}; se intenta con la siguiente campaña")
             
             print(f"   ✅ Pausas aplicadas: {len(paused_campaigns)} campañas")
         
+        # Decisiones de todas las campañas de la cuenta (se ejecutan juntas al final)
+        account_decisions: List[Decision] = []
+        
         # Procesar análisis por campaña (omitir las ya pausadas por guardian)
         for campaign_id, campaign_name, config_json in acc_campaigns:
             if campaign_id in paused_campaigns:
@@ -1564,7 +2532,7 @@ def run_profit_guardian_check():
                 cfg = config
             
             # Obtener performance
-            campaign_perf = get_campaign_performance_today(client, account_id, campaign_id)
+            campaign_perf = account_data.get_campaign_performance(campaign_id)
             if not campaign_perf:
                 print(f"      ⚠️ No data available")
                 continue
@@ -1575,10 +2543,10 @@ def run_profit_guardian_check():
             print(f"      💰 Spend: ${total_spend:,.0f} COP | Conv: {total_conv}")
             
             # Obtener performance por keyword
-            keywords = get_keywords_performance_today(client, account_id, campaign_id, cfg)
+            keywords = account_data.get_keywords_performance(campaign_id, cfg)
             
-            # Obtener gasto por hora
-            hourly_spend = get_hourly_spend_today(client, account_id, campaign_id)
+            # Obtener gasto por hora (ya obtenido para el ranking de la cuenta)
+            hourly_spend = account_data.get_hourly_spend(campaign_id)
             
             # Motor de decisiones
             engine = DecisionEngine(cfg)
@@ -1601,20 +2569,17 @@ def run_profit_guardian_check():
                 print(f"      ✅ Todas las métricas dentro del rango aceptable")
                 continue
             
-            print(f"      🎯 {len(all_decisions)} decisiones a ejecutar:")
+            print(f"      🎯 {len(all_decisions)} decisiones a ejecutar")
             
-            # Ejecutar decisiones
-            executed = 0
             for decision in all_decisions:
                 decision.customer_id = account_id
                 decision.campaign_id = campaign_id
-                
-                log_decision(decision)
-                if executor.execute(decision):
-                    executed += 1
-                    decision.executed = True
-            
-            print(f"      📋 Ejecutado: {executed}/{len(all_decisions)}")
+            account_decisions.extend(all_decisions)
+        
+        # Ejecutar decisiones de la cuenta: mutates multi-operación + 1 transacción local
+        if account_decisions:
+            results = executor.execute_batch(account_decisions)
+            print(f"\n   📋 Cuenta {account_id} - Ejecutado: {sum(results)}/{len(account_decisions)}")
     
     # 🔄 Reactivar campañas para nueva hora (Budget Pacing)
     resume_campaigns_for_new_hour()
@@ -1627,15 +2592,11 @@ def run_profit_guardian_check():
     print(f"{'='*60}\n")
 
 
-def log_decision(decision: Decision):
-    """Guarda decisión en historial"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
+def _insert_decision_history(cursor, decision: Decision):
     cursor.execute('''
         INSERT INTO decision_history
-        (customer_id, campaign_id, decision_type, entity_type, entity_id, reason, data_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        (customer_id, campaign_id, decision_type, entity_type, entity_id, reason, data_json, executed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     ''', (
         decision.customer_id,
         decision.campaign_id,
@@ -1643,8 +2604,17 @@ def log_decision(decision: Decision):
         decision.entity_type,
         decision.entity_id,
         decision.reason,
-        json.dumps(decision.data)
+        json.dumps(decision.data),
+        1 if decision.executed else 0
     ))
+
+
+def log_decision(decision: Decision):
+    """Guarda decisión en historial"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    _insert_decision_history(cursor, decision)
     
     conn.commit()
     conn.close()
@@ -1802,14 +2772,15 @@ def get_status():
     cursor.execute('SELECT COUNT(*) FROM paused_keywords')
     paused_keywords = cursor.fetchone()[0]
     
-    # Decisiones hoy
+    # Decisiones hoy (rango sobre timestamp para usar el índice)
     today = datetime.now().strftime('%Y-%m-%d')
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
     cursor.execute('''
         SELECT COUNT(*), decision_type 
         FROM decision_history 
-        WHERE DATE(timestamp) = ?
+        WHERE timestamp >= ? AND timestamp < ?
         GROUP BY decision_type
-    ''', (today,))
+    ''', (today, tomorrow))
     decisions_today = {row[1]: row[0] for row in cursor.fetchall()}
     
     conn.close()
@@ -3271,6 +4242,15 @@ def start_profit_guardian():
         replace_existing=True
     )
     
+    # Compactación diaria del historial (3 AM)
+    guardian_scheduler.add_job(
+        func=compact_profit_guardian_history,
+        trigger=CronTrigger(hour=3, minute=0),
+        id='profit_guardian_retention',
+        name='Profit Guardian - Compact old history',
+        replace_existing=True
+    )
+    
     guardian_scheduler.start()
     
     print("=" * 60)
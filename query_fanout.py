@@ -0,0 +1,99 @@
+"""
+GAQL Query Fan-out
+==================
+Ejecuta en paralelo queries de lectura independientes (sobre el mismo
+cliente de Google Ads) con un límite de concurrencia por proceso y un
+deadline por request.
+
+La latencia total pasa a ser la de la query más lenta en lugar de la suma.
+Si alguna query falla o no termina antes del deadline, las demás se
+devuelven igual y la falla se reporta por nombre (resultado parcial).
+
+Uso:
+    outcome = run_queries({
+        'keywords': lambda timeout: fetch_keywords(timeout),
+        'ads': lambda timeout: fetch_ads(timeout),
+    })
+    outcome.results['keywords'], outcome.errors
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GAQL_FANOUT_MAX_WORKERS = int(os.getenv('GAQL_FANOUT_MAX_WORKERS', '8'))
+GAQL_FANOUT_DEADLINE_SECONDS = float(os.getenv('GAQL_FANOUT_DEADLINE_SECONDS', '25'))
+
+
+@dataclass
+class FanoutOutcome:
+    """Resultado de un fan-out: valores por nombre y errores de las que fallaron"""
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    exceptions: Dict[str, BaseException] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.errors)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool compartido por proceso (se recrea tras un fork: los hilos no se heredan)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=GAQL_FANOUT_MAX_WORKERS, thread_name_prefix='GaqlFanout')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def run_queries(tasks: Dict[str, Callable[[float], Any]], deadline_seconds: float = GAQL_FANOUT_DEADLINE_SECONDS) -> FanoutOutcome:
+    """
+    Ejecuta cada tarea en el pool compartido. Cada tarea recibe el tiempo
+    restante hasta el deadline (para pasarlo como `timeout` a la llamada gRPC).
+    """
+    start = time.monotonic()
+    deadline = start + deadline_seconds
+    executor = _get_executor()
+
+    def run(task: Callable[[float], Any]):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("deadline exceeded before the query started")
+        return task(remaining)
+
+    futures = {executor.submit(run, task): name for name, task in tasks.items()}
+    done, not_done = wait(futures, timeout=deadline_seconds)
+
+    outcome = FanoutOutcome()
+    for future in done:
+        name = futures[future]
+        try:
+            outcome.results[name] = future.result()
+        except Exception as e:
+            outcome.exceptions[name] = e
+            outcome.errors[name] = str(e)
+            logger.warning(f"Query '{name}' falló: {e}")
+
+    for future in not_done:
+        name = futures[future]
+        future.cancel()
+        error = TimeoutError(f"deadline of {deadline_seconds:.0f}s exceeded")
+        outcome.exceptions[name] = error
+        outcome.errors[name] = str(error)
+        logger.warning(f"Query '{name}' no terminó antes del deadline ({deadline_seconds:.0f}s)")
+
+    outcome.elapsed_seconds = time.monotonic() - start
+    return outcome
@@ -3,9 +3,16 @@ Rate Limiting and Request Queue Module
 ======================================
 Sistema de rate limiting para proteger el backend de sobrecarga.
 Implementa límites por usuario y globales.
+
+SharedRateLimiter (el usado por defecto) guarda token buckets en SQLite (WAL)
+para que todos los workers de gunicorn compartan los mismos límites. Cada
+verificación lee y actualiza una fila por usuario más la fila global: O(1)
+sin importar cuántos requests haya en la ventana.
 """
 
+import os
 import time
+import sqlite3
 import threading
 import logging
 from dataclasses import dataclass, field
@@ -158,9 +165,234 @@ class RateLimiter:
             }
 
 
-# Instancia global del rate limiter
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB', 'rate_limiter.db')
+RATE_LIMIT_PURGE_EVERY = int(os.getenv('RATE_LIMIT_PURGE_EVERY', '500'))  # checks entre limpiezas
+GLOBAL_BUCKET_KEY = '__global__'
+
+
+RATE_LIMIT_SCHEMA = (
+    '''
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            bucket_key TEXT PRIMARY KEY,
+            minute_tokens REAL NOT NULL,
+            hour_tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            last_request_at REAL NOT NULL DEFAULT 0,
+            total_requests INTEGER NOT NULL DEFAULT 0,
+            blocked_requests INTEGER NOT NULL DEFAULT 0
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets(updated_at)',
+)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Rate limiter con token buckets compartidos entre procesos.
+
+    Por usuario hay dos buckets (minuto y hora) que se rellenan de forma
+    continua: capacidad requests_per_minute a razón de requests_per_minute/60
+    tokens por segundo, y lo mismo para la hora. El estado vive en una fila de
+    SQLite que se lee y actualiza dentro de BEGIN IMMEDIATE, así dos workers
+    no pueden gastar el mismo token.
+
+    Si SQLite falla (disco lleno, permisos...) se usa el limiter en memoria del
+    proceso en lugar de tumbar el endpoint.
+    """
+
+    def __init__(self, config: RateLimitConfig = None, db_path: str = RATE_LIMIT_DB_PATH):
+        super().__init__(config)
+        self.db_path = db_path
+        self._checks_since_purge = 0
+
+    def _get_db(self) -> sqlite3.Connection:
+        from sqlite_pool import get_connection
+        return get_connection(self.db_path, schema=RATE_LIMIT_SCHEMA)
+
+    @staticmethod
+    def _refill(tokens: float, capacity: float, elapsed: float, window_seconds: float) -> float:
+        """Tokens disponibles tras `elapsed` segundos de relleno continuo"""
+        return min(capacity, tokens + max(0.0, elapsed) * capacity / window_seconds)
+
+    def _load_bucket(self, cursor, key: str, minute_capacity: float, hour_capacity: float, now: float) -> Dict[str, float]:
+        cursor.execute('''
+            SELECT minute_tokens, hour_tokens, updated_at, last_request_at, total_requests, blocked_requests
+            FROM rate_limit_buckets WHERE bucket_key = ?
+        ''', (key,))
+        row = cursor.fetchone()
+        if row is None:
+            return {
+                "minute_tokens": minute_capacity, "hour_tokens": hour_capacity,
+                "last_request_at": 0.0, "total_requests": 0, "blocked_requests": 0
+            }
+
+        elapsed = now - row[2]
+        return {
+            "minute_tokens": self._refill(row[0], minute_capacity, elapsed, 60),
+            "hour_tokens": self._refill(row[1], hour_capacity, elapsed, 3600),
+            "last_request_at": row[3],
+            "total_requests": row[4],
+            "blocked_requests": row[5]
+        }
+
+    @staticmethod
+    def _save_bucket(cursor, key: str, bucket: Dict[str, float], now: float):
+        cursor.execute('''
+            INSERT INTO rate_limit_buckets
+                (bucket_key, minute_tokens, hour_tokens, updated_at, last_request_at, total_requests, blocked_requests)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(bucket_key) DO UPDATE SET
+                minute_tokens = excluded.minute_tokens,
+                hour_tokens = excluded.hour_tokens,
+                updated_at = excluded.updated_at,
+                last_request_at = excluded.last_request_at,
+                total_requests = excluded.total_requests,
+                blocked_requests = excluded.blocked_requests
+        ''', (
+            key, bucket["minute_tokens"], bucket["hour_tokens"], now,
+            bucket["last_request_at"], bucket["total_requests"], bucket["blocked_requests"]
+        ))
+
+    def _evaluate(self, user: Dict[str, float], glob: Dict[str, float], now: float) -> tuple[Optional[str], Optional[float]]:
+        """Mismo orden de verificación que RateLimiter: cooldown, minuto, hora, global"""
+        time_since_last = now - user["last_request_at"]
+        if user["last_request_at"] > 0 and time_since_last < self.config.cooldown_seconds:
+            return "Too many requests. Please wait.", self.config.cooldown_seconds - time_since_last
+
+        if user["minute_tokens"] < 1:
+            retry_after = (1 - user["minute_tokens"]) * 60 / self.config.requests_per_minute
+            return f"Rate limit exceeded ({self.config.requests_per_minute}/min)", retry_after
+
+        if user["hour_tokens"] < 1:
+            retry_after = (1 - user["hour_tokens"]) * 3600 / self.config.requests_per_hour
+            return f"Hourly limit exceeded ({self.config.requests_per_hour}/hour)", retry_after
+
+        if glob["minute_tokens"] < 1:
+            return "System is busy. Please try again later.", 30.0
+
+        return None, None
+
+    def check_rate_limit(
+        self,
+        user_id: str = None,
+        ip: str = None,
+        customer_id: str = None
+    ) -> tuple[bool, Optional[str], Optional[float]]:
+        """
+        Verifica si el request está dentro de los límites (compartidos entre workers).
+
+        Returns:
+            Tuple de (allowed, error_message, retry_after_seconds)
+        """
+        user_key = self._get_user_key(user_id, ip, customer_id)
+        now = time.time()
+
+        try:
+            conn = self._get_db()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                cursor = conn.cursor()
+                user = self._load_bucket(cursor, user_key, self.config.requests_per_minute, self.config.requests_per_hour, now)
+                glob = self._load_bucket(cursor, GLOBAL_BUCKET_KEY, self.global_limit_per_minute, self.global_limit_per_hour, now)
+
+                error_msg, retry_after = self._evaluate(user, glob, now)
+                if error_msg:
+                    # El bloqueo global no cuenta contra el usuario (igual que RateLimiter)
+                    if not error_msg.startswith("System is busy"):
+                        user["blocked_requests"] += 1
+                        self._save_bucket(cursor, user_key, user, now)
+                else:
+                    for bucket in (user, glob):
+                        bucket["minute_tokens"] -= 1
+                        bucket["hour_tokens"] -= 1
+                        bucket["last_request_at"] = now
+                        bucket["total_requests"] += 1
+                    self._save_bucket(cursor, user_key, user, now)
+                    self._save_bucket(cursor, GLOBAL_BUCKET_KEY, glob, now)
+
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limiter compartido no disponible ({e}); usando límites en memoria")
+            return super().check_rate_limit(user_id=user_id, ip=ip, customer_id=customer_id)
+
+        self._maybe_purge(now)
+
+        if error_msg:
+            return False, error_msg, retry_after
+        return True, None, None
+
+    def _maybe_purge(self, now: float):
+        """Borra buckets que ya estarían llenos (sin actividad en la última hora)"""
+        with self._lock:
+            self._checks_since_purge += 1
+            if self._checks_since_purge < RATE_LIMIT_PURGE_EVERY:
+                return
+            self._checks_since_purge = 0
+
+        try:
+            conn = self._get_db()
+            try:
+                conn.execute(
+                    'DELETE FROM rate_limit_buckets WHERE updated_at < ? AND bucket_key != ?',
+                    (now - 3600, GLOBAL_BUCKET_KEY)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudieron purgar buckets de rate limit: {e}")
+
+    def get_user_stats(self, user_id: str = None, ip: str = None, customer_id: str = None) -> Dict[str, Any]:
+        """Obtiene estadísticas de un usuario (requests estimados a partir de los tokens consumidos)"""
+        user_key = self._get_user_key(user_id, ip, customer_id)
+        now = time.time()
+
+        conn = self._get_db()
+        try:
+            user = self._load_bucket(conn.cursor(), user_key, self.config.requests_per_minute, self.config.requests_per_hour, now)
+        finally:
+            conn.close()
+
+        return {
+            "requests_last_minute": int(self.config.requests_per_minute - user["minute_tokens"]),
+            "requests_last_hour": int(self.config.requests_per_hour - user["hour_tokens"]),
+            "total_requests": user["total_requests"],
+            "blocked_requests": user["blocked_requests"],
+            "limit_per_minute": self.config.requests_per_minute,
+            "limit_per_hour": self.config.requests_per_hour
+        }
+
+    def get_global_stats(self) -> Dict[str, Any]:
+        """Obtiene estadísticas globales del sistema (todos los workers)"""
+        now = time.time()
+
+        conn = self._get_db()
+        try:
+            cursor = conn.cursor()
+            glob = self._load_bucket(cursor, GLOBAL_BUCKET_KEY, self.global_limit_per_minute, self.global_limit_per_hour, now)
+            cursor.execute(
+                'SELECT COUNT(*) FROM rate_limit_buckets WHERE updated_at >= ? AND bucket_key != ?',
+                (now - 3600, GLOBAL_BUCKET_KEY)
+            )
+            active_users = cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+        return {
+            "global_requests_last_minute": int(self.global_limit_per_minute - glob["minute_tokens"]),
+            "global_requests_last_hour": int(self.global_limit_per_hour - glob["hour_tokens"]),
+            "active_users": active_users,
+            "global_limit_per_minute": self.global_limit_per_minute,
+            "backend": "sqlite",
+            "db_path": self.db_path
+        }
+
+
+# Instancia global del rate limiter (compartida entre workers vía SQLite)
 # Configuración para usuarios enterprise (más generosa)
-_rate_limiter = RateLimiter(RateLimitConfig(
+_rate_limiter = SharedRateLimiter(RateLimitConfig(
     requests_per_minute=20,  # 20 landings por minuto por usuario
     requests_per_hour=200,   # 200 landings por hora por usuario
     burst_limit=5,
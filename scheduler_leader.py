@@ -0,0 +1,172 @@
+"""
+Scheduler Leader Election
+=========================
+Garantiza que UN SOLO proceso ejecute los schedulers en background
+(Circuit Breaker y Profit Guardian) aunque gunicorn levante varios workers.
+
+Funcionamiento:
+- Cada worker intenta tomar un lock exclusivo (fcntl.flock) sobre un archivo local.
+- El que lo obtiene es el LÍDER y arranca los schedulers.
+- Los demás quedan como SEGUIDORES: solo atienden HTTP y reintentan tomar
+  el lock periódicamente desde un hilo daemon.
+- El kernel libera el lock cuando el proceso líder muere (reciclado por
+  max_requests, timeout, OOM...), así que un seguidor toma el relevo en el
+  siguiente reintento sin intervención manual.
+"""
+
+import os
+import fcntl
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', '/tmp/google_ads_scheduler.lock')
+SCHEDULER_LEADER_RETRY_SECONDS = float(os.getenv('SCHEDULER_LEADER_RETRY_SECONDS', '30'))
+
+
+class SchedulerLeader:
+    """
+    Elección de líder entre procesos basada en un file lock.
+
+    Los callbacks registrados con run_when_leader() se ejecutan exactamente una
+    vez, en el proceso que obtiene el lock (ahora o cuando el líder actual muera).
+    """
+
+    def __init__(self, lock_path: str = SCHEDULER_LOCK_FILE, retry_seconds: float = SCHEDULER_LEADER_RETRY_SECONDS):
+        self.lock_path = lock_path
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+        self._reset_process_state()
+
+    def _reset_process_state(self):
+        """Estado propio del proceso (se reinicia en cada fork)"""
+        self._fd: Optional[int] = None
+        self._owner_pid: Optional[int] = None
+        self._started = False
+        self._became_leader_at: Optional[datetime] = None
+        self._stop_event = threading.Event()
+        self._follower_thread: Optional[threading.Thread] = None
+
+    def _after_fork_in_child(self):
+        """Un hijo nunca hereda el liderazgo del padre"""
+        inherited_fd = self._fd
+        self._lock = threading.Lock()
+        self._reset_process_state()
+        if inherited_fd is not None:
+            try:
+                os.close(inherited_fd)
+            except OSError:
+                pass
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None and self._owner_pid == os.getpid()
+
+    def try_acquire(self) -> bool:
+        """Intenta tomar el lock sin bloquear. Retorna True si este proceso es líder."""
+        with self._lock:
+            if self.is_leader:
+                return True
+
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+
+            # Dejar constancia del PID dueño (solo informativo)
+            os.ftruncate(fd, 0)
+            os.write(fd, f"{os.getpid()}\n".encode())
+
+            self._fd = fd
+            self._owner_pid = os.getpid()
+            self._became_leader_at = datetime.utcnow()
+            logger.info(f"👑 Proceso {os.getpid()} es el líder de schedulers ({self.lock_path})")
+            return True
+
+    def release(self):
+        """Libera el lock (el siguiente seguidor tomará el relevo)"""
+        self._stop_event.set()
+        with self._lock:
+            if self.is_leader:
+                try:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                finally:
+                    os.close(self._fd)
+                logger.info(f"👋 Proceso {os.getpid()} liberó el liderazgo de schedulers")
+            self._fd = None
+            self._owner_pid = None
+
+    def run_when_leader(self, callback: Callable[[], Any]):
+        """
+        Registra un callback que debe correr solo en el proceso líder.
+
+        Si este proceso ya es (o se vuelve) líder, el callback se ejecuta de
+        inmediato; si no, un hilo seguidor lo ejecutará al tomar el lock.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+        if self.try_acquire():
+            self._start_callbacks()
+        else:
+            print(f"ℹ️  Worker {os.getpid()} en modo seguidor: schedulers corren en otro proceso")
+            self._ensure_follower_thread()
+
+    def _start_callbacks(self):
+        """Ejecuta los callbacks pendientes (cada uno una sola vez)"""
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+            self._started = True
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"❌ Error iniciando scheduler {getattr(callback, '__name__', callback)}: {e}")
+
+    def _ensure_follower_thread(self):
+        if self._follower_thread and self._follower_thread.is_alive():
+            return
+        self._follower_thread = threading.Thread(
+            target=self._follower_loop,
+            name='SchedulerLeaderFollower',
+            daemon=True
+        )
+        self._follower_thread.start()
+
+    def _follower_loop(self):
+        while not self._stop_event.wait(self.retry_seconds):
+            try:
+                if self.try_acquire():
+                    print(f"👑 Worker {os.getpid()} tomó el relevo de los schedulers")
+                    self._start_callbacks()
+                    return
+            except Exception as e:
+                logger.error(f"Error en elección de líder de schedulers: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Estado de la elección para endpoints de diagnóstico"""
+        return {
+            "pid": os.getpid(),
+            "is_leader": self.is_leader,
+            "leader_since": self._became_leader_at.isoformat() if self.is_leader and self._became_leader_at else None,
+            "schedulers_started": self._started,
+            "lock_file": self.lock_path,
+            "retry_seconds": self.retry_seconds
+        }
+
+
+# Instancia global por proceso
+_scheduler_leader = SchedulerLeader()
+os.register_at_fork(after_in_child=_scheduler_leader._after_fork_in_child)
+
+
+def get_scheduler_leader() -> SchedulerLeader:
+    """Obtiene la instancia global de elección de líder"""
+    return _scheduler_leader
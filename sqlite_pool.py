@@ -0,0 +1,148 @@
+"""
+SQLite Connection Pool
+======================
+Capa de conexión compartida para profit_guardian.db y circuit_breaker.db.
+
+- journal_mode=WAL: los lectores (dashboard) no se bloquean mientras el
+  scheduler escribe, y viceversa.
+- synchronous=NORMAL: seguro con WAL y mucho más rápido que FULL.
+- busy_timeout: espera al lock en lugar de fallar con "database is locked".
+- Conexiones reutilizables por hilo: conn.close() no cierra la conexión,
+  la devuelve (sin transacción abierta) al pool del hilo actual.
+
+Los llamadores siguen usando el patrón de siempre:
+    conn = get_connection(DB_PATH)
+    ...
+    conn.commit()
+    conn.close()
+
+Los módulos con tablas propias pasan su esquema (CREATE ... IF NOT EXISTS) en
+`schema`; se ejecuta una vez por archivo y proceso, antes de la primera conexión:
+    conn = get_connection(DB_PATH, schema=MY_SCHEMA)
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv('SQLITE_BUSY_TIMEOUT_SECONDS', '10'))
+SQLITE_MAX_IDLE_PER_THREAD = int(os.getenv('SQLITE_MAX_IDLE_PER_THREAD', '4'))
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión cuyo close() la devuelve al pool del hilo en lugar de cerrarla"""
+
+    def close(self):
+        pool_path = getattr(self, '_pool_path', None)
+        if pool_path is None:
+            return super().close()
+
+        try:
+            # Igual que un close() real: lo no confirmado se descarta
+            if self.in_transaction:
+                self.rollback()
+            self.row_factory = None
+            self.text_factory = str
+        except sqlite3.Error:
+            self._pool_path = None
+            return super().close()
+
+        idle = _idle_connections(pool_path)
+        if self not in idle and len(idle) < SQLITE_MAX_IDLE_PER_THREAD:
+            idle.append(self)
+        else:
+            self._pool_path = None
+            super().close()
+
+    def close_connection(self):
+        """Cierra la conexión de verdad (no vuelve al pool)"""
+        self._pool_path = None
+        super().close()
+
+
+_local = threading.local()
+
+
+def _reset_after_fork():
+    """Las conexiones SQLite no deben usarse a través de un fork"""
+    global _local
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _idle_connections(db_path: str) -> List[PooledConnection]:
+    pools: Dict[str, List[PooledConnection]] = getattr(_local, 'pools', None)
+    if pools is None:
+        pools = _local.pools = {}
+    return pools.setdefault(db_path, [])
+
+
+def _configure(conn: sqlite3.Connection):
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_SECONDS * 1000)}')
+
+
+_schemas_applied: Set[Tuple[str, Tuple[str, ...]]] = set()
+_schema_lock = threading.Lock()
+
+
+def _ensure_schema(conn: sqlite3.Connection, db_path: str, schema: Sequence[str]):
+    """Ejecuta `schema` sobre db_path la primera vez que este proceso lo pide"""
+    key = (db_path, tuple(schema))
+    if key in _schemas_applied:
+        return
+    with _schema_lock:
+        if key in _schemas_applied:
+            return
+        try:
+            for statement in schema:
+                conn.execute(statement)
+            conn.commit()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        _schemas_applied.add(key)
+
+
+def get_connection(db_path: str, schema: Sequence[str] = ()) -> sqlite3.Connection:
+    """
+    Obtiene una conexión configurada (WAL, synchronous=NORMAL, busy timeout)
+    reutilizando las conexiones libres del hilo actual.
+
+    `schema`: sentencias idempotentes (CREATE TABLE/INDEX IF NOT EXISTS) que
+    se ejecutan una sola vez por archivo antes de devolver la conexión.
+    """
+    conn = _connect(db_path)
+    if schema:
+        _ensure_schema(conn, db_path, schema)
+    return conn
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    idle = _idle_connections(db_path)
+    if idle:
+        return idle.pop()
+
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, factory=PooledConnection)
+    try:
+        _configure(conn)
+    except sqlite3.Error as e:
+        # Ej. filesystem sin soporte de memoria compartida: seguir en modo rollback journal
+        logger.warning(f"No se pudo activar WAL en {db_path}: {e}")
+    conn._pool_path = db_path
+    return conn
+
+
+def close_thread_connections():
+    """Cierra las conexiones libres del hilo actual"""
+    pools = getattr(_local, 'pools', None) or {}
+    for idle in pools.values():
+        while idle:
+            idle.pop().close_connection()
@@ -0,0 +1,173 @@
+"""
+Startup Profile
+===============
+Carga diferida de dependencias pesadas y presupuesto de arranque por worker.
+
+- LazyModule / lazy_attr: el módulo (Pillow, BeautifulSoup, moviepy/cv2 vía
+  video_processor, el generador de landings, el web cloner...) se importa la
+  primera vez que se usa, no al importar app.py. Un worker que nunca clona
+  un sitio nunca paga ese import ni su memoria.
+- Cada carga diferida queda medida (segundos) para saber qué cuesta.
+- El tiempo de import de app.py y el RSS del proceso se comparan con
+  STARTUP_TIME_BUDGET_SECONDS y WORKER_RSS_BUDGET_MB; si se exceden se
+  registra una advertencia (también al arrancar cada worker de gunicorn).
+
+Este módulo debe importarse primero en app.py: el reloj de arranque empieza
+cuando se importa.
+"""
+
+import os
+import time
+import logging
+import importlib
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Inicio del arranque (import de este módulo = primera línea de app.py)
+IMPORT_STARTED_AT = time.perf_counter()
+
+STARTUP_TIME_BUDGET_SECONDS = float(os.getenv('STARTUP_TIME_BUDGET_SECONDS', '5'))
+# gunicorn_config.py: 2 workers en 512MB -> ~150MB por worker
+WORKER_RSS_BUDGET_MB = float(os.getenv('WORKER_RSS_BUDGET_MB', '150'))
+
+_lazy_loads: Dict[str, float] = {}
+_lazy_lock = threading.Lock()
+_startup: Dict[str, Any] = {}
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS actual del proceso en MB (None si no se puede leer)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss: KB en Linux, bytes en macOS (pico, no actual)
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except Exception:
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de RSS del proceso en MB (VmHWM; ru_maxrss si no hay /proc)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except Exception:
+        return None
+
+
+def _import_measured(name: str):
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _lazy_lock:
+        if name not in _lazy_loads:
+            _lazy_loads[name] = round(elapsed, 3)
+            logger.info(f"📦 Carga diferida de {name}: {elapsed:.2f}s")
+    return module
+
+
+class LazyModule:
+    """Proxy de un módulo que se importa al acceder al primer atributo"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = _import_measured(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+class LazyAttr:
+    """Proxy de una clase/función de un módulo: se resuelve al primer uso"""
+
+    def __init__(self, module_name: str, attr: str):
+        self._module_name = module_name
+        self._attr = attr
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            self._target = getattr(_import_measured(self._module_name), self._attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"<LazyAttr {self._module_name}.{self._attr}>"
+
+
+def lazy_attr(module_name: str, attr: str) -> LazyAttr:
+    return LazyAttr(module_name, attr)
+
+
+def check_budget(label: str) -> Dict[str, Any]:
+    """Mide RSS actual contra WORKER_RSS_BUDGET_MB y advierte si se excede"""
+    rss_mb = current_rss_mb()
+    over = rss_mb is not None and rss_mb > WORKER_RSS_BUDGET_MB
+    if over:
+        logger.warning(f"⚠️ {label}: RSS {rss_mb:.0f}MB excede el presupuesto de {WORKER_RSS_BUDGET_MB:.0f}MB")
+    else:
+        logger.info(f"📏 {label}: RSS {rss_mb if rss_mb is not None else '?'}MB (presupuesto {WORKER_RSS_BUDGET_MB:.0f}MB)")
+    return {"rss_mb": round(rss_mb, 1) if rss_mb is not None else None, "over_budget": over}
+
+
+def mark_app_ready():
+    """Cierra la medición del import de app.py"""
+    elapsed = time.perf_counter() - IMPORT_STARTED_AT
+    _startup.update({
+        "pid": os.getpid(),
+        "import_seconds": round(elapsed, 3),
+        "time_budget_seconds": STARTUP_TIME_BUDGET_SECONDS,
+        "time_over_budget": elapsed > STARTUP_TIME_BUDGET_SECONDS,
+        **{f"import_{k}": v for k, v in check_budget('Import de app.py').items()}
+    })
+    if elapsed > STARTUP_TIME_BUDGET_SECONDS:
+        logger.warning(f"⚠️ Import de app.py tomó {elapsed:.2f}s (presupuesto {STARTUP_TIME_BUDGET_SECONDS:.0f}s)")
+    print(f"⏱️ app.py importado en {elapsed:.2f}s (RSS {_startup.get('import_rss_mb')}MB)")
+
+
+def get_startup_report() -> Dict[str, Any]:
+    """Arranque, RSS actual del worker y módulos cargados en diferido"""
+    with _lazy_lock:
+        lazy_loads = dict(_lazy_loads)
+    rss_mb = current_rss_mb()
+    return {
+        **_startup,
+        "current_pid": os.getpid(),
+        "rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+        "rss_budget_mb": WORKER_RSS_BUDGET_MB,
+        "rss_over_budget": rss_mb is not None and rss_mb > WORKER_RSS_BUDGET_MB,
+        "lazy_loads_seconds": lazy_loads
+    }
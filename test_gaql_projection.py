@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for GAQL Row Projection
+Pasa un GoogleAdsRow (v22) poblado por el proyector de /api/query y por un
+proyector de streaming, incluyendo campos renombrados por proto-plus (type_).
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google.ads.googleads.v22.services.types.google_ads_service import GoogleAdsRow
+from google.ads.googleads.v22.common.types.ad_asset import AdTextAsset
+from google.ads.googleads.v22.enums.types.ad_type import AdTypeEnum
+from google.ads.googleads.v22.enums.types.criterion_type import CriterionTypeEnum
+from google.ads.googleads.v22.enums.types.keyword_match_type import KeywordMatchTypeEnum
+from google.ads.googleads.v22.enums.types.served_asset_field_type import ServedAssetFieldTypeEnum
+
+from gaql_projection import QUERY_RESULT_PROJECTOR, get_projector
+
+
+def make_row():
+    row = GoogleAdsRow()
+    row.campaign.id = 111
+    row.campaign.name = "Campaña"
+    row.ad_group.id = 222
+    row.ad_group_criterion.criterion_id = 333
+    row.ad_group_criterion.type_ = CriterionTypeEnum.CriterionType.KEYWORD
+    row.ad_group_criterion.keyword.text = "amarres de amor"
+    row.ad_group_criterion.keyword.match_type = KeywordMatchTypeEnum.KeywordMatchType.EXACT
+    row.ad_group_criterion.quality_info.quality_score = 7
+    row.ad_group_ad.ad.id = 444
+    row.ad_group_ad.ad.type_ = AdTypeEnum.AdType.RESPONSIVE_SEARCH_AD
+    row.ad_group_ad.ad.responsive_search_ad.headlines.append(AdTextAsset(
+        text="Consulta gratis",
+        pinned_field=ServedAssetFieldTypeEnum.ServedAssetFieldType.HEADLINE_1
+    ))
+    row.ad_group_ad.ad.responsive_search_ad.headlines.append(AdTextAsset(text=""))
+    row.ad_group_ad.ad.responsive_search_ad.descriptions.append(AdTextAsset(text="Escríbenos"))
+    row.metrics.clicks = 12
+    row.metrics.cost_micros = 3_500_000
+    row.metrics.conversions = 1.5
+    return row
+
+
+def report(name, checks):
+    passed = sum(1 for check, _ in checks if check)
+    failed = len(checks) - passed
+
+    for check, description in checks:
+        status = "✅" if check else "❌"
+        print(f"  {status} {description}")
+
+    print(f"\n📊 {name}: {passed} passed, {failed} failed\n")
+    return failed == 0
+
+
+def test_query_result_projector():
+    """Forma clásica de /api/query con una fila poblada"""
+    print("🧪 Testing /api/query projector...")
+
+    result = QUERY_RESULT_PROJECTOR.to_dict(make_row())
+    ad = result["adGroupAd"]["ad"]
+    criterion = result["adGroupCriterion"]
+
+    checks = [
+        (ad["type"] == "RESPONSIVE_SEARCH_AD", f"Ad type resolved through type_: {ad.get('type')}"),
+        (ad["id"] == "444", "int64 ids as strings"),
+        (ad["responsiveSearchAd"]["headlines"] == [{"text": "Consulta gratis"}, {"text": ""}],
+         f"Headlines keep the classic shape: {ad['responsiveSearchAd']['headlines']}"),
+        (ad["responsiveSearchAd"]["descriptions"] == [{"text": "Escríbenos"}], "Descriptions keep the classic shape"),
+        (criterion["keyword"] == {"text": "amarres de amor", "matchType": "EXACT"}, "Keyword text and match type"),
+        (criterion["qualityInfo"]["qualityScore"] == 7, "Quality score as a number"),
+        (result["metrics"]["clicks"] == "12" and result["metrics"]["costMicros"] == "3500000", "int64 metrics as strings"),
+        (result["metrics"]["conversions"] == 1.5, "Double metrics as numbers"),
+    ]
+    assert report("/api/query projector", checks)
+
+
+def test_streaming_projector_renamed_fields():
+    """Queries de streaming que seleccionan campos 'type'"""
+    print("🧪 Testing streaming projector with renamed fields...")
+
+    projector = get_projector(
+        "SELECT ad_group_criterion.type, ad_group_ad.ad.type, campaign.id FROM ad_group_ad"
+    )
+    row = make_row()
+    flat = projector.to_flat_dict(row)
+    nested = projector.to_dict(row)
+
+    checks = [
+        (flat == {
+            "ad_group_criterion.type": "KEYWORD",
+            "ad_group_ad.ad.type": "RESPONSIVE_SEARCH_AD",
+            "campaign.id": "111",
+        }, f"Flat keys use the GAQL names: {flat}"),
+        (nested["adGroupCriterion"] == {"type": "KEYWORD"}, "camelCase keys drop the proto-plus suffix"),
+    ]
+    assert report("Streaming projector", checks)
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("=" * 60)
+    print("🚀 GAQL Projection Test Suite")
+    print("=" * 60)
+    print()
+
+    results = {}
+    for name, test in [
+        ("/api/query projector", test_query_result_projector),
+        ("Streaming projector", test_streaming_projector_renamed_fields),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except (AssertionError, KeyError, ValueError) as e:
+            print(f"  ❌ {name}: {e}")
+            results[name] = False
+
+    print("=" * 60)
+    print("📊 FINAL RESULTS")
+    print("=" * 60)
+
+    for test_name, passed in results.items():
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status} - {test_name}")
+
+    total_passed = sum(1 for p in results.values() if p)
+    print()
+    print(f"Total: {total_passed}/{len(results)} tests passed")
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_all_tests())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test script for Notification Dispatcher
+Verifica coalescencia por cuenta, backoff hasta 'failed' y descarte con el
+outbox lleno, usando deliver_due() y un post local en lugar del webhook.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import notification_dispatcher
+from notification_dispatcher import NotificationDispatcher
+
+
+class StubResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class StubWebhook:
+    """Receptor local: registra cada POST y responde con el status configurado"""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = []
+
+    def __call__(self, url, json=None, timeout=None):
+        self.calls.append({"url": url, "json": json, "timeout": timeout})
+        return StubResponse(self.status_code)
+
+
+def make_dispatcher(webhook, coalesce_seconds=60):
+    db_path = os.path.join(tempfile.mkdtemp(), 'notification_outbox_test.db')
+    dispatcher = NotificationDispatcher('http://localhost/webhook', db_path=db_path, post=webhook,
+                                        coalesce_seconds=coalesce_seconds)
+    # Sin hilo de envío: las entregas se hacen a mano con deliver_due()
+    dispatcher.start = lambda: None
+    return dispatcher
+
+
+def make_due(dispatcher):
+    """Adelanta todas las filas pendientes para que deliver_due() las tome ya"""
+    conn = dispatcher._get_db()
+    try:
+        conn.execute("UPDATE notification_outbox SET next_attempt_at = 0 WHERE status = 'pending'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def outbox_rows(dispatcher):
+    conn = dispatcher._get_db()
+    try:
+        return conn.execute(
+            'SELECT id, status, attempts, next_attempt_at, items_json FROM notification_outbox ORDER BY id'
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def report(name, checks):
+    passed = sum(1 for check, _ in checks if check)
+    failed = len(checks) - passed
+
+    for check, description in checks:
+        status = "✅" if check else "❌"
+        print(f"  {status} {description}")
+
+    print(f"\n📊 {name}: {passed} passed, {failed} failed\n")
+    return failed == 0
+
+
+def test_coalescing():
+    """Alertas de una cuenta mientras la notificación no sale -> un solo mensaje"""
+    print("🧪 Testing coalescing...")
+
+    webhook = StubWebhook()
+    dispatcher = make_dispatcher(webhook)
+
+    first = dispatcher.notify("Gasto alto", "Campaña 1", {"campaign": "1"}, account="111")
+    second = dispatcher.notify("Gasto alto", "Campaña 2", {"campaign": "2"}, account="111")
+    third = dispatcher.notify("Pausa", "Campaña 3", account="111")
+    other = dispatcher.notify("Gasto alto", "Campaña 9", account="222")
+    not_due_yet = dispatcher.deliver_due()
+
+    make_due(dispatcher)
+    delivered = dispatcher.deliver_due()
+    account_payloads = [call["json"] for call in webhook.calls if "111" in call["json"]["text"]]
+
+    # La ventana de la cuenta ya se cerró: la siguiente alerta abre otra notificación
+    after_window = dispatcher.notify("Gasto alto", "Campaña 4", account="111")
+
+    checks = [
+        (first == second == third, "Same account merges into one pending notification"),
+        (other != first, "Other account gets its own notification"),
+        (not_due_yet == 0, "Nothing is sent before the coalescing window ends"),
+        (delivered == 2 and len(webhook.calls) == 2, "One webhook message per account"),
+        (len(account_payloads) == 1 and "(3 alertas)" in account_payloads[0]["text"], "Merged message carries the 3 alerts"),
+        (after_window != first, "Alert after the notification left starts a new one"),
+    ]
+    assert report("Coalescing", checks)
+
+
+def test_backoff_until_failed():
+    """Un receptor caído se reintenta con backoff exponencial y termina en 'failed'"""
+    print("🧪 Testing backoff until failed...")
+
+    original_max_attempts = notification_dispatcher.NOTIFICATION_MAX_ATTEMPTS
+    notification_dispatcher.NOTIFICATION_MAX_ATTEMPTS = 3
+    try:
+        webhook = StubWebhook(status_code=500)
+        dispatcher = make_dispatcher(webhook, coalesce_seconds=0)
+        dispatcher.notify("Caída", "Webhook caído")
+
+        delays = []
+        statuses = []
+        for _ in range(3):
+            make_due(dispatcher)
+            started = time.time()
+            dispatcher.deliver_due()
+            _, status, attempts, next_attempt_at, _ = outbox_rows(dispatcher)[0]
+            statuses.append((status, attempts))
+            if status == 'pending':
+                delays.append(next_attempt_at - started)
+
+        make_due(dispatcher)
+        extra = dispatcher.deliver_due()
+    finally:
+        notification_dispatcher.NOTIFICATION_MAX_ATTEMPTS = original_max_attempts
+
+    base = notification_dispatcher.NOTIFICATION_BACKOFF_BASE_SECONDS
+    checks = [
+        (statuses == [('pending', 1), ('pending', 2), ('failed', 3)], f"Retried until failed: {statuses}"),
+        (len(delays) == 2 and abs(delays[0] - base) < 1 and abs(delays[1] - base * 2) < 1,
+         f"Backoff doubles between attempts: {[round(d, 1) for d in delays]}"),
+        (len(webhook.calls) == 3 and extra == 0, "Failed notifications are not retried again"),
+    ]
+    assert report("Backoff", checks)
+
+
+def test_dropped_when_full():
+    """Con el outbox lleno se descartan las pendientes más antiguas"""
+    print("🧪 Testing dropped when full...")
+
+    original_max_pending = notification_dispatcher.NOTIFICATION_OUTBOX_MAX_PENDING
+    notification_dispatcher.NOTIFICATION_OUTBOX_MAX_PENDING = 3
+    try:
+        webhook = StubWebhook()
+        dispatcher = make_dispatcher(webhook, coalesce_seconds=0)
+        ids = [dispatcher.notify("Alerta", f"Mensaje {i}") for i in range(5)]
+        statuses = {row[0]: row[1] for row in outbox_rows(dispatcher)}
+        delivered = dispatcher.deliver_due()
+    finally:
+        notification_dispatcher.NOTIFICATION_OUTBOX_MAX_PENDING = original_max_pending
+
+    sent_messages = [json.dumps(call["json"]) for call in webhook.calls]
+    checks = [
+        ([statuses[i] for i in ids[:2]] == ['dropped', 'dropped'], "Two oldest notifications dropped"),
+        ([statuses[i] for i in ids[2:]] == ['pending'] * 3, "Newest notifications kept"),
+        (delivered == 3 and not any("Mensaje 0" in m or "Mensaje 1" in m for m in sent_messages),
+         "Dropped notifications are never sent"),
+    ]
+    assert report("Dropped when full", checks)
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("=" * 60)
+    print("🚀 Notification Dispatcher Test Suite")
+    print("=" * 60)
+    print()
+
+    results = {}
+    for name, test in [
+        ("Coalescing", test_coalescing),
+        ("Backoff", test_backoff_until_failed),
+        ("Dropped when full", test_dropped_when_full),
+    ]:
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print("=" * 60)
+    print("📊 FINAL RESULTS")
+    print("=" * 60)
+
+    for test_name, passed in results.items():
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{status} - {test_name}")
+
+    total_passed = sum(1 for p in results.values() if p)
+    print()
+    print(f"Total: {total_passed}/{len(results)} tests passed")
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_all_tests())
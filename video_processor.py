@@ -290,3 +290,10 @@ class VideoProcessor:
         except Exception as e:
             logger.error(f"Error getting video info: {e}")
             return {}
+
+
+def process_video_task(github_owner: str, github_repo: str, github_token: str, video_source: str,
+                       folder_name: str, position: str, is_url: bool = False) -> Dict[str, str]:
+    """Entry point for running process_video as a heavy task in a child process (see heavy_task_runner.py)"""
+    processor = VideoProcessor(github_owner, github_repo, github_token)
+    return processor.process_video(video_source, folder_name, position, is_url)
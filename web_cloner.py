@@ -3212,6 +3212,28 @@ def clone_website(
     return cloner.clone_website(url, whatsapp, phone, gtm_id, output_dir)
 
 
+def clone_with_requests(
+    url: str,
+    whatsapp: Optional[str] = None,
+    phone: Optional[str] = None,
+    gtm_id: Optional[str] = None,
+    timeout: int = 30,
+    max_retries: int = 3
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Clone a website and return (result_dict, resources_dict)
+
+    Same shape as playwright_cloner.clone_with_playwright, so it can run as a
+    heavy task in a child process (see heavy_task_runner.py).
+    """
+    config = WebClonerConfig()
+    config.timeout = timeout
+    config.max_retries = max_retries
+    cloner = WebCloner(config)
+    result = cloner.clone_website(url=url, whatsapp=whatsapp, phone=phone, gtm_id=gtm_id)
+    return result, cloner.get_resources()
+
+
 class ClonedSiteVerifier:
     """
     Sistema de verificación post-clonación para asegurar calidad del sitio clonado